@@ -0,0 +1,123 @@
+"""Benchmark glue/scripts/csv_to_parquet.py against a pandas baseline.
+
+Generates synthetic landing files from a STG_*_OUT.yaml contract and
+converts them with the streaming Arrow converter and with pandas (whole file
+read with read_csv, then to_parquet). The split mode adds the structure check
+run before the conversion by the two Glue jobs, the fused mode checks and
+converts in one pass with validate_convert.py. Each run is a separate process so that
+its peak RSS is measured on its own: the streaming converter stays flat when
+--size-gb grows, the pandas baseline grows with the file.
+
+    python benchmarks/bench_csv_to_parquet.py --size-gb 2 --files 1 --row-group-size 500000 --compression zstd
+    python benchmarks/bench_csv_to_parquet.py --size-gb 0.2 --files 1 --modes split fused
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_structure_check import peak_rss_mb, write_synthetic_files
+from contract import is_true, load_contract
+
+DATE_BATCH = "2024-06-30"
+
+def pandas_convert(path, contract, output, period, compression):
+    """Baseline: read the whole file with pandas, type the numbers and write it at once."""
+    import pandas as pd
+    names = [spec["name"] for spec in contract["specs"]]
+    quote = contract.get("quote")
+    df = pd.read_csv(
+        path, sep=contract.get("separator") or ";", header=0 if is_true(contract.get("header")) else None, names=names,
+        dtype=str, keep_default_na=False, quoting=csv.QUOTE_MINIMAL if quote else csv.QUOTE_NONE, quotechar=quote or '"',
+    )
+    if is_true(contract.get("footer")):
+        df = df.iloc[:-1]
+    for spec in contract["specs"]:
+        if spec["kind"] in ("integer", "decimal"):
+            values = pd.to_numeric(df[spec["name"]].str.replace(contract["decimal_format"], ".", regex=False).replace("", None))
+            df[spec["name"]] = values.astype("Int64") if spec["kind"] == "integer" else values
+    target = os.path.join(output, period.lower(), contract["table_name"].lower(), f"date_batch={DATE_BATCH}", os.path.basename(path) + ".pandas.parquet")
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    df.to_parquet(target, index=False, compression=None if compression == "none" else compression)
+    return {"records": len(df), "output": target}
+
+def run_mode(mode, contract_path, cfg_path, paths, output, options):
+    """Convert the files once with one mode and print the timing as JSON."""
+    contract = load_contract(contract_path, cfg_path)
+    period = contract["periodicity"][0]
+    start = time.perf_counter()
+    if mode == "arrow":
+        from csv_to_parquet import convert_files
+        results = convert_files(paths, contract, output, period, 1, date_batch=DATE_BATCH, **options)
+    elif mode == "split":
+        from csv_to_parquet import convert_files
+        from structure_check import check_files
+        check_files(paths, contract, 1)
+        results = convert_files(paths, contract, output, period, 1, date_batch=DATE_BATCH, **options)
+    elif mode == "fused":
+        from validate_convert import validate_convert_files
+        results = validate_convert_files(paths, contract, output, period, 1, date_batch=DATE_BATCH, **options)
+        for result in results:
+            result["records"] = result["valid_records"]
+    else:
+        results = [pandas_convert(path, contract, output, period, options["compression"]) for path in paths]
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "records": sum(result["records"] for result in results),
+        "output_mb": sum(os.path.getsize(result["output"]) for result in results) / 1024 ** 2,
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contract", default=os.path.join(ROOT_FOLDER, "glue", "config", "lsi", "STG_LSI_FIX_29_OUT.yaml"))
+    parser.add_argument("--cfg", default=os.path.join(ROOT_FOLDER, "glue", "config", "cfg_glue_ekip-lsi.yaml"))
+    parser.add_argument("--size-gb", type=float, default=2.0, help="total size of the synthetic files")
+    parser.add_argument("--files", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", choices=["arrow", "pandas", "split", "fused"], default=["arrow", "pandas"],
+                        help="split: structure check then conversion, fused: validate_convert.py")
+    parser.add_argument("--block-size", type=int, default=1024 * 1024)
+    parser.add_argument("--row-group-size", type=int, default=500000)
+    parser.add_argument("--compression", default="snappy")
+    parser.add_argument("--no-dictionary", action="store_true")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    parser.add_argument("paths", nargs="*", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    options = {"block_size": args.block_size, "row_group_size": args.row_group_size, "compression": args.compression, "use_dictionary": not args.no_dictionary}
+    if args.run_mode:
+        run_mode(args.run_mode, args.contract, args.cfg, args.paths, args.output, options)
+        return
+
+    contract = load_contract(args.contract, args.cfg)
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        landing = os.path.join(tmp_folder, "landing", f"periodicity={contract['periodicity'][0]}", f"datebatch={DATE_BATCH}")
+        os.makedirs(landing)
+        paths = write_synthetic_files(contract, landing, args.size_gb * 1024 ** 3, args.files, invalid_ratio=0)
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1024 ** 2
+        print(f"{len(paths)} files, {size_mb:.0f} MB, row groups of {args.row_group_size}, {args.compression}, dictionary {not args.no_dictionary}")
+        print(f"{'mode':>7} {'seconds':>8} {'MB/s':>8} {'rows/s':>11} {'parquet MB':>11} {'peak RSS MB':>12}")
+        for mode in args.modes:
+            command = [
+                sys.executable, __file__, "--contract", args.contract, "--cfg", args.cfg, "--run-mode", mode,
+                "--output", os.path.join(tmp_folder, "standard"), "--block-size", str(args.block_size),
+                "--row-group-size", str(args.row_group_size), "--compression", args.compression, *paths,
+            ]
+            if args.no_dictionary:
+                command.append("--no-dictionary")
+            completed = subprocess.run(command, check=True, capture_output=True, text=True)
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{mode:>7} {result['seconds']:>8.2f} {size_mb / result['seconds']:>8.1f} {result['records'] / result['seconds']:>11.0f} {result['output_mb']:>11.1f} {result['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark the Airflow parsing of the DAGs generated by 1.8.tech_generate_airflow_dag.
+
+Generates --dags DAG files (source x periodicity) from the DAG template
+and loads them in a DagBag as the scheduler does, counting the AWS API calls
+made while parsing. Pass --baseline-template to compare with another version
+of the template, e.g. one saved with git show <rev>:init_script/airflow-template.py.
+Each template is parsed in its own process.
+
+    python benchmarks/bench_dag_parse.py --dags 300 --baseline-template /tmp/airflow-template-eager.py
+
+Requires apache-airflow with the Amazon provider; AWS calls go to the
+account of the current credentials, or to AWS_ENDPOINT_URL. The eager
+template only parses when its SSM parameters and secret (jv "bench") exist,
+e.g. in a moto server:
+
+    python -m moto.server -p 5055 &
+    AWS_ENDPOINT_URL=http://127.0.0.1:5055 AWS_DEFAULT_REGION=eu-west-3 \
+        python benchmarks/bench_dag_parse.py --dags 300 --baseline-template /tmp/airflow-template-eager.py
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+PERIODS = ["daily", "weekly", "monthly", "quarterly", "yearly"]
+
+
+def generate_dags(template_path, folder, count):
+    """Write count DAG files generated from a template into folder/dags."""
+    dag = load_stage("dag")
+    os.makedirs(os.path.join(folder, "init_script"))
+    os.makedirs(os.path.join(folder, "dags"))
+    shutil.copy(template_path, os.path.join(folder, "init_script", "airflow-template.py"))
+    current_folder = os.getcwd()
+    # create_airflow_dag reads the template and writes the DAG relative to the working directory
+    os.chdir(folder)
+    try:
+        for index in range(count):
+            dag.create_airflow_dag("bench", "", f"src{index // len(PERIODS)}-bench", "bench", PERIODS[index % len(PERIODS)])
+    finally:
+        os.chdir(current_folder)
+    return os.path.join(folder, "dags")
+
+
+def run_mode(dag_folder):
+    """Parse the DAG folder once, counting the AWS API calls, and print the timing as JSON."""
+    import builtins
+    from botocore.client import BaseClient
+    from airflow.models import DagBag
+
+    # The template leaves the SNS topic of send_sns_message to the deployment
+    builtins.SNS_QUEUE_URL = "arn:aws:sns:eu-west-3:000000000000:bench"
+
+    calls = {"count": 0}
+    make_api_call = BaseClient._make_api_call
+
+    def counted_api_call(self, operation_name, api_params):
+        calls["count"] += 1
+        return make_api_call(self, operation_name, api_params)
+
+    BaseClient._make_api_call = counted_api_call
+    start = time.perf_counter()
+    dag_bag = DagBag(dag_folder, include_examples=False)
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "dags": len(dag_bag.dags),
+        "import_errors": len(dag_bag.import_errors),
+        "aws_calls": calls["count"],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dags", type=int, default=300)
+    parser.add_argument("--template", default=os.path.join(ROOT_FOLDER, "init_script", "airflow-template.py"))
+    parser.add_argument("--baseline-template", help="other template to compare, e.g. a previous version")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode)
+        return
+
+    try:
+        import airflow
+    except ImportError:
+        sys.exit("apache-airflow is required to parse the DAGs")
+    templates = [("template", args.template)] + ([("baseline", args.baseline_template)] if args.baseline_template else [])
+    print(f"{'mode':>9} {'DAGs':>6} {'errors':>7} {'seconds':>8} {'ms/DAG':>8} {'AWS calls':>10}")
+    for mode, template_path in templates:
+        with tempfile.TemporaryDirectory() as tmp_folder:
+            dag_folder = generate_dags(template_path, tmp_folder, args.dags)
+            completed = subprocess.run(
+                [sys.executable, __file__, "--run-mode", dag_folder],
+                check=True, capture_output=True, text=True,
+            )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{mode:>9} {result['dags']:>6} {result['import_errors']:>7} {result['seconds']:>8.2f} "
+              f"{1000 * result['seconds'] / max(result['dags'], 1):>8.1f} {result['aws_calls']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark glue/scripts/demultiplex.py: one pass against one pass per layout.
+
+Generates a synthetic multi layout fixed-width file: --layouts record types
+derived from a contract (the record type code replaces the start of the
+first column) interleaved at random. The file is then split with a single
+demultiplex pass, and with one pass per layout as when each record type is
+extracted on its own. Each run is a separate process.
+
+    python benchmarks/bench_demultiplex.py --records 10000000 --layouts 4
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_structure_check import BLOCK_RECORDS, peak_rss_mb, synthetic_value
+from contract import load_contract
+from demultiplex import demultiplex_file, layout_entry
+
+CODE_WIDTH = 2
+
+def synthetic_layouts(contract, count):
+    """count layouts of the contract, coded 01, 02..."""
+    layouts = {}
+    for index in range(count):
+        layout_contract = dict(contract, table_name_output=f"{contract['table_name_output']}_{index + 1:02d}")
+        layouts[f"{index + 1:02d}"] = layout_entry(layout_contract, layout_contract)
+    return layouts
+
+def write_multi_layout_file(contract, layouts, path, records, seed=0):
+    """Write records fixed-width records of random layouts (a block repeated)."""
+    rng = random.Random(seed)
+    widths = [spec["length"] for spec in contract["specs"]]
+    codes = list(layouts)
+    block = []
+    for _ in range(BLOCK_RECORDS):
+        values = [synthetic_value(spec, contract, rng) for spec in contract["specs"]]
+        record = "".join(value[:width].ljust(width) for value, width in zip(values, widths))
+        block.append(rng.choice(codes) + record[CODE_WIDTH:])
+    block = "\n".join(block) + "\n"
+    with open(path, "w") as file:
+        for _ in range(records // BLOCK_RECORDS):
+            file.write(block)
+        file.write("".join(line + "\n" for line in block.splitlines()[:records % BLOCK_RECORDS]))
+
+def run_mode(mode, contract_path, cfg_path, path, layout_count, batch_size):
+    """Split the file once with one mode and print the timing as JSON."""
+    contract = load_contract(contract_path, cfg_path)
+    layouts = synthetic_layouts(contract, layout_count)
+    start = time.perf_counter()
+    if mode == "single":
+        results = [demultiplex_file(path, (0, CODE_WIDTH), layouts, batch_size=batch_size)]
+    else:
+        results = [demultiplex_file(path, (0, CODE_WIDTH), {code: layout}, batch_size=batch_size) for code, layout in layouts.items()]
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "passes": len(results),
+        "records": sum(sum(result["layouts"].values()) for result in results),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contract", default=os.path.join(ROOT_FOLDER, "glue", "config", "lsi", "STG_LSI_FIX_29_IN.yaml"))
+    parser.add_argument("--cfg", default=os.path.join(ROOT_FOLDER, "glue", "config", "cfg_glue_ekip-lsi.yaml"))
+    parser.add_argument("--records", type=int, default=10000000)
+    parser.add_argument("--layouts", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("path", nargs="?", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode, args.contract, args.cfg, args.path, args.layouts, args.batch_size)
+        return
+
+    contract = load_contract(args.contract, args.cfg)
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        path = os.path.join(tmp_folder, "synthetic_multi_layout.txt")
+        write_multi_layout_file(contract, synthetic_layouts(contract, args.layouts), path, args.records)
+        size_mb = os.path.getsize(path) / 1024 ** 2
+        print(f"{args.records} records, {args.layouts} layouts, {size_mb:.0f} MB")
+        print(f"{'mode':>9} {'passes':>7} {'MB scanned':>11} {'seconds':>8} {'records/s':>11} {'peak RSS MB':>12}")
+        for mode in ("single", "per-layout"):
+            completed = subprocess.run(
+                [sys.executable, __file__, "--contract", args.contract, "--cfg", args.cfg, "--layouts", str(args.layouts),
+                 "--batch-size", str(args.batch_size), "--run-mode", mode, path],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{mode:>9} {result['passes']:>7} {size_mb * result['passes']:>11.0f} {result['seconds']:>8.2f} {result['records'] / result['seconds']:>11.0f} {result['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the data contract parsing of 1.2.tech_gdc_extract_structure.
+
+Compares the full DOM openpyxl load with the read-only streaming load and
+the process pool extraction. Each mode runs in its own process so that the
+peak RSS is not shared between modes; the generated YAML files are compared
+byte for byte against the DOM mode.
+
+    python benchmarks/bench_extract_structure.py [datacontract/EKIP_LSI.xlsm] --workers 4
+"""
+import argparse
+import filecmp
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+
+def peak_rss_mb(who):
+    """Peak resident set size in MB (ru_maxrss is in bytes on macOS, KB elsewhere)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_mode(excel_file_path, read_only, workers, yaml_output_path, jv):
+    """Parse the workbook once and print the timing as JSON."""
+    extract = load_stage("extract")
+    config = {"project": "bench", "project_path": "bench"}
+    start = time.perf_counter()
+    workbook = extract.load_workbook(excel_file_path, read_only=read_only, data_only=True)
+    try:
+        list_of_value = extract.resolve_list_of_value(extract.load_list_of_value(workbook), jv)
+        files_list_tab = extract.process_files_list(workbook["Files list"], excel_file_path, jv, extract.PERIODICITY_MAPPING)
+        tables, _, _ = extract.process_all_sheets(workbook, files_list_tab, jv, yaml_output_path, list_of_value, 'no', config, excel_file_path, workers)
+    finally:
+        workbook.close()
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "tables": len(tables),
+        "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_rss_workers_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }))
+
+
+def same_files(left, right):
+    """Return True if both folders hold byte identical files."""
+    names = sorted(os.listdir(left))
+    if names != sorted(os.listdir(right)):
+        return False
+    _, mismatch, errors = filecmp.cmpfiles(left, right, names, shallow=False)
+    return not mismatch and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("excel_file_path", nargs="?", default=os.path.join(ROOT_FOLDER, "datacontract", "EKIP_LSI.xlsm"))
+    parser.add_argument("--jv", default="INDIA")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--run-mode", choices=["dom", "read_only", "pool"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.excel_file_path, args.run_mode != "dom", args.workers if args.run_mode == "pool" else 1, args.output, args.jv)
+        return
+
+    modes = ["dom", "read_only", "pool"]
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        print(f"{'mode':<10} {'best s':>8} {'peak RSS MB':>12} {'workers MB':>11} {'identical':>10}")
+        for mode in modes:
+            results = []
+            for i in range(args.repeat):
+                output = os.path.join(tmp_folder, mode)
+                completed = subprocess.run(
+                    [sys.executable, __file__, args.excel_file_path, "--jv", args.jv, "--workers", str(args.workers), "--run-mode", mode, "--output", output],
+                    check=True, capture_output=True, text=True,
+                )
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+            best = min(results, key=lambda result: result["seconds"])
+            identical = same_files(os.path.join(tmp_folder, "dom"), os.path.join(tmp_folder, mode))
+            print(f"{mode:<10} {best['seconds']:>8.3f} {best['peak_rss_mb']:>12.1f} {best['peak_rss_workers_mb']:>11.1f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark glue/scripts/fixed_width.py against per-line Python slicing.
+
+Generates a synthetic fixed-width file from a contract (the column Length
+gives the width of each field) and reads it into Arrow record batches with
+the vectorized reader and with a baseline slicing each line in Python. Each
+run is a separate process so that its peak RSS is measured on its own.
+
+    python benchmarks/bench_fixed_width.py --records 10000000 --baseline-records 1000000
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_structure_check import BLOCK_RECORDS, peak_rss_mb, synthetic_value
+from contract import load_contract
+
+def write_fixed_width_file(contract, path, records, seed=0):
+    """Write records fixed-width records (a block of distinct records repeated)."""
+    rng = random.Random(seed)
+    widths = [spec["length"] for spec in contract["specs"]]
+    block = []
+    for _ in range(BLOCK_RECORDS):
+        values = [synthetic_value(spec, contract, rng) for spec in contract["specs"]]
+        block.append("".join(value[:width].ljust(width) for value, width in zip(values, widths)))
+    block = "\n".join(block) + "\n"
+    with open(path, "w") as file:
+        for _ in range(records // BLOCK_RECORDS):
+            file.write(block)
+        file.write("".join(line + "\n" for line in block.splitlines()[:records % BLOCK_RECORDS]))
+
+def python_slicing(path, contract, batch_size):
+    """Baseline: slice each line in Python and build the Arrow batches from lists."""
+    import pyarrow as pa
+    bounds = []
+    offset = 0
+    for spec in contract["specs"]:
+        bounds.append((offset, offset + spec["length"]))
+        offset += spec["length"]
+    names = [spec["name"] for spec in contract["specs"]]
+    records = 0
+    columns = [[] for _ in bounds]
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            for values, (start, stop) in zip(columns, bounds):
+                values.append(line[start:stop].rstrip())
+            if len(columns[0]) == batch_size:
+                records += pa.RecordBatch.from_arrays([pa.array(values, pa.string()) for values in columns], names=names).num_rows
+                columns = [[] for _ in bounds]
+    if columns[0]:
+        records += pa.RecordBatch.from_arrays([pa.array(values, pa.string()) for values in columns], names=names).num_rows
+    return records
+
+def run_mode(mode, contract_path, cfg_path, path, batch_size):
+    """Read the file once with one mode and print the timing as JSON."""
+    contract = load_contract(contract_path, cfg_path)
+    contract["header"] = contract["footer"] = "false"
+    start = time.perf_counter()
+    if mode == "numpy":
+        from fixed_width import read_file
+        records = read_file(path, contract, batch_size=batch_size)["records"]
+    else:
+        records = python_slicing(path, contract, batch_size)
+    print(json.dumps({"seconds": time.perf_counter() - start, "records": records, "peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF)}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contract", default=os.path.join(ROOT_FOLDER, "glue", "config", "lsi", "STG_LSI_FIX_29_IN.yaml"))
+    parser.add_argument("--cfg", default=os.path.join(ROOT_FOLDER, "glue", "config", "cfg_glue_ekip-lsi.yaml"))
+    parser.add_argument("--records", type=int, default=10000000)
+    parser.add_argument("--baseline-records", type=int, default=1000000, help="records of the file read by the Python baseline, 0 to skip it")
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("path", nargs="?", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode, args.contract, args.cfg, args.path, args.batch_size)
+        return
+
+    contract = load_contract(args.contract, args.cfg)
+    runs = [("numpy", args.records)] + ([("python", args.baseline_records)] if args.baseline_records else [])
+    print(f"record length {sum(spec['length'] for spec in contract['specs'])}, batches of {args.batch_size}")
+    print(f"{'mode':>7} {'records':>10} {'MB':>7} {'seconds':>8} {'MB/s':>8} {'records/s':>11} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        for mode, records in runs:
+            path = os.path.join(tmp_folder, f"synthetic_{records}.txt")
+            if not os.path.exists(path):
+                write_fixed_width_file(contract, path, records)
+            size_mb = os.path.getsize(path) / 1024 ** 2
+            completed = subprocess.run(
+                [sys.executable, __file__, "--contract", args.contract, "--cfg", args.cfg, "--batch-size", str(args.batch_size), "--run-mode", mode, path],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{mode:>7} {result['records']:>10} {size_mb:>7.0f} {result['seconds']:>8.2f} {size_mb / result['seconds']:>8.1f} {result['records'] / result['seconds']:>11.0f} {result['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
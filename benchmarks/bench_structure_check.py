@@ -0,0 +1,124 @@
+"""Benchmark the throughput of glue/scripts/structure_check.py.
+
+Generates synthetic landing files from a STG_*_IN.yaml contract (valid
+values, with a small share of invalid records), then checks them with an
+increasing number of workers. Each run is a separate process so that the
+peak RSS of a run (bounded by --chunk-size, not by the file size) is not
+shared with the others.
+
+    python benchmarks/bench_structure_check.py --size-gb 2 --files 4 --workers 1 4
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import load_contract, strftime_format
+from structure_check import check_files
+
+# Distinct records generated, then repeated up to the requested size
+BLOCK_RECORDS = 20000
+
+def peak_rss_mb(who):
+    """Peak resident set size in MB (ru_maxrss is in bytes on macOS, KB elsewhere)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def synthetic_value(spec, contract, rng):
+    """A random valid value of a contract column."""
+    if spec["lov"]:
+        return rng.choice(spec["lov"])
+    length = spec["length"] or 10
+    if spec["kind"] == "decimal":
+        digits = max((spec["precision"] or length) - spec["scale"], 1)
+        value = str(rng.randrange(10 ** min(digits, 9)))
+        return value + contract["decimal_format"] + str(rng.randrange(10 ** spec["scale"])).zfill(spec["scale"]) if spec["scale"] else value
+    if spec["kind"] == "integer":
+        return str(rng.randrange(10 ** min(length, 9)))
+    if spec["kind"] in ("date", "timestamp"):
+        value = date(2020, 1, 1) + timedelta(days=rng.randrange(2000))
+        return value.strftime(strftime_format(contract["date_format"])) + (" 12:30:00" if spec["kind"] == "timestamp" else "")
+    return ''.join(rng.choices(string.ascii_uppercase + string.digits, k=rng.randint(1, length)))
+
+def write_synthetic_files(contract, folder, size_bytes, files, invalid_ratio, seed=0):
+    """Write `files` files of size_bytes in total, return their paths."""
+    rng = random.Random(seed)
+    separator = contract.get("separator") or ";"
+    block = []
+    for _ in range(BLOCK_RECORDS):
+        values = [synthetic_value(spec, contract, rng) for spec in contract["specs"]]
+        if rng.random() < invalid_ratio:
+            values[rng.randrange(len(values))] = "#" * 40
+        block.append(separator.join(values))
+    block = "\n".join(block) + "\n"
+    header = separator.join(spec["name"] for spec in contract["specs"]) + "\n"
+
+    paths = []
+    for index in range(files):
+        path = os.path.join(folder, f"synthetic_{index}.csv")
+        with open(path, "w") as file:
+            if str(contract.get("header")).lower() == "true":
+                file.write(header)
+            written = 0
+            while written < size_bytes / files:
+                file.write(block)
+                written += len(block)
+            if str(contract.get("footer")).lower() == "true":
+                file.write("FOOTER\n")
+        paths.append(path)
+    return paths
+
+def run_mode(contract_path, cfg_path, paths, workers, chunk_size):
+    """Check the files once and print the timing as JSON."""
+    contract = load_contract(contract_path, cfg_path)
+    start = time.perf_counter()
+    results = check_files(paths, contract, workers, chunk_size)
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "records": sum(result["records"] for result in results),
+        "errors": sum(sum(result["errors"].values()) for result in results),
+        "peak_rss_mb": max(peak_rss_mb(resource.RUSAGE_SELF), peak_rss_mb(resource.RUSAGE_CHILDREN)),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--contract", default=os.path.join(ROOT_FOLDER, "glue", "config", "lsi", "STG_LSI_FIX_29_IN.yaml"))
+    parser.add_argument("--cfg", default=os.path.join(ROOT_FOLDER, "glue", "config", "cfg_glue_ekip-lsi.yaml"))
+    parser.add_argument("--size-gb", type=float, default=2.0, help="total size of the synthetic files")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--invalid-ratio", type=float, default=0.001)
+    parser.add_argument("--run-mode", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.contract, args.cfg, args.run_mode, args.workers[0], args.chunk_size)
+        return
+
+    contract = load_contract(args.contract, args.cfg)
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        paths = write_synthetic_files(contract, tmp_folder, args.size_gb * 1024 ** 3, args.files, args.invalid_ratio)
+        size_mb = sum(os.path.getsize(path) for path in paths) / 1024 ** 2
+        print(f"{len(paths)} files, {size_mb:.0f} MB")
+        print(f"{'workers':>7} {'seconds':>8} {'MB/s':>8} {'records/s':>11} {'errors':>8} {'peak RSS MB':>12}")
+        for workers in args.workers:
+            completed = subprocess.run(
+                [sys.executable, __file__, "--contract", args.contract, "--cfg", args.cfg, "--workers", str(workers), "--chunk-size", str(args.chunk_size), "--run-mode", *paths],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{workers:>7} {result['seconds']:>8.2f} {size_mb / result['seconds']:>8.1f} {result['records'] / result['seconds']:>11.0f} {result['errors']:>8} {result['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Data contract helpers shared by the Glue job scripts.
+
+Loads the STG_*_IN.yaml / STG_*_OUT.yaml table structures generated by
+1.2.tech_gdc_extract_structure with the formats of cfg_glue_<project>.yaml,
+and streams delimited files, local or on S3, in bounded chunks of records.
+The scripts run the same way locally, on the --files of a --contract, and as
+Glue jobs, on the files of the --notification of the run (see job_inputs).
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import re
+from urllib.parse import unquote_plus
+
+import yaml
+
+# Snowflake date format tokens used in the "Rules" sheet and their strftime equivalent
+DATE_FORMAT_TOKENS = [
+    ("YYYY", "%Y"),
+    ("HH24", "%H"),
+    ("MM", "%m"),
+    ("DD", "%d"),
+    ("HH", "%H"),
+    ("MI", "%M"),
+    ("SS", "%S"),
+]
+
+def open_input(path, encoding="utf-8"):
+    """Open a local or s3:// file as a text stream."""
+    if path.startswith("s3://"):
+        import boto3
+        bucket, _, key = path[len("s3://"):].partition("/")
+        body = boto3.client("s3").get_object(Bucket=bucket, Key=key)["Body"]
+        return io.TextIOWrapper(body, encoding=encoding, newline="")
+    return open(path, "r", encoding=encoding, newline="")
+
+def list_files(folder, suffix=""):
+    """List the files of a local or s3:// folder ending with suffix."""
+    if folder.startswith("s3://"):
+        import boto3
+        bucket, _, prefix = folder[len("s3://"):].partition("/")
+        prefix = prefix.rstrip("/") + "/" if prefix else ""
+        pages = boto3.client("s3").get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix, Delimiter="/")
+        return sorted(f"s3://{bucket}/{item['Key']}" for page in pages for item in page.get("Contents", []) if item["Key"].endswith(suffix))
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(suffix))
+
+def load_yaml(path):
+    """Load a local or s3:// YAML file."""
+    with open_input(path) as file:
+        return yaml.safe_load(file)
+
+def is_true(value):
+    """Contract flags are 'true'/'false' strings."""
+    return str(value).lower() == "true"
+
+def strftime_format(date_format):
+    """Convert a contract date format (DDMMYYYY, dd/MM/yyyy...) to strftime.
+
+    Tokens match in any case, as in Snowflake: MM is the month and MI the minutes.
+    """
+    pattern = "|".join(token for token, _ in DATE_FORMAT_TOKENS)
+    return re.sub(pattern, lambda match: dict(DATE_FORMAT_TOKENS)[match.group(0).upper()], date_format, flags=re.IGNORECASE)
+
+def decimal_pattern(spec, decimal_format):
+    """Regular expression of a decimal(precision, scale) value, with at least one digit."""
+    separator = "\\" + decimal_format
+    if spec["precision"] is None:
+        return rf"[-+]?(?:\d+(?:{separator}\d*)?|{separator}\d+)"
+    integer_digits = max(spec["precision"] - spec["scale"], 0)
+    if spec["scale"]:
+        integer_part = rf"\d{{1,{integer_digits}}}" if integer_digits else "0"
+        return rf"[-+]?(?:{integer_part}(?:{separator}\d{{0,{spec['scale']}}})?|{separator}\d{{1,{spec['scale']}}})"
+    return rf"[-+]?\d{{1,{integer_digits}}}"
+
+def column_spec(column):
+    """Normalize a contract column: kind, length, precision, scale, mandatory and LOV."""
+    column_type = str(column.get("type") or "varchar").lower()
+    match = re.match(r"(\w+)\s*(?:\((\d+)\s*(?:,\s*(\d+))?\))?", column_type)
+    kind = match.group(1)
+    if kind.startswith("int") or kind in ("bigint", "smallint"):
+        kind = "integer"
+    elif kind in ("decimal", "numeric", "number"):
+        kind = "decimal"
+    elif kind.startswith("timestamp"):
+        kind = "timestamp"
+    elif kind != "date":
+        kind = "varchar"
+    length = column.get("Length")
+    lov = column.get("LOV") or []
+    lov = [item for sublist in lov for item in sublist] if lov and isinstance(lov[0], list) else lov
+    return {
+        "name": column["name"],
+        "kind": kind,
+        "length": int(length) if str(length).isdigit() else None,
+        "precision": int(match.group(2)) if match.group(2) else None,
+        "scale": int(match.group(3)) if match.group(3) else 0,
+        "mandatory": str(column.get("Mandatory", "")).lower() == "oui",
+        "lov": [str(item) for item in lov if str(item).lower() != "null"],
+    }
+
+def load_contract(table_yaml_path, cfg_glue_path=None):
+    """Load a table structure and its formats.
+
+    The date and decimal formats of cfg_glue_<project>.yaml are taken for the
+    file_id of the table when present, else the project defaults.
+    """
+    contract = load_yaml(table_yaml_path)
+    data_types = {"date_format": "YYYY-MM-DD", "decimal_format": "."}
+    if cfg_glue_path:
+        config_data_format = load_yaml(cfg_glue_path) or {}
+        file_format = config_data_format.get(contract.get("file_id"), config_data_format)
+        data_types.update(file_format.get("data_types", {}))
+    contract["date_format"] = data_types["date_format"]
+    contract["decimal_format"] = data_types["decimal_format"]
+    contract["specs"] = [column_spec(column) for column in sorted(contract["columns"], key=lambda column: column["position"])]
+    return contract
+
+def read_chunks(stream, contract, chunk_size=100000):
+    """Yield (first record number, rows) chunks of a delimited file.
+
+    Honours the separator, header, footer and quote of the contract; at most
+    chunk_size rows (plus the footer lookahead) are held in memory. Records
+    are numbered from 1 after the header.
+    """
+    quote = contract.get("quote")
+    reader = csv.reader(
+        stream,
+        delimiter=contract.get("separator") or ";",
+        quotechar=quote or '"',
+        quoting=csv.QUOTE_MINIMAL if quote else csv.QUOTE_NONE,
+    )
+    if is_true(contract.get("header")):
+        next(reader, None)
+    footer = is_true(contract.get("footer"))
+
+    record = 1
+    held = []
+    for rows in iter(lambda: list(itertools.islice(reader, chunk_size)), []):
+        if footer:
+            # The last row read may be the footer: keep it until the next chunk
+            rows = held + rows
+            held = rows[-1:]
+            rows = rows[:-1]
+        if rows:
+            yield record, rows
+            record += len(rows)
+
+def add_job_arguments(parser):
+    """Add the Glue job arguments resolving the files of a run (see job_inputs)."""
+    parser.add_argument("--notification", help="SQS notification of the run (Glue job argument)")
+    parser.add_argument("--landing", help="landing folder of the notified date batch: the project folder of the landing bucket "
+                        "followed by the landing_location_template of the project")
+
+def notification_files(notification, landing=None, contract=None):
+    """Files of a notification.
+
+    The objects of its S3 event records, else the files of the landing folder,
+    formatted with the file_code, table and period of the contract and the
+    dateBatch of the notification as date_batch_partition.
+    """
+    records = [record["s3"] for record in notification.get("Records") or [] if "s3" in record]
+    if records:
+        return [f"s3://{record['bucket']['name']}/{unquote_plus(record['object']['key'])}" for record in records]
+    if not landing:
+        raise ValueError("The notification holds no S3 record and no --landing folder is set")
+    contract = contract or {}
+    folder = landing.format(
+        file_code=contract.get("file_code"), table=contract.get("table_name"),
+        period=str(notification.get("periodicity") or "").lower(), date_batch_partition=notification.get("dateBatch"))
+    return list_files(folder)
+
+def file_contract(path, contracts, key="file_code"):
+    """Contract of a file: the one whose key is the longest found in the file name.
+
+    The key must not be followed by a letter or digit, so LSI_FIX_2 does not
+    take the LSI_FIX_29.csv files. Returns None when no contract matches.
+    """
+    name = os.path.basename(path).upper()
+    matches = [contract for contract in contracts
+               if contract.get(key) and re.search(re.escape(str(contract[key]).upper()) + r"(?![A-Z0-9])", name)]
+    return max(matches, key=lambda contract: len(str(contract[key])), default=None)
+
+def job_inputs(args, suffix, key="file_code"):
+    """(contract, files) pairs processed by a run.
+
+    Locally, the --contract and its --files. In Glue, the files of the
+    --notification of the run, grouped by their contract among the ones of
+    --contracts ending with suffix (see file_contract), the files of the
+    landing folder matching no contract being left out; the periodicity and
+    dateBatch of the notification are the defaults of --period and --date-batch.
+    """
+    if args.files:
+        if hasattr(args, "contract") and not args.contract:
+            raise ValueError("--files need their --contract")
+        contract = load_contract(args.contract, args.cfg) if getattr(args, "contract", None) else None
+        return [(contract, [path for value in args.files for path in value.split(",") if path])]
+    if not (args.notification and args.contracts):
+        raise ValueError("--files and --contract, or --notification and --contracts are required")
+
+    notification = json.loads(args.notification)
+    if getattr(args, "period", None) is None and notification.get("periodicity"):
+        args.period = str(notification["periodicity"]).lower()
+    if getattr(args, "date_batch", None) is None and notification.get("dateBatch"):
+        args.date_batch = notification["dateBatch"]
+    contracts = [load_contract(path, args.cfg) for path in list_files(args.contracts, suffix)]
+    notified = bool(notification.get("Records"))
+    if notified:
+        paths = notification_files(notification)
+    else:
+        paths = sorted({path for contract in contracts for path in notification_files(notification, args.landing, contract)})
+
+    groups = {}
+    for path in paths:
+        contract = file_contract(path, contracts, key)
+        if contract is None:
+            # A notified object must be processed; other files of the landing folder are not of the run
+            if notified:
+                raise ValueError(f"No contract of {args.contracts} matches {path}")
+            continue
+        groups.setdefault(str(contract[key]), (contract, []))[1].append(path)
+    return list(groups.values())
@@ -0,0 +1,373 @@
+"""Conversion of landing files to parquet with the schema of their STG_*_OUT.yaml contract.
+
+Reference implementation of the int-s3-csv-to-parquet Glue job: files are
+read in record batches with the Arrow CSV reader, typed batch by batch and
+written one row group at a time, so the peak memory depends on --block-size
+and --row-group-size, not on the file size.
+
+    python glue/scripts/csv_to_parquet.py --contract glue/config/lsi/STG_LSI_FIX_29_OUT.yaml \\
+        --cfg glue/config/cfg_glue_ekip-lsi.yaml --output s3://s3b-dlz-dev-standard-lsi-ekip/ekip-lsi \\
+        --files landing/periodicity=daily/datebatch=2024-06-30/LSI_FIX_29.csv
+
+Files are written to <output>/<period>/<table>/date_batch=<date batch>/, the
+layout of the Glue tables and Snowflake DDLs; the date batch is read from
+the datebatch=YYYY-MM-DD folder of the input file unless --date-batch is set.
+The external tables parse dates with to_date(..., date_format), so dates are
+kept as text by default; --dates typed writes them as date32/timestamp.
+In Glue the files are the ones of the --notification of the run, each with
+the STG_*_OUT.yaml of its file_code in --contracts (see contract.job_inputs).
+
+Many small files: --group-size-mb writes the files of a date batch by groups
+of that size into one parquet file each, and --skip-processed true skips the
+files converted by a previous run, recorded under <output>/_processed.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contract import add_job_arguments, is_true, job_inputs, strftime_format
+
+# Bytes parsed per record batch: the CSV reader reads a few dozen blocks ahead,
+# so the block size, not the file size, bounds the memory of the reader
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+DEFAULT_ROW_GROUP_SIZE = 500000
+
+def arrow_type(spec, typed_dates=False):
+    """Arrow type of a contract column."""
+    if spec["kind"] == "integer":
+        return pa.int64()
+    if spec["kind"] == "decimal":
+        return pa.decimal128(spec["precision"] or 38, spec["scale"])
+    if spec["kind"] == "date" and typed_dates:
+        return pa.date32()
+    if spec["kind"] == "timestamp" and typed_dates:
+        return pa.timestamp("s")
+    return pa.string()
+
+def arrow_schema(contract, typed_dates=False):
+    """Arrow schema of a contract, columns in file order."""
+    return pa.schema([pa.field(spec["name"], arrow_type(spec, typed_dates)) for spec in contract["specs"]])
+
+def convert_column(column, spec, field, contract):
+    """Cast a string column to the type of its field, empty values becoming null."""
+    if field.type == pa.string():
+        return column
+    values = pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+    if spec["kind"] == "decimal" and contract["decimal_format"] != ".":
+        values = pc.replace_substring(values, contract["decimal_format"], ".")
+    if spec["kind"] in ("date", "timestamp"):
+        date_format = strftime_format(contract["date_format"])
+        if spec["kind"] == "timestamp":
+            date_format += " %H:%M:%S"
+        values = pc.strptime(values, format=date_format, unit="s")
+    return values.cast(field.type)
+
+def convert_batch(batch, contract, schema):
+    """Type a record batch of strings with the contract schema."""
+    arrays = [convert_column(column, spec, field, contract) for column, spec, field in zip(batch.columns, contract["specs"], schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def read_batches(input_file, contract, block_size=DEFAULT_BLOCK_SIZE, invalid_rows=None):
+    """Yield the record batches of a delimited file, all columns as strings.
+
+    Honours the separator, header, footer and quote of the contract. Rows of
+    another column count are skipped: when invalid_rows is given they are
+    appended to it as (line number, text), else they raise a ValueError.
+    The footer is the last line of the file, whatever its column count: the
+    last batch is held back until the end of the file to drop it.
+    """
+    names = [spec["name"] for spec in contract["specs"]]
+    quote = contract.get("quote")
+    header = is_true(contract.get("header"))
+    footer = is_true(contract.get("footer"))
+    skipped = {"count": 0, "last": None}
+
+    def skip_row(row):
+        skipped["count"] += 1
+        skipped["last"] = row.number
+        if invalid_rows is not None:
+            invalid_rows.append((row.number, row.text))
+        return "skip"
+
+    reader = pv.open_csv(
+        input_file,
+        read_options=pv.ReadOptions(column_names=names, skip_rows=1 if header else 0, block_size=block_size),
+        parse_options=pv.ParseOptions(
+            delimiter=contract.get("separator") or ";",
+            quote_char=quote or False,
+            invalid_row_handler=skip_row if footer or invalid_rows is not None else None,
+        ),
+        convert_options=pv.ConvertOptions(column_types={name: pa.string() for name in names}, strings_can_be_null=False),
+    )
+    rows = 0
+    held = None
+    for batch in reader:
+        rows += batch.num_rows
+        if not footer:
+            yield batch
+            continue
+        if held is not None:
+            yield held
+        held = batch
+
+    # The footer was skipped if it is the last line of the file
+    footer_skipped = footer and skipped["last"] == (1 if header else 0) + rows + skipped["count"]
+    if footer_skipped and invalid_rows:
+        invalid_rows.pop()
+    if invalid_rows is None and skipped["count"] > footer_skipped:
+        raise ValueError(f"{skipped['count'] - footer_skipped} rows have another column count than the {len(names)} columns of the contract")
+    if held is not None:
+        yield held if footer_skipped else held.slice(0, held.num_rows - 1)
+
+def date_batch_of(path):
+    """Date batch of a landing file, from its datebatch=YYYY-MM-DD folder."""
+    match = re.search(r"datebatch=(\d{4}-\d{2}-\d{2})", path)
+    return match.group(1) if match else None
+
+def file_date_batch(path, date_batch=None):
+    """Date batch of a landing file: date_batch when given, else its datebatch= folder."""
+    date_batch = date_batch or date_batch_of(path)
+    if not date_batch:
+        raise ValueError(f"No date batch for {path}: set --date-batch or use a datebatch=YYYY-MM-DD folder")
+    return date_batch
+
+def output_path(output, contract, period, date_batch, path):
+    """Parquet file of a landing file: <output>/<period>/<table>/date_batch=<date batch>/<file>.parquet"""
+    file_name = os.path.splitext(os.path.basename(path))[0]
+    return f"{output.rstrip('/')}/{period.lower()}/{contract['table_name'].lower()}/date_batch={date_batch}/{file_name}.parquet"
+
+def group_output_path(output, contract, period, date_batch, paths):
+    """Parquet file of a group of files: the one of its first file, suffixed with a digest of the group when it has several.
+
+    A group written again by a rerun overwrites its file instead of duplicating its rows.
+    """
+    target = output_path(output, contract, period, date_batch, paths[0])
+    if len(paths) == 1:
+        return target
+    digest = hashlib.sha1("\n".join(paths).encode()).hexdigest()[:8]
+    return f"{target[:-len('.parquet')]}-{digest}.parquet"
+
+def file_size(path):
+    """Size in bytes of a local or s3:// file."""
+    input_fs, input_path = fs.FileSystem.from_uri(path if "://" in path else os.path.abspath(path))
+    return input_fs.get_file_info(input_path).size
+
+def group_files(paths, date_batch=None, group_size=0, sizes=None):
+    """Groups of files written to one parquet file: [(date batch, files)].
+
+    The files of a date batch are grouped in their order up to group_size
+    bytes (a larger file is a group on its own); with group_size 0 each file
+    is its own group.
+    """
+    sizes = sizes or {}
+    batches = {}
+    for path in paths:
+        batches.setdefault(file_date_batch(path, date_batch), []).append(path)
+    groups = []
+    for batch, batch_paths in batches.items():
+        group, size = [], 0
+        for path in batch_paths:
+            path_size = sizes[path] if path in sizes else file_size(path) if group_size else 0
+            if group and (not group_size or size + path_size > group_size):
+                groups.append((batch, group))
+                group, size = [], 0
+            group.append(path)
+            size += path_size
+        groups.append((batch, group))
+    return groups
+
+def processed_folder(output, contract, period, date_batch):
+    """Folder of the records of the files converted for a table date batch, outside the table location."""
+    return f"{output.rstrip('/')}/_processed/{period.lower()}/{contract['table_name'].lower()}/date_batch={date_batch}"
+
+def processed_records(output, contract, period, date_batch):
+    """Records of the files converted for a table date batch by the previous runs.
+
+    Returns ({record file: {output, files: {file: size}}}, filesystem of the records).
+    """
+    folder = processed_folder(output, contract, period, date_batch)
+    output_fs, folder_path = fs.FileSystem.from_uri(folder if "://" in folder else os.path.abspath(folder))
+    records = {}
+    for info in output_fs.get_file_info(fs.FileSelector(folder_path, allow_not_found=True)):
+        if info.is_file and info.path.endswith(".json"):
+            with output_fs.open_input_stream(info.path) as stream:
+                records[info.path] = json.loads(stream.read())
+    return records, output_fs
+
+def record_processed(output, contract, period, date_batch, target, sizes):
+    """Record the files of a closed parquet file and their size, one record per parquet file."""
+    folder = processed_folder(output, contract, period, date_batch)
+    output_fs, folder_path = fs.FileSystem.from_uri(folder if "://" in folder else os.path.abspath(folder))
+    output_fs.create_dir(folder_path, recursive=True)
+    with output_fs.open_output_stream(f"{folder_path}/{os.path.basename(target)}.json") as stream:
+        stream.write(json.dumps({"output": target, "files": sizes}).encode())
+
+def unprocessed_files(paths, contract, output, period, date_batch=None):
+    """Files to convert, with their size: the ones not converted yet.
+
+    A file recorded with another size was delivered again: the parquet file
+    of its previous group is deleted and all the files of that group are
+    converted again, so that no row is kept twice.
+    """
+    sizes = {path: file_size(path) for path in paths}
+    for batch in dict.fromkeys(file_date_batch(path, date_batch) for path in paths):
+        records, output_fs = processed_records(output, contract, period, batch)
+        for record_path, record in records.items():
+            if all(sizes.get(path, size) == size for path, size in record["files"].items()):
+                # Unchanged group: its files of the run are left out
+                for path in record["files"]:
+                    sizes.pop(path, None)
+                continue
+            _, target = fs.FileSystem.from_uri(record["output"] if "://" in record["output"] else os.path.abspath(record["output"]))
+            if output_fs.get_file_info(target).is_file:
+                output_fs.delete_file(target)
+            output_fs.delete_file(record_path)
+            for path in record["files"]:
+                sizes.setdefault(path, file_size(path))
+    return sizes
+
+def open_parquet(contract, schema, target, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy", use_dictionary=True):
+    """Open a parquet output: {contract, schema, writer, buffered, row_group_size, records, row_groups}.
+
+    Batches are typed with the contract; without one they are written as they are.
+    """
+    output_fs, output_file = fs.FileSystem.from_uri(target if "://" in target else os.path.abspath(target))
+    output_fs.create_dir(os.path.dirname(output_file), recursive=True)
+    return {
+        "contract": contract,
+        "schema": schema,
+        "writer": pq.ParquetWriter(output_file, schema, filesystem=output_fs, compression=compression, use_dictionary=use_dictionary),
+        "buffered": pa.Table.from_batches([], schema=schema),
+        "row_group_size": row_group_size,
+        "records": 0,
+        "row_groups": 0,
+    }
+
+def write_row_group(output, table):
+    """Write a table as one row group of the output."""
+    output["writer"].write_table(table, row_group_size=output["row_group_size"])
+    output["records"] += table.num_rows
+    output["row_groups"] += 1
+
+def write_batch(output, batch):
+    """Type a record batch of strings and buffer it.
+
+    Buffered rows are written as row groups of row_group_size rows, the
+    remainder kept for the next one.
+    """
+    if output["contract"]:
+        batch = convert_batch(batch, output["contract"], output["schema"])
+    typed = pa.Table.from_batches([batch], schema=output["schema"])
+    output["buffered"] = pa.concat_tables([output["buffered"], typed])
+    while output["buffered"].num_rows >= output["row_group_size"]:
+        write_row_group(output, output["buffered"].slice(0, output["row_group_size"]))
+        output["buffered"] = output["buffered"].slice(output["row_group_size"])
+
+def close_parquet(output):
+    """Write the buffered rows and close the file; returns the records and row groups written."""
+    if output["buffered"].num_rows:
+        write_row_group(output, output["buffered"])
+    output["writer"].close()
+    return {"records": output["records"], "row_groups": output["row_groups"]}
+
+def write_parquet(batches, contract, schema, target, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy", use_dictionary=True):
+    """Type record batches of strings and write them to one parquet file."""
+    output = open_parquet(contract, schema, target, row_group_size, compression, use_dictionary)
+    try:
+        for batch in batches:
+            write_batch(output, batch)
+    except Exception:
+        output["writer"].close()
+        raise
+    return close_parquet(output)
+
+def group_batches(paths, contract, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield the record batches of files, one file after the other."""
+    for path in paths:
+        input_fs, input_path = fs.FileSystem.from_uri(path if "://" in path else os.path.abspath(path))
+        with input_fs.open_input_stream(input_path) as input_file:
+            yield from read_batches(input_file, contract, block_size)
+
+def convert_group(paths, contract, output, period, date_batch, typed_dates=False, block_size=DEFAULT_BLOCK_SIZE,
+                  row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy", use_dictionary=True, processed=None):
+    """Convert a group of files of a date batch to one parquet file, streamed batch by batch.
+
+    When processed ({file: size}) is given, the files are recorded as
+    processed once the parquet file is closed.
+    Returns a report: files, output, records, row_groups and seconds.
+    """
+    start = time.perf_counter()
+    target = group_output_path(output, contract, period, date_batch, paths)
+    written = write_parquet(group_batches(paths, contract, block_size), contract, arrow_schema(contract, typed_dates), target,
+                            row_group_size, compression, use_dictionary)
+    if processed is not None:
+        record_processed(output, contract, period, date_batch, target, processed)
+    result = {"files": paths, "output": target, **written}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def convert_files(paths, contract, output, period, workers=1, date_batch=None, group_size=0, skip_processed=False, **options):
+    """Convert files in parallel on a bounded process pool, one parquet file per group (see group_files).
+
+    With skip_processed the files converted by a previous run are left out
+    and the converted ones recorded. Returns the reports of the groups in order.
+    """
+    sizes = unprocessed_files(paths, contract, output, period, date_batch) if skip_processed else {}
+    if skip_processed:
+        paths = list(sizes)
+    groups = group_files(paths, date_batch, group_size, sizes)
+    tasks = [(group, batch, {path: sizes[path] for path in group} if skip_processed else None) for batch, group in groups if group]
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        return [convert_group(group, contract, output, period, batch, processed=processed, **options) for group, batch, processed in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_group, group, contract, output, period, batch, processed=processed, **options)
+                   for group, batch, processed in tasks]
+        return [future.result() for future in futures]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="+", help="local or s3:// files to convert, or a comma separated list")
+    parser.add_argument("--contract", help="STG_*_OUT.yaml of the files")
+    parser.add_argument("--contracts", help="folder of the STG_*_OUT.yaml contracts of the notified files")
+    add_job_arguments(parser)
+    parser.add_argument("--cfg", help="cfg_glue_<project>.yaml holding the date and decimal formats")
+    parser.add_argument("--output", required=True, help="project folder of the standard bucket")
+    parser.add_argument("--period", help="periodicity folder, default the first periodicity of the contract")
+    parser.add_argument("--date-batch", help="date batch partition, default the datebatch= folder of each file")
+    parser.add_argument("--dates", choices=["text", "typed"], default="text", help="keep dates as text or write date32/timestamp")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="bytes read per record batch")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="records per parquet row group")
+    parser.add_argument("--compression", default="snappy", help="snappy, zstd, gzip or none")
+    parser.add_argument("--dictionary", default="true", help="dictionary encoding: true, false or comma separated columns")
+    parser.add_argument("--group-size-mb", type=float, default=0, help="MB of landing files of a date batch written to one parquet file, 0 for one per file")
+    parser.add_argument("--skip-processed", default="false", help="true to skip the files converted by a previous run")
+    args, _ = parser.parse_known_args()
+
+    use_dictionary = args.dictionary.lower() == "true" if args.dictionary.lower() in ("true", "false") else args.dictionary.split(",")
+    results = []
+    for contract, paths in job_inputs(args, "_OUT.yaml"):
+        results += convert_files(
+            paths, contract, args.output, args.period or contract["periodicity"][0], args.workers,
+            date_batch=args.date_batch, group_size=int(args.group_size_mb * 1024 ** 2), skip_processed=is_true(args.skip_processed),
+            typed_dates=args.dates == "typed", block_size=args.block_size,
+            row_group_size=args.row_group_size, compression=args.compression, use_dictionary=use_dictionary,
+        )
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
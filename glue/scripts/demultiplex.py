@@ -0,0 +1,191 @@
+"""Single-pass split of a multi layout landing file into its record types.
+
+Ekip extract files mix several fixed-width record types. The
+cfg_glue_<project>_layout-template.yaml entry of the file_id gives the
+position of the record type code (layout, StartPosition:StopPosition,
+1-based and inclusive) and the code of each STG_*_IN table. The file is
+memory-mapped and read once. Each window of records is split by code with
+one vectorized comparison per layout, and the records of each layout are
+sliced with the plan of their STG_*_IN contract (see fixed_width.py). They
+are written as parquet with the schema of the STG_*_OUT contract, each
+layout to its own table under <output>/<period>/<table>/date_batch=<date batch>/.
+
+    python glue/scripts/demultiplex.py --layouts glue/config/cfg_glue_ekip-lsi_layout-template.yaml \\
+        --contracts glue/config/lsi --cfg glue/config/cfg_glue_ekip-lsi.yaml --file-id Ekipfix \\
+        --project lsi --jv INDIA --output s3://s3b-dlz-dev-standard-lsi-ekip/ekip-lsi \\
+        --files landing/periodicity=daily/datebatch=2024-06-30/EKIPFIX.txt
+
+In Glue --file-id is left out: the files of the --notification of the run
+are split with the layouts of the file_id found in their name (see
+contract.job_inputs).
+
+The report gives the records of each layout and the unknown codes, for the
+reconciliation with the line count of the file. Header and trailer records
+are record types of their own and are counted under their code.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contract import add_job_arguments, job_inputs, list_files, load_contract, load_yaml
+from csv_to_parquet import DEFAULT_ROW_GROUP_SIZE, arrow_schema, close_parquet, date_batch_of, open_parquet, output_path, write_batch
+from fixed_width import DEFAULT_BATCH_SIZE, SPACE, column_array, count_wrong_length, line_windows, mapped_file, record_matrix, slice_plan
+
+def layout_key(table_name_output, project, jv):
+    """Key of a STG_*_IN table in the layout template, as written by 1.2.tech_gdc_extract_structure."""
+    return re.sub('-IN$', f'-{jv.upper()}-IN', table_name_output.replace(f'STG_{project.upper()}_', '').replace('_', '-'))
+
+def load_layouts(layout_cfg_path, file_id, contracts_folder, cfg_glue_path, project, jv):
+    """Load the layouts of a file_id.
+
+    Returns the code position as (offset, width) in bytes and the layouts
+    as {code: layout_entry}.
+    """
+    template = (load_yaml(layout_cfg_path) or {}).get(file_id)
+    if not template:
+        raise ValueError(f"No layout for file_id {file_id} in {layout_cfg_path}")
+    match = re.fullmatch(r"\s*(\d+)\s*:\s*(\d+)\s*", str(template.get("layout")))
+    if not match:
+        raise ValueError(f"Layout position of {file_id} is not set (StartPosition:StopPosition): {template.get('layout')}")
+    start, stop = int(match.group(1)), int(match.group(2))
+
+    layouts = {}
+    for contract_path in list_files(contracts_folder, "_IN.yaml"):
+        contract = load_contract(contract_path, cfg_glue_path)
+        code = template.get(layout_key(contract["table_name_output"], project, jv))
+        if contract.get("file_id") != file_id or code is None:
+            continue
+        if len(str(code).encode()) != stop - start + 1:
+            raise ValueError(f"Layout code {code} of {contract['table_name_output']} does not fit the layout position {start}:{stop}")
+        layouts[str(code)] = layout_entry(contract, load_contract(re.sub("_IN.yaml$", "_OUT.yaml", contract_path), cfg_glue_path))
+    return (start - 1, stop - start + 1), layouts
+
+def layout_entry(contract, contract_out):
+    """Layout of a record type: name, contracts, slice plan, record length and string schema."""
+    plan = slice_plan(contract)
+    return {
+        "name": contract["table_name_output"],
+        "contract": contract,
+        "contract_out": contract_out,
+        "plan": plan,
+        "record_length": sum(column["width"] for column in plan),
+        "schema": pa.schema([pa.field(column["name"], pa.string()) for column in plan]),
+    }
+
+def record_codes(window, starts, lengths, code_position):
+    """Record type code of each line, as a fixed-size bytes array (blank past the line end)."""
+    offset, width = code_position
+    code_offsets = np.arange(offset, offset + width)
+    positions = starts[:, None] + code_offsets
+    inside = code_offsets < lengths[:, None]
+    code_bytes = np.where(inside, window[np.minimum(positions, len(window) - 1)], SPACE).astype(np.uint8)
+    return code_bytes.view(f"S{width}").ravel()
+
+def demultiplex(data, code_position, layouts, batch_size=DEFAULT_BATCH_SIZE, result=None, mapped=None):
+    """Yield (code, record batch) for each layout of each window of a file held in a uint8 array.
+
+    When result is given, the lines, the records of each layout, the unknown
+    codes and the records of another length than their layout are counted in
+    it.
+    """
+    record_length = max(layout["record_length"] for layout in layouts.values())
+    codes_bytes = {code: code.encode() for code in layouts}
+    for window, starts, lengths in line_windows(data, batch_size, batch_size * (record_length + 2), mapped=mapped):
+        codes = record_codes(window, starts, lengths, code_position)
+        routed = np.zeros(len(codes), dtype=bool)
+        for code, layout in layouts.items():
+            selected = np.flatnonzero(codes == codes_bytes[code])
+            if not len(selected):
+                continue
+            routed[selected] = True
+            if result is not None:
+                result["layouts"][layout["name"]] = result["layouts"].get(layout["name"], 0) + len(selected)
+                count_wrong_length(result, f"{layout['name']}:record_length", lengths[selected], layout["record_length"])
+            matrix = record_matrix(window, starts[selected], lengths[selected], layout["record_length"])
+            yield code, pa.RecordBatch.from_arrays([column_array(matrix, column) for column in layout["plan"]], schema=layout["schema"])
+        if result is not None:
+            result["lines"] += len(codes)
+            unknown_codes, counts = np.unique(codes[~routed], return_counts=True)
+            for unknown_code, count in zip(unknown_codes, counts):
+                unknown_code = unknown_code.decode("utf-8", errors="replace")
+                result["unknown"][unknown_code] = result["unknown"].get(unknown_code, 0) + int(count)
+
+def demultiplex_file(path, code_position, layouts, output=None, period=None, date_batch=None, typed_dates=False, batch_size=DEFAULT_BATCH_SIZE,
+                     row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy"):
+    """Split one landing file, each layout written as parquet when output is given.
+
+    Every layout holds at most a row group of typed rows in memory. Returns a
+    report: file, lines, layouts ({table: records}), unknown ({code: lines}),
+    errors, outputs and seconds.
+    """
+    start = time.perf_counter()
+    result = {"file": path, "lines": 0, "layouts": {}, "unknown": {}, "errors": {}, "outputs": {}}
+    if output:
+        date_batch = date_batch or date_batch_of(path)
+        if not date_batch:
+            raise ValueError(f"No date batch for {path}: set --date-batch or use a datebatch=YYYY-MM-DD folder")
+    outputs = {}
+    with mapped_file(path) as (mapped, data):
+        try:
+            for code, batch in demultiplex(data, code_position, layouts, batch_size, result, mapped):
+                if not output:
+                    continue
+                if code not in outputs:
+                    contract_out = layouts[code]["contract_out"]
+                    target = output_path(output, contract_out, period or contract_out["periodicity"][0], date_batch, path)
+                    outputs[code] = open_parquet(contract_out, arrow_schema(contract_out, typed_dates), target, row_group_size, compression)
+                    result["outputs"][layouts[code]["name"]] = target
+                write_batch(outputs[code], batch)
+        except Exception:
+            for parquet_output in outputs.values():
+                parquet_output["writer"].close()
+            raise
+    for parquet_output in outputs.values():
+        close_parquet(parquet_output)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="+", help="local or s3:// files to split, or a comma separated list")
+    parser.add_argument("--layouts", required=True, help="cfg_glue_<project>_layout-template.yaml")
+    parser.add_argument("--contracts", required=True, help="folder of the STG_*_IN.yaml and STG_*_OUT.yaml contracts")
+    parser.add_argument("--cfg", help="cfg_glue_<project>.yaml holding the date and decimal formats")
+    parser.add_argument("--file-id", help="file_id of the --files")
+    parser.add_argument("--project", required=True)
+    parser.add_argument("--jv", required=True)
+    parser.add_argument("--output", help="project folder of the standard bucket, to write parquet")
+    parser.add_argument("--period", help="periodicity folder, default the first periodicity of each contract")
+    parser.add_argument("--date-batch", help="date batch partition, default the datebatch= folder of each file")
+    parser.add_argument("--dates", choices=["text", "typed"], default="text", help="keep dates as text or write date32/timestamp")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="lines per window")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="records per parquet row group")
+    parser.add_argument("--compression", default="snappy", help="snappy, zstd, gzip or none")
+    add_job_arguments(parser)
+    args, _ = parser.parse_known_args()
+    if args.files and not args.file_id:
+        parser.error("--files need their --file-id")
+
+    results = []
+    for contract, paths in job_inputs(args, "_IN.yaml", key="file_id"):
+        file_id = args.file_id or contract["file_id"]
+        code_position, layouts = load_layouts(args.layouts, file_id, args.contracts, args.cfg, args.project, args.jv)
+        results += [
+            demultiplex_file(path, code_position, layouts, args.output, args.period, args.date_batch, args.dates == "typed",
+                             args.batch_size, args.row_group_size, args.compression)
+            for path in paths
+        ]
+    print(json.dumps(results, indent=2))
+    if any(result["errors"] or result["unknown"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
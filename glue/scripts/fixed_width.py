@@ -0,0 +1,228 @@
+"""Fixed-width (mainframe) file reader for the multi layout contracts.
+
+Reference implementation of the slicing of the int-s3-structure-check-layout
+Glue job. The Length of the contract columns is compiled into a slice plan
+(byte offset and width of each column); the file is memory-mapped and cut in
+windows of records, each window seen as a records x record length byte
+matrix, and each column is one slice of that matrix turned into an Arrow
+string array. No record is sliced line by line in Python.
+
+    python glue/scripts/fixed_width.py --contract glue/config/lsi/STG_LSI_FIX_29_OUT.yaml \\
+        --cfg glue/config/cfg_glue_ekip-lsi.yaml --output s3://s3b-dlz-dev-standard-lsi-ekip/ekip-lsi \\
+        --files landing/periodicity=daily/datebatch=2024-06-30/LSI_FIX_29.txt
+
+Offsets are byte offsets, so files are expected in a single byte or UTF-8
+encoding with LF or CRLF line ends; s3:// files are downloaded to the local
+disk first to be memory-mapped. Without --output, the files are only read and
+the record counts printed; with it, they are written as parquet like
+csv_to_parquet.py, which also resolves the files of a Glue run.
+"""
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contract import add_job_arguments, is_true, job_inputs
+from csv_to_parquet import DEFAULT_ROW_GROUP_SIZE, arrow_schema, date_batch_of, output_path, write_parquet
+
+DEFAULT_BATCH_SIZE = 100000
+LF, CR, SPACE = 10, 13, 32
+
+def slice_plan(contract):
+    """Compile the contract columns into [{name, offset, width, trim}], offsets in bytes.
+
+    Text columns keep their leading spaces, the other columns are right
+    aligned on the mainframe and trimmed on both sides.
+    """
+    plan = []
+    offset = 0
+    for spec in contract["specs"]:
+        if spec["length"] is None:
+            raise ValueError(f"Column {spec['name']} has no Length, the fixed-width layout cannot be compiled")
+        plan.append({"name": spec["name"], "offset": offset, "width": spec["length"], "trim": "rtrim" if spec["kind"] == "varchar" else "trim"})
+        offset += spec["length"]
+    return plan
+
+@contextlib.contextmanager
+def mapped_file(path):
+    """Memory-map a local or s3:// file as a read-only uint8 array."""
+    with contextlib.ExitStack() as stack:
+        if path.startswith("s3://"):
+            import boto3
+            bucket, _, key = path[len("s3://"):].partition("/")
+            local_file = stack.enter_context(tempfile.NamedTemporaryFile(suffix=os.path.basename(key)))
+            boto3.client("s3").download_fileobj(bucket, key, local_file)
+            local_file.flush()
+            path = local_file.name
+        file = stack.enter_context(open(path, "rb"))
+        if os.fstat(file.fileno()).st_size == 0:
+            yield None, np.empty(0, dtype=np.uint8)
+            return
+        # Not closed here: the mapping is released with the last array over it
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        yield mapped, np.frombuffer(mapped, dtype=np.uint8)
+
+def split_lines(window, at_end, max_lines):
+    """Locate at most max_lines lines of a byte window.
+
+    Returns the line starts, the line lengths without the LF/CRLF and the
+    number of bytes consumed; an unterminated last line only counts at the
+    end of the file.
+    """
+    ends = np.flatnonzero(window == LF)
+    if at_end and len(window) and window[-1] != LF:
+        ends = np.append(ends, len(window))
+    ends = ends[:max_lines]
+    if not len(ends):
+        return ends, ends, 0
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    lengths -= (lengths > 0) & (window[np.maximum(ends - 1, 0)] == CR)
+    return starts, lengths, min(int(ends[-1]) + 1, len(window))
+
+def record_matrix(window, starts, lengths, record_length):
+    """View the lines of a window as a records x record_length byte matrix.
+
+    When every line has the record length (the normal case) the matrix is a
+    strided view of the mapped file; otherwise short lines are padded with
+    spaces and long ones cut.
+    """
+    count = len(starts)
+    stride = int(starts[1] - starts[0]) if count > 1 else record_length + 1
+    if (lengths == record_length).all() and (count == 1 or (np.diff(starts) == stride).all()):
+        return np.lib.stride_tricks.as_strided(window[starts[0]:], shape=(count, record_length), strides=(stride, 1))
+    if starts[-1] + record_length > len(window):
+        window = np.concatenate([window, np.full(record_length, SPACE, dtype=np.uint8)])
+    matrix = np.lib.stride_tricks.sliding_window_view(window, record_length)[starts]
+    outside = np.arange(record_length) >= lengths[:, None]
+    if outside.any():
+        matrix[outside] = SPACE
+    return matrix
+
+def column_array(matrix, column):
+    """Arrow string array of one column of a record matrix, trimmed."""
+    count = len(matrix)
+    values = np.ascontiguousarray(matrix[:, column["offset"]:column["offset"] + column["width"]])
+    offsets = np.arange(0, (count + 1) * column["width"], column["width"], dtype=np.int32)
+    array = pa.StringArray.from_buffers(count, pa.py_buffer(offsets), pa.py_buffer(values))
+    array.validate(full=True)
+    if column["trim"] == "rtrim":
+        return pc.utf8_rtrim(array, characters=" ")
+    return pc.utf8_trim(array, characters=" ")
+
+def line_windows(data, batch_size, window_bytes, header=False, footer=False, mapped=None):
+    """Yield (window, line starts, line lengths) for at most batch_size lines at a time.
+
+    Skips the header and footer lines when set. Pages already yielded are
+    released from the mapping.
+    """
+    position = 0
+    if header:
+        header_end = np.flatnonzero(data[:window_bytes] == LF)
+        position = int(header_end[0]) + 1 if len(header_end) else len(data)
+    while position < len(data):
+        window = data[position:position + window_bytes]
+        at_end = position + len(window) >= len(data)
+        starts, lengths, consumed = split_lines(window, at_end, batch_size)
+        if not consumed:
+            # A line longer than the window
+            window_bytes *= 2
+            continue
+        if footer and position + consumed >= len(data):
+            starts, lengths = starts[:-1], lengths[:-1]
+        if len(starts):
+            yield window, starts, lengths
+        if mapped is not None and hasattr(mmap, "MADV_DONTNEED"):
+            page_start = position - position % mmap.PAGESIZE
+            mapped.madvise(mmap.MADV_DONTNEED, page_start, position + consumed - page_start)
+        position += consumed
+
+def count_wrong_length(result, check, lengths, record_length):
+    """Count the lines of another length than the record in result["errors"][check]."""
+    wrong_length = int((lengths != record_length).sum())
+    if wrong_length:
+        errors = result.setdefault("errors", {})
+        errors[check] = errors.get(check, 0) + wrong_length
+
+def read_fixed_width(data, contract, batch_size=DEFAULT_BATCH_SIZE, result=None, mapped=None):
+    """Yield the Arrow record batches of a fixed-width file held in a uint8 array.
+
+    Honours the header and footer of the contract. When result is given, the
+    records and the lines of another length than the record are counted in
+    result["records"] and result["errors"]["*:record_length"].
+    """
+    plan = slice_plan(contract)
+    record_length = sum(column["width"] for column in plan)
+    schema = pa.schema([pa.field(column["name"], pa.string()) for column in plan])
+    windows = line_windows(data, batch_size, batch_size * (record_length + 2), is_true(contract.get("header")), is_true(contract.get("footer")), mapped)
+    for window, starts, lengths in windows:
+        if result is not None:
+            result["records"] = result.get("records", 0) + len(starts)
+            count_wrong_length(result, "*:record_length", lengths, record_length)
+        matrix = record_matrix(window, starts, lengths, record_length)
+        yield pa.RecordBatch.from_arrays([column_array(matrix, column) for column in plan], schema=schema)
+
+def read_file(path, contract, output=None, period=None, date_batch=None, typed_dates=False, batch_size=DEFAULT_BATCH_SIZE,
+              row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy", use_dictionary=True):
+    """Read one fixed-width file, written as parquet when output is given.
+
+    Returns a report: file, records, errors, output and row_groups when
+    written, and seconds.
+    """
+    start = time.perf_counter()
+    result = {"file": path, "records": 0, "errors": {}}
+    with mapped_file(path) as (mapped, data):
+        batches = read_fixed_width(data, contract, batch_size, result, mapped)
+        if output:
+            date_batch = date_batch or date_batch_of(path)
+            if not date_batch:
+                raise ValueError(f"No date batch for {path}: set --date-batch or use a datebatch=YYYY-MM-DD folder")
+            result["output"] = output_path(output, contract, period, date_batch, path)
+            written = write_parquet(batches, contract, arrow_schema(contract, typed_dates), result["output"], row_group_size, compression, use_dictionary)
+            result["row_groups"] = written["row_groups"]
+        else:
+            for _ in batches:
+                pass
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="+", help="local or s3:// files to read, or a comma separated list")
+    parser.add_argument("--contract", help="STG_*_OUT.yaml of the files")
+    parser.add_argument("--contracts", help="folder of the STG_*_OUT.yaml contracts of the notified files")
+    add_job_arguments(parser)
+    parser.add_argument("--cfg", help="cfg_glue_<project>.yaml holding the date and decimal formats")
+    parser.add_argument("--output", help="project folder of the standard bucket, to write parquet")
+    parser.add_argument("--period", help="periodicity folder, default the first periodicity of the contract")
+    parser.add_argument("--date-batch", help="date batch partition, default the datebatch= folder of each file")
+    parser.add_argument("--dates", choices=["text", "typed"], default="text", help="keep dates as text or write date32/timestamp")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="records per Arrow record batch")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="records per parquet row group")
+    parser.add_argument("--compression", default="snappy", help="snappy, zstd, gzip or none")
+    args, _ = parser.parse_known_args()
+
+    results = [
+        read_file(path, contract, args.output, args.period or contract["periodicity"][0], args.date_batch, args.dates == "typed",
+                  args.batch_size, args.row_group_size, args.compression)
+        for contract, paths in job_inputs(args, "_OUT.yaml")
+        for path in paths
+    ]
+    print(json.dumps(results, indent=2))
+    if any(result["errors"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Structure check of landing files against their STG_*_IN.yaml contract.
+
+Reference implementation of the int-s3-structure-check Glue job: files are
+streamed in bounded chunks and every check runs vectorized on a whole chunk
+(column count, type and length, mandatory, LOV membership). Files are
+checked in parallel on a process pool.
+
+    python glue/scripts/structure_check.py --contract glue/config/lsi/STG_LSI_FIX_29_IN.yaml \\
+        --cfg glue/config/cfg_glue_ekip-lsi.yaml --workers 4 --files landing/*.csv
+
+In Glue the job arguments are --notification, --contracts (the s3:// folder
+of the contracts), --landing and --cfg: the files of the notified date batch
+are checked against the STG_*_IN.yaml of their file_code (see
+contract.job_inputs); unknown Glue arguments are ignored.
+Prints a JSON report and exits with 1 if a file is invalid.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contract import add_job_arguments, decimal_pattern, job_inputs, open_input, read_chunks, strftime_format
+
+# Record numbers kept per failing check
+MAX_SAMPLES = 5
+
+def invalid_values(values, spec, contract):
+    """Boolean mask of the values that do not match the column type."""
+    if spec["kind"] == "decimal":
+        return ~values.str.fullmatch(decimal_pattern(spec, contract["decimal_format"])).to_numpy(dtype=bool)
+    if spec["kind"] == "integer":
+        return ~values.str.fullmatch(r"[-+]?\d+").to_numpy(dtype=bool)
+    if spec["kind"] in ("date", "timestamp"):
+        date_format = strftime_format(contract["date_format"])
+        if spec["kind"] == "timestamp":
+            date_format += " %H:%M:%S"
+        return pd.to_datetime(values, format=date_format, errors="coerce").isna().to_numpy(dtype=bool)
+    return None
+
+def column_failures(column, spec, contract):
+    """Return {check: boolean mask of the failing rows} for one column."""
+    lengths = np.fromiter(map(len, column), dtype=np.int64, count=len(column))
+    filled = lengths > 0
+    failures = {}
+    if spec["mandatory"]:
+        failures["mandatory"] = ~filled
+    if spec["length"] is not None:
+        failures["length"] = lengths > spec["length"]
+
+    if spec["kind"] != "varchar" or spec["lov"]:
+        # Dates, amounts and codes repeat a lot: check each distinct value once
+        codes, uniques = pd.factorize(np.asarray(column, dtype=object))
+        uniques = pd.Series(uniques, dtype=object)
+        invalid = invalid_values(uniques, spec, contract)
+        if invalid is not None:
+            failures["type"] = filled & invalid[codes]
+        if spec["lov"]:
+            failures["lov"] = filled & ~uniques.isin(spec["lov"]).to_numpy(dtype=bool)[codes]
+    return failures
+
+def add_failures(result, check, mask, first_record, record_index=None):
+    """Count the failing rows of a check and keep a few record numbers."""
+    positions = np.flatnonzero(mask)
+    if not len(positions):
+        return
+    result["errors"][check] = result["errors"].get(check, 0) + len(positions)
+    samples = result["samples"].setdefault(check, [])
+    if len(samples) < MAX_SAMPLES:
+        positions = positions[:MAX_SAMPLES - len(samples)]
+        if record_index is not None:
+            positions = record_index[positions]
+        samples.extend(int(first_record + position) for position in positions)
+
+def check_chunk(rows, contract, first_record, result):
+    """Run every check of the contract on a chunk of rows."""
+    specs = contract["specs"]
+    field_counts = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    wrong_count = field_counts != len(specs)
+    add_failures(result, "*:column_count", wrong_count, first_record)
+    if wrong_count.any():
+        record_index = np.flatnonzero(~wrong_count)
+        rows = [rows[position] for position in record_index]
+    else:
+        record_index = None
+    if not rows:
+        return
+
+    for spec, column in zip(specs, zip(*rows)):
+        for check, mask in column_failures(column, spec, contract).items():
+            add_failures(result, f"{spec['name']}:{check}", mask, first_record, record_index)
+
+def check_file(path, contract, chunk_size=100000, encoding="utf-8"):
+    """Check one file, streamed chunk by chunk.
+
+    Returns a report: file, records, errors ({column:check: failing rows}),
+    samples (first failing record numbers), valid and seconds.
+    """
+    start = time.perf_counter()
+    result = {"file": path, "records": 0, "errors": {}, "samples": {}}
+    try:
+        with open_input(path, encoding) as stream:
+            for first_record, rows in read_chunks(stream, contract, chunk_size):
+                check_chunk(rows, contract, first_record, result)
+                result["records"] += len(rows)
+    except Exception as e:
+        result["errors"]["*:read"] = 1
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["valid"] = not result["errors"]
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def check_files(paths, contract, workers=1, chunk_size=100000, encoding="utf-8"):
+    """Check files in parallel on a bounded process pool, keeping their order."""
+    workers = max(1, min(workers, len(paths)))
+    if workers == 1:
+        return [check_file(path, contract, chunk_size, encoding) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(check_file, paths, [contract] * len(paths), [chunk_size] * len(paths), [encoding] * len(paths)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="+", help="local or s3:// files to check, or a comma separated list")
+    parser.add_argument("--contract", help="STG_*_IN.yaml of the files")
+    parser.add_argument("--contracts", help="folder of the STG_*_IN.yaml contracts of the notified files")
+    add_job_arguments(parser)
+    parser.add_argument("--cfg", help="cfg_glue_<project>.yaml holding the date and decimal formats")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=100000, help="records held in memory per file")
+    parser.add_argument("--encoding", default="utf-8")
+    args, _ = parser.parse_known_args()
+
+    results = [
+        result
+        for contract, paths in job_inputs(args, "_IN.yaml")
+        for result in check_files(paths, contract, args.workers, args.chunk_size, args.encoding)
+    ]
+    print(json.dumps(results, indent=2))
+    if not all(result["valid"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""Structure check and parquet conversion of landing files in a single pass.
+
+Reference implementation of the fused int-s3-validate-convert Glue job: each
+record batch read by csv_to_parquet.read_batches is checked against the
+STG_*_OUT.yaml contract (column count, type and length, mandatory, LOV) with
+Arrow compute kernels. Valid rows are typed and written to
+<output>/<period>/<table>/date_batch=<date batch>/, and rejected rows to the
+same layout under --quarantine (default <output>/quarantine). The rejected
+rows keep their values as text, plus their _line in the file, the failed
+checks in _errors, and the raw _text of the rows of another column count.
+
+    python glue/scripts/validate_convert.py --contract glue/config/lsi/STG_LSI_FIX_29_OUT.yaml \\
+        --cfg glue/config/cfg_glue_ekip-lsi.yaml --output s3://s3b-dlz-dev-standard-lsi-ekip/ekip-lsi \\
+        --files landing/periodicity=daily/datebatch=2024-06-30/LSI_FIX_29.csv
+
+In Glue the files are the ones of the --notification of the run, each with
+the STG_*_OUT.yaml of its file_code in --contracts (see contract.job_inputs).
+--skip-processed true skips the files converted by a previous run, as in
+csv_to_parquet.py; the files are not grouped, the rejected lines being
+numbered within their file.
+Prints a JSON report and exits with 1 when the rejected share of a file is
+above --max-rejected-ratio (default 0: any rejected row fails the job once
+the file has been processed).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import fs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from contract import add_job_arguments, decimal_pattern, is_true, job_inputs, strftime_format
+from csv_to_parquet import (DEFAULT_BLOCK_SIZE, DEFAULT_ROW_GROUP_SIZE, arrow_schema, close_parquet, file_date_batch, open_parquet,
+                            output_path, read_batches, record_processed, unprocessed_files, write_batch)
+
+# Line numbers kept per failing check
+MAX_SAMPLES = 5
+
+def quarantine_schema(contract):
+    """Schema of the rejected rows: the contract columns as text and the rejection details."""
+    fields = [pa.field(spec["name"], pa.string()) for spec in contract["specs"]]
+    return pa.schema(fields + [pa.field("_line", pa.int64()), pa.field("_errors", pa.string()), pa.field("_text", pa.string())])
+
+def valid_dates(column, date_format):
+    """Boolean mask of the values of a string column that are dates of date_format (strftime).
+
+    Arrow strptime rolls impossible days over (31/02 becomes 02/03): the
+    parsed values not written back as read are checked again with datetime.
+    """
+    parsed = pc.strptime(column, format=date_format, unit="s", error_is_null=True)
+    valid = np.array(pc.is_valid(parsed).to_numpy(zero_copy_only=False))
+    same = pc.fill_null(pc.equal(pc.strftime(parsed, format=date_format), column), False).to_numpy(zero_copy_only=False)
+    for position in np.flatnonzero(valid & ~same):
+        try:
+            datetime.strptime(column[int(position)].as_py(), date_format)
+        except ValueError:
+            valid[position] = False
+    return valid
+
+def batch_failures(batch, contract):
+    """Return {column:check: boolean mask of the failing rows} for a record batch of strings."""
+    failures = {}
+    for spec, column in zip(contract["specs"], batch.columns):
+        lengths = pc.utf8_length(column).to_numpy()
+        filled = lengths > 0
+        if spec["mandatory"]:
+            failures[f"{spec['name']}:mandatory"] = ~filled
+        if spec["length"] is not None:
+            failures[f"{spec['name']}:length"] = lengths > spec["length"]
+
+        if spec["kind"] == "decimal":
+            matches = pc.match_substring_regex(column, f"^(?:{decimal_pattern(spec, contract['decimal_format'])})$").to_numpy(zero_copy_only=False)
+        elif spec["kind"] == "integer":
+            matches = pc.match_substring_regex(column, r"^[-+]?\d+$").to_numpy(zero_copy_only=False)
+        elif spec["kind"] in ("date", "timestamp"):
+            date_format = strftime_format(contract["date_format"])
+            if spec["kind"] == "timestamp":
+                date_format += " %H:%M:%S"
+            matches = valid_dates(column, date_format)
+        else:
+            matches = None
+        if matches is not None:
+            failures[f"{spec['name']}:type"] = filled & ~matches
+
+        if spec["lov"]:
+            in_lov = pc.is_in(column, value_set=pa.array(spec["lov"], pa.string())).to_numpy(zero_copy_only=False)
+            failures[f"{spec['name']}:lov"] = filled & ~in_lov
+    return failures
+
+def file_lines(ordinals, header_lines, skipped_lines):
+    """Line numbers in the file of parsed rows, from their ordinal and the skipped lines.
+
+    skipped_lines is the sorted array of the lines skipped by the reader so
+    far; the skipped lines after a row do not change its line number.
+    """
+    lines = ordinals + 1 + header_lines
+    return lines + np.searchsorted(skipped_lines - np.arange(len(skipped_lines)), lines, side="right")
+
+def add_failure(result, check, lines):
+    """Count the failing rows of a check and keep a few line numbers."""
+    result["errors"][check] = result["errors"].get(check, 0) + len(lines)
+    samples = result["samples"].setdefault(check, [])
+    samples.extend(int(line) for line in lines[:MAX_SAMPLES - len(samples)])
+
+def quarantine_invalid_rows(quarantine, invalid_rows, schema, result):
+    """Write the rows of another column count to the quarantine output."""
+    if not invalid_rows:
+        return
+    lines = np.array([line for line, _ in invalid_rows], dtype=np.int64)
+    add_failure(result, "*:column_count", lines)
+    arrays = [pa.nulls(len(invalid_rows), pa.string()) for _ in schema.names[:-3]]
+    arrays += [pa.array(lines), pa.array(["*:column_count"] * len(invalid_rows)), pa.array([text for _, text in invalid_rows], pa.string())]
+    write_batch(quarantine, pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+def validate_convert_file(path, contract, output, period, quarantine_root=None, date_batch=None, typed_dates=False,
+                          block_size=DEFAULT_BLOCK_SIZE, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression="snappy", use_dictionary=True,
+                          processed=None):
+    """Check and convert one file in a single streaming pass.
+
+    When processed ({file: size}) is given, the file is recorded as processed
+    once its outputs are closed.
+    Returns a report: file, records, valid and rejected rows, errors
+    ({column:check: failing rows}), samples (first failing line numbers),
+    output, quarantine and seconds.
+    """
+    start = time.perf_counter()
+    date_batch = file_date_batch(path, date_batch)
+    quarantine_root = quarantine_root or f"{output.rstrip('/')}/quarantine"
+    result = {
+        "file": path, "records": 0, "valid_records": 0, "rejected_records": 0, "errors": {}, "samples": {},
+        "output": output_path(output, contract, period, date_batch, path),
+        "quarantine": None,
+    }
+    header_lines = 1 if is_true(contract.get("header")) else 0
+    schema = quarantine_schema(contract)
+    parquet = open_parquet(contract, arrow_schema(contract, typed_dates), result["output"], row_group_size, compression, use_dictionary)
+    quarantine = {}
+    invalid_rows = []
+    skipped_lines = np.empty(0, dtype=np.int64)
+    ordinal = 0
+
+    def quarantine_output():
+        if not quarantine:
+            result["quarantine"] = output_path(quarantine_root, contract, period, date_batch, path)
+            quarantine.update(open_parquet(None, schema, result["quarantine"], row_group_size, compression))
+        return quarantine
+
+    input_fs, input_path = fs.FileSystem.from_uri(path if "://" in path else os.path.abspath(path))
+    with input_fs.open_input_stream(input_path) as input_file:
+        for batch in read_batches(input_file, contract, block_size, invalid_rows):
+            # The last invalid row may be the footer, only known at the end of the file
+            pending = invalid_rows[:-1]
+            del invalid_rows[:-1]
+            if pending:
+                skipped_lines = np.append(skipped_lines, [line for line, _ in pending])
+                quarantine_invalid_rows(quarantine_output(), pending, schema, result)
+
+            failures = batch_failures(batch, contract)
+            rejected = np.logical_or.reduce(list(failures.values())) if failures else np.zeros(batch.num_rows, dtype=bool)
+            if rejected.any():
+                positions = np.flatnonzero(rejected)
+                lines = file_lines(ordinal + positions, header_lines, np.append(skipped_lines, [line for line, _ in invalid_rows]))
+                errors = np.full(len(positions), "", dtype=object)
+                for check, mask in failures.items():
+                    failing = mask[positions]
+                    if failing.any():
+                        add_failure(result, check, lines[failing])
+                        errors[failing] += check + ","
+                arrays = batch.filter(pa.array(rejected)).columns
+                arrays += [pa.array(lines), pa.array([error.rstrip(",") for error in errors], pa.string()), pa.nulls(len(positions), pa.string())]
+                write_batch(quarantine_output(), pa.RecordBatch.from_arrays(arrays, schema=schema))
+                batch = batch.filter(pa.array(~rejected))
+            if batch.num_rows:
+                write_batch(parquet, batch)
+            ordinal += len(rejected)
+        quarantine_invalid_rows(quarantine_output() if invalid_rows else None, invalid_rows, schema, result)
+
+    result["valid_records"] = close_parquet(parquet)["records"]
+    if quarantine:
+        result["rejected_records"] = close_parquet(quarantine)["records"]
+    result["records"] = result["valid_records"] + result["rejected_records"]
+    if processed is not None:
+        record_processed(output, contract, period, date_batch, result["output"], processed)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def validate_convert_files(paths, contract, output, period, workers=1, skip_processed=False, **options):
+    """Check and convert files in parallel on a bounded process pool, keeping their order.
+
+    With skip_processed the files converted by a previous run are left out
+    and the converted ones recorded.
+    """
+    sizes = unprocessed_files(paths, contract, output, period, options.get("date_batch")) if skip_processed else {}
+    tasks = [(path, {path: sizes[path]} if skip_processed else None) for path in (list(sizes) if skip_processed else paths)]
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        return [validate_convert_file(path, contract, output, period, processed=processed, **options) for path, processed in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(validate_convert_file, path, contract, output, period, processed=processed, **options)
+                   for path, processed in tasks]
+        return [future.result() for future in futures]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", nargs="+", help="local or s3:// files to check and convert, or a comma separated list")
+    parser.add_argument("--contract", help="STG_*_OUT.yaml of the files")
+    parser.add_argument("--contracts", help="folder of the STG_*_OUT.yaml contracts of the notified files")
+    add_job_arguments(parser)
+    parser.add_argument("--cfg", help="cfg_glue_<project>.yaml holding the date and decimal formats")
+    parser.add_argument("--output", required=True, help="project folder of the standard bucket")
+    parser.add_argument("--quarantine", help="folder of the rejected rows, default <output>/quarantine")
+    parser.add_argument("--max-rejected-ratio", type=float, default=0.0, help="share of rejected rows above which the job fails")
+    parser.add_argument("--period", help="periodicity folder, default the first periodicity of the contract")
+    parser.add_argument("--date-batch", help="date batch partition, default the datebatch= folder of each file")
+    parser.add_argument("--dates", choices=["text", "typed"], default="text", help="keep dates as text or write date32/timestamp")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE, help="bytes read per record batch")
+    parser.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE, help="records per parquet row group")
+    parser.add_argument("--compression", default="snappy", help="snappy, zstd, gzip or none")
+    parser.add_argument("--skip-processed", default="false", help="true to skip the files converted by a previous run")
+    args, _ = parser.parse_known_args()
+
+    results = []
+    for contract, paths in job_inputs(args, "_OUT.yaml"):
+        results += validate_convert_files(
+            paths, contract, args.output, args.period or contract["periodicity"][0], args.workers, is_true(args.skip_processed),
+            quarantine_root=args.quarantine, date_batch=args.date_batch, typed_dates=args.dates == "typed",
+            block_size=args.block_size, row_group_size=args.row_group_size, compression=args.compression,
+        )
+    print(json.dumps(results, indent=2))
+    if any(result["rejected_records"] > args.max_rejected_ratio * result["records"] for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,54 @@
+import argparse
+import gzip
+import hashlib
+import json
+import pickle
 import yaml
 from ruamel.yaml import YAML
 import openpyxl
 import os
-import pandas as pd
 import warnings
 import re
+import zipfile
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 
 warnings.filterwarnings('ignore', category=UserWarning, module='openpyxl')
 
 def load_list_of_value(workbook):
-    """Load the columns accepted values"""
+    """Load the columns accepted values.
+
+    Returns an index {(FIELD, COUNTRY): [LOV, ...]} built in a single pass
+    over the sheet, values kept in sheet order.
+    """
     lov = workbook["List of value"]
-    
+    lov_index = {}
+
     if lov:
-        lov_df = pd.DataFrame(lov.values)
-        if lov_df.shape[1] >= 3:
-            lov_df = lov_df.iloc[:, :3]
-            lov_df.columns = ['FIELD', 'LOV', 'COUNTRY']
-            lov_df = lov_df.iloc[1:]        
-            lov_grouped_df = lov_df.groupby(['FIELD', 'COUNTRY'])['LOV'].agg(list).reset_index()
-            return lov_grouped_df
-    
-    return pd.DataFrame(columns=['FIELD', 'COUNTRY', 'LOV'])
+        for row in lov.iter_rows(min_row=2, values_only=True):
+            if len(row) < 3:
+                break
+            field, value, country = row[:3]
+            if field is None or country is None:
+                continue
+            lov_index.setdefault((field, country), []).append(value)
+
+    return lov_index
+
+def resolve_list_of_value(lov_index, jv):
+    """Resolve the accepted values of each field for a jv.
+
+    Values defined for ALL countries win over the jv specific ones, so that
+    each column needs a single lookup in the returned {FIELD: [LOV, ...]}.
+    """
+    resolved = {}
+    for (field, country), values in lov_index.items():
+        if country == 'ALL':
+            resolved[field] = values
+        elif country == jv.upper():
+            resolved.setdefault(field, values)
+    return resolved
+
 def cfg_layout(layout_list,project):
     yaml_content = {}
     for file_info in layout_list:
@@ -31,8 +58,10 @@ def cfg_layout(layout_list,project):
         yaml_content[file_id].update(file_info)
 
     write_to_yaml_cfg(yaml_content, f"glue/config/cfg_glue_{project}_layout-template.yaml")
+    return yaml_content
 
-def cfg_format(sheet,project,file_list):
+def load_date_formats(sheet,file_list):
+    """Load the date formats of the 'Rules' sheet, per file_id or default."""
     # Catch file_id in file_list
     unique_file_id = set()
     for item in file_list:
@@ -76,10 +105,14 @@ def cfg_format(sheet,project,file_list):
                         }
 
     if default: yaml_content=yaml_content_default
-    
-    write_to_yaml_cfg(yaml_content, f"glue/config/cfg_glue_{project}.yaml")
+    return yaml_content
+
+def cfg_format(data_format,project):
+    write_to_yaml_cfg(data_format, f"glue/config/cfg_glue_{project}.yaml")
+    return data_format
 
-def cfg_mapping(sheet,project):
+def load_mapping(sheet):
+    """Load the file_id to file_code mapping of the 'Files list' sheet."""
     yaml_content = {}
     
     for row in sheet.iter_rows(min_row=5, values_only=True):
@@ -89,8 +122,11 @@ def cfg_mapping(sheet,project):
         file_code = row[2]
         file_id = row[1]
         yaml_content[file_id] = file_code
+    return yaml_content
 
-    write_to_yaml_cfg(yaml_content, f"glue/config/cfg_glue_{project}_mapping.yaml")
+def cfg_mapping(mapping,project):
+    write_to_yaml_cfg(mapping, f"glue/config/cfg_glue_{project}_mapping.yaml")
+    return mapping
 
 
 def extract_table_structure(sheet, sheet_name, list_of_value,jv):
@@ -140,9 +176,7 @@ def extract_table_structure(sheet, sheet_name, list_of_value,jv):
         if 'TIMESTAMP' in mapped_type.upper():
             mapped_type = 'timestamp'
         
-        lov = list_of_value.loc[(list_of_value['FIELD'] == column_name) & (list_of_value['COUNTRY'] == 'ALL'), 'LOV'].tolist()
-        if lov == None:
-            lov = list_of_value.loc[(list_of_value['FIELD'] == column_name) & (list_of_value['COUNTRY'] == jv.upper()), 'LOV'].tolist()
+        lov = [list_of_value[column_name]] if column_name in list_of_value else []
         columns_temp.append({"position": column_position, "name": column_name, "type": mapped_type, "PrimaryKey":column_pk,"Mandatory":column_mandatory,"Length":column_precision, "LOV": lov, "Protected": column_protected, "AnonymizationRule": columns_anonymization_rule})
 
 
@@ -158,7 +192,9 @@ def get_table_structure_from_excel(workbook, sheet_name, list_of_value,jv):
     """Access the specified sheet and extract the table structure."""
     try:
         sheet = workbook[sheet_name]
-        if sheet["A8"].value != "Field" and sheet["A7"].value != "Field":
+        # Read A7:A8 with iter_rows, cell access re-parses the sheet in read-only mode
+        header_cells = [row[0] for row in sheet.iter_rows(min_row=7, max_row=8, max_col=1, values_only=True)]
+        if "Field" not in header_cells:
             return None
         return extract_table_structure(sheet, sheet_name, list_of_value,jv)
     except KeyError:
@@ -175,14 +211,23 @@ def write_to_yaml(data, file_path):
         print(f"Error writing to {file_path}: {e}")
 
 def write_to_yaml_cfg(data, file_path):
-    """Write the data to a YAML file."""
+    """Write the data to a YAML file, left untouched if its content is unchanged."""
     #yaml = YAML(typ="safe", pure=True)
     try:
+        content = yaml.dump(data, allow_unicode=True, default_style="'", default_flow_style=False)
+        if os.path.exists(file_path):
+            with open(file_path, "r") as file:
+                if file.read() == content:
+                    return
         with open(file_path, "w") as file:
-            yaml.dump(data, file, allow_unicode=True, default_style="'", default_flow_style=False)
+            file.write(content)
     except Exception as e:
         print(f"Error writing to {file_path}: {e}")
 
+def fingerprint(data):
+    """Return a stable sha256 of parsed sheet content."""
+    return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
 def load_configuration(config_path):
     """Load configuration from the YAML file."""
     try:
@@ -195,10 +240,16 @@ def load_configuration(config_path):
         print(f"Error loading configuration file: {e}")
         return None
 
-def load_workbook(excel_file_path):
-    """Load the Excel workbook."""
+def load_workbook(excel_file_path, read_only=True, data_only=False):
+    """Load the Excel workbook.
+
+    read_only streams the sheets instead of building the full DOM, which keeps
+    memory flat on large contracts. The workbook must then be closed.
+    data_only returns the cached values of the formulas, None for the formulas
+    saved without one (see formulas_without_values).
+    """
     try:
-        return openpyxl.load_workbook(excel_file_path)
+        return openpyxl.load_workbook(excel_file_path, read_only=read_only, data_only=data_only)
     except FileNotFoundError:
         print(f"Excel file {excel_file_path} not found.")
         return None
@@ -206,6 +257,41 @@ def load_workbook(excel_file_path):
         print(f"Error loading Excel file: {e}")
         return None
 
+# Cells of a sheet XML (attributes, content), the non empty cached value of a
+# cell and the string type, whose cached value may be empty
+XLSX_CELL = re.compile(rb"<c\b([^>]*)(?<!/)>(.*?)</c>", re.S)
+XLSX_VALUE = re.compile(rb"<v>[^<]")
+XLSX_STRING = re.compile(rb'\bt="str"')
+
+def formulas_without_values(excel_file_path):
+    """Return {sheet name: formula cells without a cached value} of a workbook.
+
+    Excel saves the value of each formula next to it, but a workbook last
+    saved by a tool that does not compute formulas (openpyxl, some exports)
+    has none: with data_only these cells read as None. A string result may be
+    cached empty (t="str" with an empty value). The sheet XML is scanned
+    directly, without loading the workbook.
+    """
+    namespaces = {"main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+                  "rel": "http://schemas.openxmlformats.org/package/2006/relationships"}
+    relationship_id = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+    uncached = {}
+    with zipfile.ZipFile(excel_file_path) as archive:
+        members = set(archive.namelist())
+        targets = {rel.get("Id"): rel.get("Target").lstrip("/") for rel in ET.fromstring(archive.read("xl/_rels/workbook.xml.rels")).findall("rel:Relationship", namespaces)}
+        for sheet in ET.fromstring(archive.read("xl/workbook.xml")).find("main:sheets", namespaces):
+            target = targets.get(sheet.get(relationship_id), "")
+            target = target if target.startswith("xl/") else f"xl/{target}"
+            if target not in members:
+                continue
+            content = archive.read(target)
+            if b"<f" not in content:
+                continue
+            count = sum(1 for cell in XLSX_CELL.finditer(content) if b"<f" in cell.group(2) and not XLSX_VALUE.search(cell.group(2)) and not XLSX_STRING.search(cell.group(1)))
+            if count:
+                uncached[sheet.get("name")] = count
+    return uncached
+
 def process_files_list(sheet, excel_file_path, jv, periodicity_mapping):
     """Process the 'Files list' sheet to extract file details."""
     files_list_tab = []
@@ -213,6 +299,7 @@ def process_files_list(sheet, excel_file_path, jv, periodicity_mapping):
     periodicity_save_dict = {}
     periodicity_save = []
     table_name_output_save = []
+    file_codes = set()
     for row in sheet.iter_rows(min_row=5, values_only=True):
         if not row[2]:
             break  # Stop if file_code is empty
@@ -253,17 +340,13 @@ def process_files_list(sheet, excel_file_path, jv, periodicity_mapping):
         header = row[12]
         footer = row[13]
         quote = row[14]
-        update = False
         file_id = row[1]
         layout_code = 'TO_COMPLETED'
         layout_position = 'StartPosition:StopPosition'
 
-        # Check if file_code already exists in the list and update periodicity
-        for item in files_list_tab:
-            if file_code in item["file_code"]:
-                update = True
-                break
-        if not update :
+        # Check if file_code already exists in the list, its periodicity is updated above
+        if file_code not in file_codes:
+            file_codes.add(file_code)
             files_list_tab.append({
                 "file_id": file_id,
                 "file_code": file_code,
@@ -294,39 +377,323 @@ def process_files_list(sheet, excel_file_path, jv, periodicity_mapping):
             })
     return files_list_tab
 
-def process_all_sheets(workbook, files_list_tab, jv, yaml_output_path, list_of_value,multi_format,config):
-    """Iterate over all sheets in the workbook and process them."""
-    layout_list =[]
-    for sheet_name in workbook.sheetnames:
-        # Next IF must be comment when jv are not in sheetname
-        if '_SF' in sheet_name.upper() :
-            continue
-        if  'TEMPLATE_' in sheet_name.upper() :
-            continue
-        table_structure = get_table_structure_from_excel(workbook, sheet_name, list_of_value,jv)
+def build_files_catalog(files_list_tab):
+    """Index the Files list entries by table_name_output.
+
+    Lookups are exact: FIX_2 and FIX_29 are two distinct files.
+    """
+    return {item["table_name_output"]: item for item in files_list_tab}
+
+def files_for_sheet(catalog, file_name):
+    """Return the Files list entries of a STG_<sheet name> table.
+
+    A sheet without _IN/_OUT suffix describes both the OUT and the IN table.
+    """
+    if file_name in catalog:
+        return [catalog[file_name]]
+    return [catalog[name] for name in (f"{file_name}_OUT", f"{file_name}_IN") if name in catalog]
+
+def extract_sheets(excel_file_path, sheet_names, list_of_value, jv, read_only=True):
+    """Open the workbook and extract the table structure of the given sheets.
+
+    Used as process pool worker: each worker opens its own read-only workbook,
+    with the cached formula values as parse_contract.
+    """
+    workbook = load_workbook(excel_file_path, read_only=read_only, data_only=True)
+    if not workbook:
+        return {}
+    try:
+        return {sheet_name: get_table_structure_from_excel(workbook, sheet_name, list_of_value,jv) for sheet_name in sheet_names}
+    finally:
+        workbook.close()
+
+def extract_sheets_parallel(excel_file_path, sheet_names, list_of_value, jv, workers):
+    """Split the sheet extraction across a pool of processes."""
+    # Round robin so that each worker gets a mix of small and large sheets
+    chunks = [sheet_names[i::workers] for i in range(workers)]
+    chunks = [chunk for chunk in chunks if chunk]
+    structures = {}
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        futures = [executor.submit(extract_sheets, excel_file_path, chunk, list_of_value, jv) for chunk in chunks]
+        for future in futures:
+            structures.update(future.result())
+    return structures
+
+def extract_all_sheets(workbook, files_list_tab, jv, list_of_value, excel_file_path=None, workers=1):
+    """Extract the table structure of every table sheet of the workbook.
+
+    With workers > 1 the sheets are extracted by a process pool reading
+    excel_file_path. Returns {sheet_name: [table_structure, ...]} in sheet
+    order, each structure merged with its Files list entry.
+    """
+    sheet_tables = {}
+    catalog = build_files_catalog(files_list_tab)
+    # Next IF must be comment when jv are not in sheetname
+    sheet_names = [sheet_name for sheet_name in workbook.sheetnames if '_SF' not in sheet_name.upper() and 'TEMPLATE_' not in sheet_name.upper()]
+    structures = None
+    if workers > 1 and excel_file_path and len(sheet_names) > 1:
+        structures = extract_sheets_parallel(excel_file_path, sheet_names, list_of_value, jv, workers)
+
+    for sheet_name in sheet_names:
+        if structures is not None:
+            table_structure = structures[sheet_name]
+        else:
+            table_structure = get_table_structure_from_excel(workbook, sheet_name, list_of_value,jv)
         if table_structure:
             file_name = f'STG_{sheet_name.upper()}'
-            for item in files_list_tab:
-                if file_name in item["table_name_output"] :
-                    table_structure = {**table_structure, **item}
-                    table_name=table_structure["table_name_output"]
-                    yaml_file_path = os.path.join(yaml_output_path, f"{table_name}.yaml")
-                    # Make path if not exists
-                    if not os.path.exists(yaml_output_path):
-                        os.makedirs(yaml_output_path)
-                    write_to_yaml(table_structure, yaml_file_path)
-                    # layout configuration
-                    if multi_format.lower() == 'yes' and table_name.upper().endswith('_IN'):
-                        if table_structure["separator"] is not None :
-                            layout_separator = table_structure["separator"]
-                        else :
-                            layout_separator = '|'
-                        layout_list.append({'file_id': item["file_id"], re.sub('-IN$',f'-{jv.upper()}-IN',table_name.replace(f'STG_{config["project"].upper()}_','').replace(f'_','-')) :  item["layout_code"], 'layout': item["layout_position"], 'delimiter': layout_separator})
+            sheet_tables[sheet_name] = []
+            for item in files_for_sheet(catalog, file_name):
+                table_structure = {**table_structure, **item}
+                sheet_tables[sheet_name].append(table_structure)
+    return sheet_tables
+
+def write_all_sheets(sheet_tables, jv, yaml_output_path, multi_format, config, previous_fingerprints=None):
+    """Write the table YAML and the layout configuration of the extracted sheets.
+
+    Each table sheet is fingerprinted on the table structures it produces
+    (columns, LOV and Files list details); when previous_fingerprints is given
+    the YAML of unchanged sheets is not rewritten.
+    Returns the table structures, keyed by table_name_output, the layout
+    configuration (None when the contract is not multi layout) and the
+    processed sheets as {sheet_name: {"fingerprint": ..., "tables": [...]}}.
+    """
+    layout_list =[]
+    tables = {}
+    layout = None
+    sheets = {}
+    for sheet_name, structures in sheet_tables.items():
+        sheet_fingerprint = fingerprint(structures)
+        sheets[sheet_name] = {"fingerprint": sheet_fingerprint, "tables": [table["table_name_output"] for table in structures]}
+        changed = previous_fingerprints is None or previous_fingerprints.get(sheet_name) != sheet_fingerprint
+        for table_structure in structures:
+            table_name=table_structure["table_name_output"]
+            yaml_file_path = os.path.join(yaml_output_path, f"{table_name}.yaml")
+            # Make path if not exists
+            if not os.path.exists(yaml_output_path):
+                os.makedirs(yaml_output_path)
+            if changed:
+                write_to_yaml(table_structure, yaml_file_path)
+            tables[table_name] = table_structure
+            # layout configuration
+            if multi_format.lower() == 'yes' and table_name.upper().endswith('_IN'):
+                if table_structure["separator"] is not None :
+                    layout_separator = table_structure["separator"]
+                else :
+                    layout_separator = '|'
+                layout_list.append({'file_id': table_structure["file_id"], re.sub('-IN$',f'-{jv.upper()}-IN',table_name.replace(f'STG_{config["project"].upper()}_','').replace(f'_','-')) :  table_structure["layout_code"], 'layout': table_structure["layout_position"], 'delimiter': layout_separator})
 
     if multi_format.lower() == 'yes':
-        cfg_layout(layout_list,project_path.lower())
+        layout = cfg_layout(layout_list,config["project_path"].lower())
+
+    return tables, layout, sheets
+
+def process_all_sheets(workbook, files_list_tab, jv, yaml_output_path, list_of_value,multi_format,config, excel_file_path=None, workers=1, previous_fingerprints=None):
+    """Iterate over all sheets in the workbook and process them.
+
+    See extract_all_sheets and write_all_sheets.
+    """
+    sheet_tables = extract_all_sheets(workbook, files_list_tab, jv, list_of_value, excel_file_path, workers)
+    return write_all_sheets(sheet_tables, jv, yaml_output_path, multi_format, config, previous_fingerprints)
+
+PERIODICITY_MAPPING = {
+    "Quotidien": "daily",
+    "Hebdomadaire": "weekly",
+    "Hebdo": "weekly",
+    "Mensuel": "monthly",
+    "Annuel": "yearly",
+    "w": "weekly",
+    "d": "daily",
+    "y": "yearly",
+    "m": "monthly"
+}
+
+def parse_contract(excel_file_path, jv, workers=1):
+    """Read everything the generation needs from a data contract workbook.
+
+    Returns the Files list entries, the List of value index, the table
+    structures per sheet, the file mapping and the date formats, or None if
+    the workbook or one of its mandatory sheets is missing. Nothing is written.
+    The workbook is opened once, with the cached formula values: the COUNTRY
+    column of the List of value usually refers to the Files list country
+    cell, so the formulas must be resolved for the jv specific values to match.
+    The workbook must therefore be saved by Excel: a ValueError is raised when
+    formulas have no cached value, instead of reading them as empty cells.
+    """
+    workbook = load_workbook(excel_file_path, data_only=True)
+    if not workbook:
+        return None
+
+    try:
+        uncached = formulas_without_values(excel_file_path)
+        if uncached:
+            sheets = ", ".join(f"{sheet_name} ({count})" for sheet_name, count in uncached.items())
+            raise ValueError(f"{excel_file_path} has formulas without cached values in {sheets}: open and save it in Excel before the generation")
+        sheet = workbook["Files list"]
+        if not sheet:
+            print("Sheet 'Files list' not found in the workbook.")
+            return None
+
+        lov_index = load_list_of_value(workbook)
+        list_of_value = resolve_list_of_value(lov_index, jv)
+        files_list_tab = process_files_list(sheet, excel_file_path, jv, PERIODICITY_MAPPING)
+        sheet_tables = extract_all_sheets(workbook, files_list_tab, jv, list_of_value, excel_file_path, workers)
+        mapping = load_mapping(sheet)
+
+        sheet = workbook["Rules"]
+        if not sheet:
+            print("Sheet 'Rules' not found in the workbook.")
+            return None
+        data_format = load_date_formats(sheet,files_list_tab)
+    finally:
+        workbook.close()
+
+    return {
+        "files_list": files_list_tab,
+        "list_of_value": lov_index,
+        "sheet_tables": sheet_tables,
+        "mapping": mapping,
+        "data_format": data_format,
+    }
+
+# Parsed contracts cache, relative to the root folder
+CACHE_FOLDER = os.path.join('.cache', 'contracts')
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+def parser_version():
+    """Fingerprint of this module: a change of the parsing code invalidates the cache."""
+    with open(os.path.abspath(__file__), "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+def contract_cache_key(excel_file_path, jv):
+    """Cache key of a parsed contract: workbook content, parser version and jv."""
+    digest = hashlib.sha256()
+    digest.update(parser_version().encode("utf-8"))
+    digest.update(jv.upper().encode("utf-8"))
+    with open(excel_file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_cached_contract(cache_folder, key):
+    """Return the cached parsed contract, None on a cache miss."""
+    cache_file_path = os.path.join(cache_folder, f"{key}.pkl.gz")
+    try:
+        with gzip.open(cache_file_path, "rb") as file:
+            parsed = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Ignoring unreadable cache file {cache_file_path}: {e}")
+        return None
+    # Keep the most recently used entries on eviction
+    os.utime(cache_file_path)
+    return parsed
+
+def evict_cache(cache_folder, max_bytes):
+    """Remove the least recently used cache files above max_bytes."""
+    entries = []
+    for file_name in os.listdir(cache_folder):
+        if file_name.endswith(".pkl.gz"):
+            stat = os.stat(os.path.join(cache_folder, file_name))
+            entries.append((stat.st_mtime, stat.st_size, file_name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, file_name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_folder, file_name))
+        total -= size
+
+def save_cached_contract(cache_folder, key, parsed, max_bytes=CACHE_MAX_BYTES):
+    """Store a parsed contract in the cache and evict the oldest entries."""
+    os.makedirs(cache_folder, exist_ok=True)
+    cache_file_path = os.path.join(cache_folder, f"{key}.pkl.gz")
+    # Write then rename so that a parallel run never reads a partial file
+    tmp_file_path = f"{cache_file_path}.{os.getpid()}.tmp"
+    try:
+        with gzip.open(tmp_file_path, "wb") as file:
+            pickle.dump(parsed, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file_path, cache_file_path)
+        evict_cache(cache_folder, max_bytes)
+    except Exception as e:
+        print(f"Error writing cache file {cache_file_path}: {e}")
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+def extract_contract(config, root_folder, previous_fingerprints=None, use_cache=True):
+    """Parse the data contract workbook of a project configuration.
+
+    Writes the per-table YAML and the glue cfg files, and returns the parsed
+    contract as a dictionary so that the next stages can use it in memory:
+    config, files_list, tables, mapping, data_format and layout.
+    The optional parse_workers configuration key splits the sheet extraction
+    across that many processes.
+    With use_cache the parsed workbook is kept under .cache/contracts and a
+    cache hit skips openpyxl entirely.
+    The contract also holds the sheet fingerprints, the sheets changed since
+    previous_fingerprints (all of them when None) and the tables of the changed
+    table sheets, whose YAML is the only one rewritten.
+    Returns None if the workbook or one of its mandatory sheets is missing.
+    """
+    excel_file_path = os.path.join(root_folder, config["excel_file_path"])
+    yaml_output_path = os.path.join(root_folder, config["yaml_path"])
+    jv = config["jv"]
+    project_path = config["project_path"]
+    multi_format = config["multi_layout"]
+    workers = config.get("parse_workers", 1)
+
+    if not os.path.exists(excel_file_path):
+        print(f"Excel file {excel_file_path} not found.")
+        return None
+
+    parsed = None
+    if use_cache:
+        cache_folder = os.path.join(root_folder, CACHE_FOLDER)
+        key = contract_cache_key(excel_file_path, jv)
+        parsed = load_cached_contract(cache_folder, key)
+    if parsed is None:
+        parsed = parse_contract(excel_file_path, jv, workers)
+        if not parsed:
+            return None
+        if use_cache:
+            save_cached_contract(cache_folder, key, parsed)
+
+    files_list_tab = parsed["files_list"]
+    list_of_value = resolve_list_of_value(parsed["list_of_value"], jv)
+    tables, layout, sheets = write_all_sheets(parsed["sheet_tables"], jv, yaml_output_path, multi_format, config, previous_fingerprints)
+
+    # mapping configuration
+    mapping = cfg_mapping(parsed["mapping"],project_path.lower())
+
+    # date format configuration
+    data_format = cfg_format(parsed["data_format"],project_path.lower())
+
+    fingerprints = {sheet_name: sheet["fingerprint"] for sheet_name, sheet in sheets.items()}
+    fingerprints["Files list"] = fingerprint(files_list_tab)
+    fingerprints["List of value"] = fingerprint(list_of_value)
+    fingerprints["Rules"] = fingerprint(data_format)
+    if previous_fingerprints is None:
+        changed_sheets = set(fingerprints)
+    else:
+        changed_sheets = {name for name in set(fingerprints) | set(previous_fingerprints) if fingerprints.get(name) != previous_fingerprints.get(name)}
+    changed_tables = {table_name for sheet_name, sheet in sheets.items() if sheet_name in changed_sheets for table_name in sheet["tables"]}
+
+    return {
+        "config": config,
+        "files_list": files_list_tab,
+        "tables": tables,
+        "mapping": mapping,
+        "data_format": data_format,
+        "layout": layout,
+        "fingerprints": fingerprints,
+        "changed_sheets": changed_sheets,
+        "changed_tables": changed_tables,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract the table structures of the data contracts listed in config/config_tech.yaml.")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbooks, ignoring the parsed contracts cache")
+    args = parser.parse_args()
 
-if __name__ == "__main__":
     root_folder = os.path.abspath('.')  # Adjust the path as neede
     config_folder = os.path.join(root_folder, 'config')
     config_tech = load_configuration(os.path.join(config_folder, 'config_tech.yaml'))
@@ -339,46 +706,9 @@ if __name__ == "__main__":
         if not config:
             exit()
 
-        excel_file_path = os.path.join(root_folder, config["excel_file_path"]) 
-        yaml_output_path = os.path.join(root_folder, config["yaml_path"])
-        jv = config["jv"]
-        project = config["project"]
-        project_path = config["project_path"]
-        multi_format = config["multi_layout"]
-        
-        workbook = load_workbook(excel_file_path)
-        if not workbook:
+        contract = extract_contract(config, root_folder, use_cache=not args.no_cache)
+        if not contract:
             exit()
 
-
-
-        sheet = workbook["Files list"]
-        if not sheet:
-            print("Sheet 'Files list' not found in the workbook.")
-            exit()
-        
-        periodicity_mapping = {
-            "Quotidien": "daily",
-            "Hebdomadaire": "weekly",
-            "Hebdo": "weekly",
-            "Mensuel": "monthly",
-            "Annuel": "yearly",
-            "w": "weekly",
-            "d": "daily",
-            "y": "yearly",
-            "m": "monthly"
-        }
-
-        list_of_value = load_list_of_value(workbook)
-        files_list_tab = process_files_list(sheet, excel_file_path, jv, periodicity_mapping)
-        process_all_sheets(workbook, files_list_tab, jv, yaml_output_path, list_of_value, multi_format,config)
-
-        # mapping configuration
-        cfg_mapping(sheet,project_path.lower())
-
-        # date format configuration
-        sheet = workbook["Rules"]
-        if not sheet:
-            print("Sheet 'Rules' not found in the workbook.")
-            exit()
-        cfg_format(sheet,project_path.lower(),files_list_tab)
+if __name__ == "__main__":
+    main()
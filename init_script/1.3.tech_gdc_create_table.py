@@ -1,8 +1,11 @@
+import argparse
 import yaml
 import json
 import boto3
 import os
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def load_configuration(config_path):
     """Load configuration from the YAML file."""
@@ -16,14 +19,18 @@ def load_configuration(config_path):
         print(f"Error loading configuration file: {e}")
         return None
 
-def create_json_file(table_input, json_path, table_name):
-    """Save the table_input in a JSON file for versioning."""
+def create_json_file(table_input, json_path, table_name, write_json=True):
+    """Save the table_input in a JSON file for versioning.
+
+    With write_json False the file is only listed in json_import_gdc.txt.
+    """
     json_file_path = os.path.join(json_path, f"gdc_{table_name}.json")
     txt_file_path = os.path.join(json_path, 'json_import_gdc.txt')
     try:
-        with open(json_file_path, "w") as file:
-            json.dump(table_input, file)
-        print(f"Table configuration for {table_name} saved to {json_file_path}.")
+        if write_json:
+            with open(json_file_path, "w") as file:
+                json.dump(table_input, file)
+            print(f"Table configuration for {table_name} saved to {json_file_path}.")
 
         # Ajouter le nom du fichier JSON dans le fichier texte (fichier_liste)
         with open (txt_file_path,'a') as fichier_txt: 
@@ -125,7 +132,297 @@ def create_database_if_not_exists(glue_client, database_name, database_descripti
         else:
             print(f"Error occurred while checking the database: {e}")
 
+# Partition projection interval of each periodicity
+PROJECTION_INTERVAL_UNITS = {
+    "daily": "DAYS",
+    "weekly": "WEEKS",
+    "monthly": "MONTHS",
+    "yearly": "YEARS"
+}
+
+PARTITION_KEYS = [{"Name": "date_batch_partition", "Type": "date"}]
+
+def partition_projection(location_template, period, config):
+    """Partition projection parameters of the date_batch_partition key.
+
+    Athena computes the date_batch folders to read from these parameters,
+    without crawler nor GetPartitions calls. The projected range starts at the
+    partition_start configuration key (default 2024-01-01) and steps by the
+    periodicity, so weekly/monthly/yearly batches must be aligned on it.
+    """
+    return {
+        "projection.enabled": "true",
+        "projection.date_batch_partition.type": "date",
+        "projection.date_batch_partition.format": "yyyy-MM-dd",
+        "projection.date_batch_partition.range": f"{config.get('partition_start', '2024-01-01')},NOW",
+        "projection.date_batch_partition.interval": "1",
+        "projection.date_batch_partition.interval.unit": PROJECTION_INTERVAL_UNITS.get(period.lower(), "DAYS"),
+        "storage.location.template": location_template
+    }
+
+def landing_location(input_location, template, table_structure, period):
+    """Location and partition location template of an IN table in the landing bucket.
+
+    template is the landing_location_template configuration key, relative to
+    the project folder of the landing bucket, with the {file_code}, {table} and
+    {period} placeholders and a {date_batch_partition} folder, e.g.
+    {file_code}/periodicity={period}/datebatch={date_batch_partition}/
+    The table Location is the folder holding the date batch folders.
+    """
+    if "{date_batch_partition}" not in template:
+        raise ValueError(f"landing_location_template must hold a {{date_batch_partition}} folder: {template}")
+    location_template = input_location + template.format(
+        file_code=table_structure["file_code"], table=table_structure["table_name"], period=period.lower(), date_batch_partition="${date_batch_partition}")
+    return location_template[:location_template.rindex("/", 0, location_template.index("${date_batch_partition}")) + 1], location_template
+
+def create_gdc_tables(config, tables, root_folder, only=None):
+    """Build the Glue Data Catalog table definitions of a project.
+
+    `tables` holds the table structures extracted from the data contract,
+    keyed by table_name_output. Each definition is saved as gdc_*.json and
+    returned in a dictionary keyed by the JSON file name. When `only` is given,
+    the JSON files of the other tables are left untouched.
+    IN tables read the project folder of the landing bucket, unpartitioned,
+    unless the landing_location_template configuration key describes the
+    landing layout (see landing_location).
+    """
+    project = config["project"]
+    source = config["source"]
+    jv = config["jv"]
+    json_path = os.path.join(root_folder, config["json_path"]) 
+    gdc_tables = {}
+
+    # Make path if not exists
+    if not os.path.exists(json_path):
+        os.makedirs(json_path)
+
+    # Create an json_import_gdc.txt
+    with open(os.path.join(json_path, 'json_import_gdc.txt'), 'w') as file:
+        pass
+
+    for table_name_output, table_structure in tables.items():
+        table_name_s3=table_structure["table_name"]
+        periodicity=table_structure["periodicity"]
+        file_code = table_structure["file_code"]
+        columns = table_structure["columns"]
+        data_type = table_structure["data_type"]
+        separator = table_structure["separator"]
+        header = table_structure["header"]
+        footer = table_structure["footer"]
+        quote = table_structure["quote"]
+        input_location = "s3://s3b-dlz-environment" + f"-landing-{jv.lower()}-{source.lower()}/{project.lower()}/"
+
+        # Prepare columns for Glue
+        glue_columns = [{"Name": col["name"].lower(), "Type": col["type"], "Parameters": { "Protected": col["Protected"], "AnonymizationRule": col["AnonymizationRule"],"PrimaryKey": 'None' if col["PrimaryKey"] is None else col["PrimaryKey"],"Mandatory": 'None' if col["Mandatory"] is None else col["Mandatory"]}} for col in columns]
+        
+        # Prepare partition keys
+        # glue_partition_keys = [{"Name": key["name"], "Type": key["type"]} for key in config["partition_keys"]]
+
+        for period in periodicity:
+            parquet_location = "s3://s3b-dlz-environment" + f"-standard-{jv.lower()}-{source.lower()}/{project.lower()}/{period.lower()}/{table_name_s3.lower()}"
+            # Create JSON configuration files before attempting Glue operations
+            if table_name_output.lower().endswith("_out"):
+                # Create JSON configuration for partitioned table
+                table_input = {
+                    "Name": f'{table_name_s3}_{jv.upper()}_OUT_{period.upper()}',
+                    "Description": f'{table_name_s3}_{jv.upper()}_OUT_{period.upper()}',
+                    "StorageDescriptor": {
+                        "Columns": glue_columns,
+                        "Location": parquet_location,
+                        "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
+                        "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
+                        "SerdeInfo": {
+                            "SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe",
+                            "Parameters": {"serialization.format": "1"}
+                        }
+                    },
+                    "PartitionKeys": PARTITION_KEYS,
+                    "Parameters": {
+                        "classification": "parquet",
+                        "encoding": "UTF-8",
+                        "typeOfData": "file",
+                        **partition_projection(f"{parquet_location}/date_batch=${{date_batch_partition}}/", period, config)
+                    }
+                }
+                gdc_name = f'{table_name_s3}_{period.upper()}_OUT'
+            else:
+                # Create JSON configuration for CSV table
+                location, partition_parameters, partition_keys = input_location, {}, []
+                if config.get("landing_location_template"):
+                    location, location_template = landing_location(input_location, config["landing_location_template"], table_structure, period)
+                    partition_parameters, partition_keys = partition_projection(location_template, period, config), PARTITION_KEYS
+                table_input = {
+                    "Name": f'{table_name_s3}_{jv.upper()}_IN_{period.upper()}',
+                    "Description": file_code,
+                    "StorageDescriptor": {
+                        "Columns": glue_columns,
+                        "Location": location,
+                        "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
+                        "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
+                        "SerdeInfo": {
+                            "SerializationLibrary": "org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe",
+                            "Parameters": {"field.delim": separator, "serialization.format": separator}
+                        }
+                    },
+                    "PartitionKeys": partition_keys,
+                    "Parameters": {
+                        "classification": data_type,
+                        "encoding": "UTF-8",
+                        "typeOfData": "file",
+                        "header": header,
+                        "footer": footer,
+                        "quote": quote,
+                        **partition_parameters
+                    }
+                }
+                gdc_name = f'{table_name_s3}_{period.upper()}_IN'
+
+            create_json_file(table_input, json_path, gdc_name, only is None or table_name_output in only)
+            gdc_tables[f"gdc_{gdc_name}.json"] = table_input
+
+    return gdc_tables
+
+def load_table_structures(yaml_path):
+    """Load the STG_*.yaml table structures, keyed by table_name_output."""
+    tables = {}
+    for filename in os.listdir(yaml_path):
+        if filename.endswith(".yaml") and filename.startswith("STG"):
+            # Load the contents of the YAML file into a Python variable
+            with open(os.path.join(yaml_path, filename), "r") as file:
+                table_structure = yaml.safe_load(file)
+            tables[table_structure["table_name_output"]] = table_structure
+    return tables
+
+def create_glue_client(region_name=None, endpoint_url=None, max_attempts=10):
+    """Create a Glue client retrying throttled calls.
+
+    The adaptive retry mode backs off exponentially and rate limits the client
+    when Glue answers ThrottlingException. endpoint_url targets a local
+    stand-in such as moto_server.
+    """
+    config = Config(retries={"max_attempts": max_attempts, "mode": "adaptive"})
+    return boto3.client("glue", region_name=region_name, endpoint_url=endpoint_url, config=config)
+
+def glue_table_input(table_input):
+    """Return the table_input as accepted by the Glue API, None values dropped."""
+    if isinstance(table_input, dict):
+        return {key: glue_table_input(value) for key, value in table_input.items() if value is not None}
+    if isinstance(table_input, list):
+        return [glue_table_input(value) for value in table_input]
+    return table_input
+
+def list_catalog_tables(glue_client, database_name):
+    """List every table of a Glue database in a single paginated scan, keyed by lower case name."""
+    catalog_tables = {}
+    try:
+        for page in glue_client.get_paginator("get_tables").paginate(DatabaseName=database_name):
+            for table in page["TableList"]:
+                catalog_tables[table["Name"].lower()] = table
+    except glue_client.exceptions.EntityNotFoundException:
+        print(f"The database '{database_name}' does not exist.")
+    return catalog_tables
+
+def table_differences(desired, actual, path=""):
+    """Return the paths of the desired values that differ in the catalog table.
+
+    Only the keys generated by 1.3 are compared since Glue adds its own
+    defaults (CreateTime, Compressed...), except Parameters which must match.
+    """
+    differences = []
+    for key, value in desired.items():
+        current = actual.get(key)
+        if key == "Name" and not path:
+            continue  # Glue stores table names in lower case
+        if isinstance(value, dict) and isinstance(current, dict) and key != "Parameters":
+            differences += table_differences(value, current, f"{path}{key}.")
+        elif isinstance(value, list) and isinstance(current, list) and len(value) == len(current) and all(isinstance(item, dict) for item in value + current):
+            for index, (item, current_item) in enumerate(zip(value, current)):
+                differences += table_differences(item, current_item, f"{path}{key}[{index}].")
+        elif value != current and not (value in ([], {}) and current is None):
+            differences.append(f"{path}{key}")
+    return differences
+
+def plan_glue_sync(gdc_tables, catalog_tables):
+    """Diff the generated definitions against the catalog tables.
+
+    Returns a list of steps {"action", "table", "changes", "table_input"} where
+    action is create, update, unchanged or orphan (in the catalog only, never deleted).
+    """
+    plan = []
+    desired_names = set()
+    for table_input in gdc_tables.values():
+        desired = glue_table_input(table_input)
+        name = desired["Name"].lower()
+        desired_names.add(name)
+        actual = catalog_tables.get(name)
+        if actual is None:
+            plan.append({"action": "create", "table": desired["Name"], "changes": [], "table_input": desired})
+            continue
+        changes = table_differences(desired, actual)
+        plan.append({"action": "update" if changes else "unchanged", "table": desired["Name"], "changes": changes, "table_input": desired})
+
+    for name in sorted(set(catalog_tables) - desired_names):
+        plan.append({"action": "orphan", "table": name, "changes": [], "table_input": None})
+    return plan
+
+def print_plan(plan, database_name):
+    """Print the sync plan of a database."""
+    symbols = {"create": "+", "update": "~", "unchanged": "=", "orphan": "?"}
+    print(f"Glue Data Catalog plan for the database '{database_name}':")
+    for step in plan:
+        changes = f" ({', '.join(step['changes'])})" if step["changes"] else ""
+        print(f"  {symbols[step['action']]} {step['action']:<9} {step['table']}{changes}")
+    counts = {action: sum(1 for step in plan if step["action"] == action) for action in symbols}
+    print("  " + ", ".join(f"{count} {action}" for action, count in counts.items()))
+
+def apply_glue_sync(glue_client, database_name, plan, workers=8):
+    """Apply the create and update steps of a plan on a bounded thread pool.
+
+    Failed steps get an "error" entry, the other steps are still applied.
+    """
+    def apply_step(step):
+        if step["action"] == "create":
+            glue_client.create_table(DatabaseName=database_name, TableInput=step["table_input"])
+        else:
+            glue_client.update_table(DatabaseName=database_name, TableInput=step["table_input"])
+
+    steps = [step for step in plan if step["action"] in ("create", "update")]
+    if not steps:
+        return plan
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(apply_step, step): step for step in steps}
+        for future in as_completed(futures):
+            step = futures[future]
+            try:
+                future.result()
+                print(f"Table {step['table']} {step['action']}d successfully.")
+            except Exception as e:
+                step["error"] = str(e)
+                print(f"Error during {step['action']} of table {step['table']}: {e}")
+    return plan
+
+def sync_glue_catalog(glue_client, database_name, gdc_tables, dry_run=False, workers=8, database_description=""):
+    """Synchronize the Glue database with the generated gdc_*.json definitions.
+
+    The database is listed once, only the missing or different tables are
+    created or updated. With dry_run the plan is printed and nothing is applied.
+    """
+    plan = plan_glue_sync(gdc_tables, list_catalog_tables(glue_client, database_name))
+    print_plan(plan, database_name)
+    if not dry_run:
+        create_database_if_not_exists(glue_client, database_name, database_description)
+        apply_glue_sync(glue_client, database_name, plan, workers)
+    return plan
+
 def main():
+    parser = argparse.ArgumentParser(description="Generate the Glue Data Catalog definitions and optionally synchronize them.")
+    parser.add_argument("--sync", metavar="DATABASE", help="synchronize the generated tables with this Glue database")
+    parser.add_argument("--dry-run", action="store_true", help="with --sync, only print the plan")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent Glue write calls (default: 8)")
+    parser.add_argument("--region", help="AWS region of the Glue catalog")
+    parser.add_argument("--endpoint-url", help="Glue endpoint, e.g. a local moto_server")
+    args = parser.parse_args()
+
     root_folder = os.path.abspath('.')  # Adjust the path as neede
     config_folder = os.path.join(root_folder, 'config')
 
@@ -134,108 +431,22 @@ def main():
     
     if not config_tech:
         exit()
+    gdc_tables = {}
     for file_cfg in config_tech["yaml_cfg_files_path"]:
         config_file = os.path.join(config_folder, file_cfg)
         config = load_configuration(config_file)
         if not config:
             exit()
         
-        project = config["project"]
-        source = config["source"]
-        jv = config["jv"]
-        yaml_path = os.path.join(root_folder, config["yaml_path"]) 
-        json_path = os.path.join(root_folder, config["json_path"]) 
-
-        # Make path if not exists
-        if not os.path.exists(json_path):
-            os.makedirs(json_path)
-
-        # Create an json_import_gdc.txt
-        with open(os.path.join(json_path, 'json_import_gdc.txt'), 'w') as file:
-            pass
-            
         # Extract table information
-        for filename in os.listdir(yaml_path):
-            if filename.endswith(".yaml") and filename.startswith("STG"):
-                # Load the contents of the YAML file into a Python variable
-                with open(os.path.join(yaml_path, filename), "r") as file:
-                    table_structure = yaml.safe_load(file)
-
-                table_name_input = table_structure["table_name_output"]
-                table_name_s3=table_structure["table_name"]
-                periodicity=table_structure["periodicity"]
-                file_code = table_structure["file_code"]
-                columns = table_structure["columns"]
-                data_type = table_structure["data_type"]
-                separator = table_structure["separator"]
-                header = table_structure["header"]
-                footer = table_structure["footer"]
-                quote = table_structure["quote"]
-                input_location = "s3://s3b-dlz-environment" + f"-landing-{jv.lower()}-{source.lower()}/{project.lower()}/"
-                parquet_location = "s3://s3b-dlz-environment" + f"-standard-{jv.lower()}-{source.lower()}/{project.lower()}/period/{table_name_s3.lower()}"
-
-                # Prepare columns for Glue
-                glue_columns = [{"Name": col["name"].lower(), "Type": col["type"], "Parameters": { "Protected": col["Protected"], "AnonymizationRule": col["AnonymizationRule"],"PrimaryKey": 'None' if col["PrimaryKey"] is None else col["PrimaryKey"],"Mandatory": 'None' if col["Mandatory"] is None else col["Mandatory"]}} for col in columns]
-                
-                # Prepare partition keys
-                # glue_partition_keys = [{"Name": key["name"], "Type": key["type"]} for key in config["partition_keys"]]
-
-                for period in periodicity:
-                    # Create JSON configuration files before attempting Glue operations
-                    if filename.lower().endswith("_out.yaml"):
-                        # Create JSON configuration for partitioned table
-                        create_json_file(
-                            {
-                                "Name": f'{table_name_s3}_{jv.upper()}_OUT_{period.upper()}',
-                                "Description": f'{table_name_s3}_{jv.upper()}_OUT_{period.upper()}',
-                                "StorageDescriptor": {
-                                    "Columns": glue_columns,
-                                    "Location": parquet_location,
-                                    "InputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat",
-                                    "OutputFormat": "org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat",
-                                    "SerdeInfo": {
-                                        "SerializationLibrary": "org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe",
-                                        "Parameters": {"serialization.format": "1"}
-                                    }
-                                },
-                                "Parameters": {
-                                    "classification": "parquet",
-                                    "encoding": "UTF-8",
-                                    "typeOfData": "file"
-                                }
-                            },
-                            json_path,
-                            f'{table_name_s3}_{period.upper()}_OUT'
-                        )
-                    else:
-                        # Create JSON configuration for CSV table
-                        create_json_file(
-                            {
-                                "Name": f'{table_name_s3}_{jv.upper()}_IN_{period.upper()}',
-                                "Description": file_code,
-                                "StorageDescriptor": {
-                                    "Columns": glue_columns,
-                                    "Location": input_location,
-                                    "InputFormat": "org.apache.hadoop.mapred.TextInputFormat",
-                                    "OutputFormat": "org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat",
-                                    "SerdeInfo": {
-                                        "SerializationLibrary": "org.apache.hadoop.hive.serde2.lazy.LazySimpleSerDe",
-                                        "Parameters": {"field.delim": separator, "serialization.format": separator}
-                                    }
-                                },
-                                "PartitionKeys": [],
-                                "Parameters": {
-                                    "classification": data_type,
-                                    "encoding": "UTF-8",
-                                    "typeOfData": "file",
-                                    "header": header,
-                                    "footer": footer,
-                                    "quote": quote
-                                }
-                            },
-                            json_path,
-                            f'{table_name_s3}_{period.upper()}_IN'
-                        )
+        tables = load_table_structures(os.path.join(root_folder, config["yaml_path"]))
+        gdc_tables.update(create_gdc_tables(config, tables, root_folder))
+
+    if args.sync:
+        glue_client = create_glue_client(args.region, args.endpoint_url)
+        plan = sync_glue_catalog(glue_client, args.sync, gdc_tables, args.dry_run, args.workers)
+        if any("error" in step for step in plan):
+            exit(1)
 
 if __name__ == "__main__":
     main()
@@ -4,7 +4,7 @@ import os
 from pathlib import Path
 
 
-def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_format,table_meta_yaml):
+def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_format,table_meta_yaml, partition_type='auto', table_type='external'):
     # Extract the relevant information for Snowflake
     db_name = f"DB_BNK_{jv.upper()}_" + '{' + '{' + "env_var('SHORT_ENV')" + '}' + '}'
     table_name = table_meta['Name']
@@ -39,7 +39,7 @@ def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_fo
     partition_cols = ['DATE_BATCH_PARTITION']
 
     # Generate the column definitions
-    column_defs = []
+    column_exprs = []
     for col in columns:
         col_name = col['Name']
         col_type = col['Type']
@@ -56,15 +56,20 @@ def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_fo
 
             
         if col_type == 'DATE' and 'date_batch' not in col_name.lower():
-            column_defs.append(f"  {col_name.upper()} {col_type.upper()} as (to_date(NULLIF($1:{col_name.upper()}::TEXT,''),'{date_format}')), \n")
+            column_exprs.append((col_name.upper(), col_type.upper(), f"to_date(NULLIF($1:{col_name.upper()}::TEXT,''),'{date_format}')"))
         if col_type == 'TIMESTAMP_NTZ':
-            column_defs.append(f"  {col_name.upper()} {col_type.upper()} as (to_timestamp(NULLIF($1:{col_name.upper()}::TEXT,''),'{date_format} HH:MI:SS')), \n")
+            column_exprs.append((col_name.upper(), col_type.upper(), f"to_timestamp(NULLIF($1:{col_name.upper()}::TEXT,''),'{date_format} HH:MI:SS')"))
         if 'date_batch' not in col_name.lower() and 'filler_tech' not in col_name.lower() and col_type != 'DATE'  and col_type != 'TIMESTAMP_NTZ' :
-            column_defs.append(f"  {col_name.upper()} {col_type.upper()} as ($1:{col_name.upper()}::{col_type.upper()}), \n")
+            column_exprs.append((col_name.upper(), col_type.upper(), f"$1:{col_name.upper()}::{col_type.upper()}"))
+    column_defs = [f"  {col_name} {col_type} as ({col_expr}), \n" for col_name, col_type, col_expr in column_exprs]
 
     # Add the partitioning columns
     for col in partition_cols:
-        column_defs.append(f"   {col} DATE as (TRY_CAST(split_part(split_part(metadata$filename, '/', {len(location.split('/')[:-1]) - 1}), '=', 2) AS DATE)),\n")
+        if partition_type == 'user_specified':
+            # Partitions are registered by the refresh macro with ALTER EXTERNAL TABLE ... ADD PARTITION
+            column_defs.append(f"   {col} DATE as (PARSE_JSON(metadata$external_table_partition):{col}::DATE),\n")
+        else:
+            column_defs.append(f"   {col} DATE as (TRY_CAST(split_part(split_part(metadata$filename, '/', {len(location.split('/')[:-1]) - 1}), '=', 2) AS DATE)),\n")
 
     # Add Technical columns
     column_defs.append(f"  ROW_NUMBER NUMBER as (metadata$file_row_number), \n")
@@ -76,14 +81,24 @@ def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_fo
         os.makedirs(f"ddls-snowflake/{project.lower()}/views")
     if not os.path.exists(f"ddls-snowflake/{project.lower()}/stages"):
         os.makedirs(f"ddls-snowflake/{project.lower()}/stages")
-        
+
+    stage_name = f"{db_name}.{schema_name}.STG_S3_{jv.upper()}_{source.upper()}"
+    stage_location = f"{project.lower()}/{period}/{location_table_s3.lower()}/"
+    if table_type == 'native':
+        primary_keys = [col['name'].upper() for col in table_meta_yaml['columns'] if col.get('PrimaryKey') == 'PK']
+        create_native_table(db_name, schema_name, table_name.upper(), tag, column_exprs, primary_keys, stage_name, stage_location, f"{db_name}.{schema_name}.FF_PARQUET_{jv.upper()}_{source.upper()}", project)
+        create_external_stage(stage_name, storage_integration, location_storage, project, jv, source)
+        return
+
+    partition_type_sql = "PARTITION_TYPE = USER_SPECIFIED\n    " if partition_type == 'user_specified' else ''
+
     # Generate the CREATE EXTERNAL TABLE statement
     create_external_table_sql = f"""CREATE OR REPLACE EXTERNAL TABLE  {db_name}.{schema_name}.{table_name.upper()} (
     {' '.join(column_defs)}
     )
     PARTITION BY ({', '.join(f'{col}' for col in partition_cols)})
-    LOCATION = @{db_name}.{schema_name}.STG_S3_{jv.upper()}_{source.upper()}/{project.lower()}/{period}/{location_table_s3.lower()}/
-    FILE_FORMAT = (TYPE = 'PARQUET');
+    LOCATION = @{stage_name}/{stage_location}
+    {partition_type_sql}FILE_FORMAT = (TYPE = 'PARQUET');
     COMMENT ON TABLE {db_name}.{schema_name}.{table_name.upper()} IS '{tag}';
     """
 
@@ -101,9 +116,13 @@ def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_fo
     # Write the SQL statement to a file
     with open(f"ddls-snowflake/{project.lower()}/views/A__03_{schema_name}.VW_{table_name.upper()}.sql", 'w') as f:
         f.write(create_view_sql)
-            
+
+    create_external_stage(stage_name, storage_integration, location_storage, project, jv, source)
+
+def create_external_stage(stage_name, storage_integration, location_storage, project, jv, source):
+    """Write the external stage DDL shared by every table of a source."""
     # Generate the CREATE EXTERNAL STAGE statement
-    create_external_stage_sql = f"""CREATE STAGE IF NOT EXISTS  {db_name}.{schema_name}.STG_S3_{jv.upper()}_{source.upper()} 	
+    create_external_stage_sql = f"""CREATE STAGE IF NOT EXISTS  {stage_name} 	
     STORAGE_INTEGRATION = {storage_integration}
     URL = '{location_storage}' 
     DIRECTORY = ( ENABLE = true )
@@ -114,6 +133,70 @@ def create_ddl(table_meta,  jv, project,source,filename_yaml, icr,config_data_fo
     with open(f"ddls-snowflake/{project.lower()}/stages/A__01_STG_S3_{jv.upper()}_{source.upper()}.sql", 'w') as f:
         f.write(create_external_stage_sql)
 
+def create_native_table(db_name, schema_name, table_name, tag, column_exprs, primary_keys, stage_name, stage_location, file_format_name, project):
+    """Write the DDLs of a permanent table loaded by date batch partition.
+
+    The table is clustered on DATE_BATCH_PARTITION and the primary key, and
+    follows the contract columns without being recreated. The
+    SP_LOAD_<table>(DATE_BATCH) procedure deletes then inserts one partition
+    from the date_batch=<DATE_BATCH>/ folder of the stage in a transaction, so
+    a load can be replayed. The view layer is the same as for external tables.
+    """
+    full_table_name = f"{db_name}.{schema_name}.{table_name}"
+    column_names = [col_name for col_name, _, _ in column_exprs] + ['DATE_BATCH_PARTITION', 'ROW_NUMBER', 'DATE_LAST_MODIFIED']
+    column_types = [f"{col_name} {col_type}" for col_name, col_type, _ in column_exprs]
+    column_types += ["DATE_BATCH_PARTITION DATE", "ROW_NUMBER NUMBER", "DATE_LAST_MODIFIED TIMESTAMP_NTZ"]
+    column_defs = ',\n      '.join(column_types)
+
+    # CREATE OR ALTER keeps the loaded partitions and adds or drops the columns
+    # so that the table always matches the column list of SP_LOAD_<table>
+    create_table_sql = f"""CREATE OR ALTER TABLE  {full_table_name} (
+      {column_defs}
+    )
+    CLUSTER BY ({', '.join(['DATE_BATCH_PARTITION'] + primary_keys)});
+    COMMENT ON TABLE {full_table_name} IS '{tag}';
+    """
+    with open(f"ddls-snowflake/{project.lower()}/tables/A__02_{schema_name}.{table_name}.sql", 'w') as f:
+        f.write(create_table_sql)
+
+    create_view_sql = f"""CREATE OR REPLACE VIEW  {db_name}.{schema_name}.VW_{table_name}
+    AS SELECT * FROM {full_table_name};
+    """
+    with open(f"ddls-snowflake/{project.lower()}/views/A__03_{schema_name}.VW_{table_name}.sql", 'w') as f:
+        f.write(create_view_sql)
+
+    create_file_format_sql = f"""CREATE FILE FORMAT IF NOT EXISTS  {file_format_name}
+    TYPE = 'PARQUET';
+    """
+    with open(f"ddls-snowflake/{project.lower()}/stages/A__01_{file_format_name.split('.')[-1]}.sql", 'w') as f:
+        f.write(create_file_format_sql)
+
+    # The stage path cannot be a bind variable: the INSERT is a string literal
+    # completed with the date batch at run time, so its quotes are doubled
+    select_exprs = [col_expr for _, _, col_expr in column_exprs] + ["TO_DATE('{date_batch}')", "metadata$file_row_number", "metadata$file_last_modified"]
+    insert_sql = f"INSERT INTO {full_table_name} ({', '.join(column_names)}) SELECT {', '.join(select_exprs)} FROM @{stage_name}/{stage_location}date_batch={{date_batch}}/ (FILE_FORMAT => '{file_format_name}')"
+    insert_sql = insert_sql.replace("env_var('", 'env_var("').replace("')}}", '")}}').replace("'", "''").replace("{date_batch}", "' || batch_date || '")
+    create_procedure_sql = f"""CREATE OR REPLACE PROCEDURE  {db_name}.{schema_name}.SP_LOAD_{table_name}(DATE_BATCH VARCHAR)
+    RETURNS VARCHAR
+    LANGUAGE SQL
+    AS
+    $$
+    DECLARE
+        batch_date VARCHAR DEFAULT TO_CHAR(TO_DATE(DATE_BATCH, 'YYYY-MM-DD'), 'YYYY-MM-DD');
+        insert_sql VARCHAR DEFAULT '{insert_sql}';
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE FROM {full_table_name} WHERE DATE_BATCH_PARTITION = TO_DATE(:batch_date);
+        EXECUTE IMMEDIATE :insert_sql;
+        COMMIT;
+        RETURN 'Loaded {table_name} partition ' || batch_date;
+    END;
+    $$;
+    """
+    os.makedirs(f"ddls-snowflake/{project.lower()}/procedures", exist_ok=True)
+    with open(f"ddls-snowflake/{project.lower()}/procedures/A__04_{schema_name}.SP_LOAD_{table_name}.sql", 'w') as f:
+        f.write(create_procedure_sql)
+
 def load_configuration(config_path):
     """Load configuration from the YAML file."""
     try:
@@ -126,6 +209,39 @@ def load_configuration(config_path):
         print(f"Error loading configuration file: {e}")
         return None
 
+def out_table_name(filename_yaml):
+    """Return the table_name_output of the STG_*_OUT.yaml matching a gdc_*_OUT.json file."""
+    return f'{filename_yaml.replace("gdc_","").replace("_MONTHLY","").replace("_WEEKLY","").replace("_DAILY","")}_OUT'
+
+def create_ddls(config, gdc_tables, tables, config_data_format, only=None):
+    """Generate the Snowflake DDLs of every OUT table of a project.
+
+    `gdc_tables` holds the Glue Data Catalog definitions keyed by gdc_*.json
+    file name and `tables` the table structures keyed by table_name_output.
+    When `only` is given, the DDLs of the other tables are left untouched.
+    The external_table_partition_type configuration key selects the partitioning
+    of the external tables: auto (default, computed from the file path) or
+    user_specified (partitions added explicitly by the refresh macro). The
+    snowflake_table_type key selects external (default) or native tables,
+    loaded partition by partition with the generated SP_LOAD_ procedures.
+    """
+    project = config["project"]
+    source = config["source"]
+
+    icr=2
+    for filename, table_meta in gdc_tables.items():
+        # Check if the file is a JSON file
+        if filename.endswith("_OUT.json"):
+            filename_yaml = filename.replace("_OUT.json",'')
+            if only is not None and out_table_name(filename_yaml) not in only:
+                continue
+            table_meta_yaml = tables[out_table_name(filename_yaml)]
+  
+            # Loop through all jvs
+            list_jv =  config['jv']
+            create_ddl(table_meta, list_jv,project,source,filename_yaml, icr,config_data_format,table_meta_yaml, config.get('external_table_partition_type', 'auto'), config.get('snowflake_table_type', 'external'))
+            icr=icr+2
+
 def main():
     root_folder = os.path.abspath('.')  # Adjust the path as neede
     config_folder = os.path.join(root_folder, 'config')
@@ -140,7 +256,6 @@ def main():
             
         json_path=config["json_path"]
         project = config["project"]
-        source = config["source"]
         project_path = config["project_path"]
 
         #Catch format date/timestamp
@@ -148,22 +263,21 @@ def main():
         config_data_format = load_configuration(os.path.join(config_glue_folder, f'cfg_glue_{project_path}.yaml'))
         # Extract table information
         # Loop through all files in the output directory
-        icr=2
+        gdc_tables = {}
+        tables = {}
         for filename in os.listdir(f"./{json_path}"):
             # Check if the file is a JSON file
             if filename.endswith("_OUT.json"):
                 filename_yaml = filename.replace("_OUT.json",'')
                 # Load the contents of the JSON file into a Python variable
                 with open(f"./{json_path}/{filename}") as file:
-                    table_meta = json.load(file)
-
-                table_meta_yaml = load_configuration(os.path.join(f"{config_glue_folder}/{project}", f'{filename_yaml.replace("gdc_","").replace("_MONTHLY","").replace("_WEEKLY","").replace("_DAILY","")}_OUT.yaml')) 
-      
-                # Loop through all jvs
-                list_jv =  config['jv']
-                # Load the contents of the YAML file into a Python variable
-                create_ddl(table_meta, list_jv,project,source,filename_yaml, icr,config_data_format,table_meta_yaml)
-                icr=icr+2
+                    gdc_tables[filename] = json.load(file)
+
+                table_name_output = out_table_name(filename_yaml)
+                if table_name_output not in tables:
+                    tables[table_name_output] = load_configuration(os.path.join(f"{config_glue_folder}/{project}", f'{table_name_output}.yaml'))
+
+        create_ddls(config, gdc_tables, tables, config_data_format)
 
 if __name__ == "__main__":
     main()
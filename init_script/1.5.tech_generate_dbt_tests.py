@@ -1,3 +1,5 @@
+import csv
+import io
 import os
 import yaml
 import json
@@ -11,8 +13,36 @@ def load_yaml(file_path):
             print(f"Error loading {file_path}: {exc}")
             return None
 
-def create_dbt_source_table(yaml_data, table_name,project_path):
-    """Create a dbt source table schema from YAML data."""
+# Condition restricting a test to the date batch partition loaded by the DAG
+PARTITION_WHERE = "DATE_BATCH_PARTITION = '{{ var(\"date_batch_partition\") }}'"
+
+# loaded_at_field of the external tables, answered by the collect_freshness macro
+# from the registered files instead of a scan of the table
+FILE_REGISTRATION_LOADED_AT_FIELD = 'REGISTERED_DATE_BATCH_PARTITION'
+
+def test_where(condition, partition_scoped):
+    """Where config of a test, restricted to the loaded partition when partition_scoped."""
+    return ' and '.join(where for where in [condition, PARTITION_WHERE if partition_scoped else None] if where)
+
+def lov_values(col):
+    """Allowed values of a column, without the 'null' markers."""
+    lov = col.get('LOV', [])
+    if not lov:
+        return []
+    # Flatten the list if it's nested and ensure it is a single list
+    flattened_lov = [item for sublist in lov for item in sublist] if isinstance(lov[0], list) else lov
+    # Remove 'null' from the list
+    return [item for item in flattened_lov if item != 'null' and item != 'Null' and item != 'NULL']
+
+def create_dbt_source_table(yaml_data, table_name,project_path, partition_scoped=True, lov_seeds=None):
+    """Create a dbt source table schema from YAML data.
+
+    With partition_scoped, every test only reads the DATE_BATCH_PARTITION
+    given by the date_batch_partition var instead of the whole history.
+    The LOV of the columns in `lov_seeds` (column name -> seed name) are
+    checked with a relationships test against the seed instead of an IN list.
+    """
+    lov_seeds = lov_seeds or {}
     columns = yaml_data.get('columns', [])
     project = project_path.split('-')[0].upper()
     nullable_columns = [col['name'] for col in columns if col['Mandatory'].lower() == 'non' and col['PrimaryKey'] == 'PK']
@@ -34,11 +64,15 @@ def create_dbt_source_table(yaml_data, table_name,project_path):
         not_null = col.get('Mandatory', [])
         
         lov = col.get('LOV', [])
-        if lov:
-            # Flatten the list if it's nested and ensure it is a single list
-            flattened_lov = [item for sublist in lov for item in sublist] if isinstance(lov[0], list) else lov
-            # Remove 'null' from the list
-            flattened_lov = [item for item in flattened_lov if item != 'null' and item != 'Null' and item != 'NULL']
+        if col['name'] in lov_seeds:
+            # Anti-join against the seed holding the allowed values
+            where = test_where(f"{col['name']} <> ''" if not_null.lower() == 'non' else None, partition_scoped)
+            relationships = {'to': f"ref('{lov_seeds[col['name']]}')", 'field': 'lov_value'}
+            if where:
+                relationships['config'] = {'where': where}
+            column_data['tests'].append({'relationships': relationships})
+        elif lov:
+            flattened_lov = lov_values(col)
 
             if not_null.lower() == 'non':
                 # Add a test for LOV values
@@ -46,7 +80,7 @@ def create_dbt_source_table(yaml_data, table_name,project_path):
                     'dbt_expectations.expect_column_values_to_be_in_set': {
                         'value_set': flattened_lov,
                         'config':{
-                            'where': f"{col['name']} is not null and {col['name']} <> ''"
+                            'where': test_where(f"{col['name']} is not null and {col['name']} <> ''", partition_scoped)
                         }
                     }
                 })
@@ -57,6 +91,8 @@ def create_dbt_source_table(yaml_data, table_name,project_path):
                         'value_set': flattened_lov
                     }
                 })
+                if partition_scoped:
+                    column_data['tests'][-1]['dbt_expectations.expect_column_values_to_be_in_set']['config'] = {'where': PARTITION_WHERE}
 
         if not_null.lower() == 'oui':
             # Add a test for not null values
@@ -65,6 +101,8 @@ def create_dbt_source_table(yaml_data, table_name,project_path):
                     'row_condition': f"{col['name']} is not null"
                 }
             })
+            if partition_scoped:
+                column_data['tests'][-1]['dbt_expectations.expect_column_values_to_not_be_null']['config'] = {'where': PARTITION_WHERE}
         
 
         dbt_table['columns'].append(column_data)
@@ -81,10 +119,110 @@ def create_dbt_source_table(yaml_data, table_name,project_path):
                 }
             }
         })
+        if partition_scoped:
+            dbt_table['tests'][-1]['unique_combination']['config'] = {'where': PARTITION_WHERE}
             
     
     return dbt_table
 
+def create_dbt_quality_test(yaml_data, table_name, source_group, partition_scoped=True, lov_seeds=None):
+    """Create a singular dbt test checking every column of a table in one scan.
+
+    The mandatory, LOV and primary key checks are conditional aggregates of a
+    single query; the test returns one row per failing check with the column,
+    the check and its number of failing rows. The LOV seeds are left joined.
+    """
+    lov_seeds = lov_seeds or {}
+    columns = yaml_data.get('columns', [])
+    checks = []
+    joins = []
+    for col in columns:
+        col_name = col['name']
+        if col.get('Mandatory', '').lower() == 'oui':
+            checks.append((f"{col_name}:mandatory", f"count_if({col_name} is null)"))
+        values = lov_values(col)
+        if col_name in lov_seeds:
+            joins.append(f"    left join {{{{ ref('{lov_seeds[col_name]}') }}}} as lov_{col_name.lower()} on {col_name}::varchar = lov_{col_name.lower()}.lov_value")
+            condition = f"{col_name} is not null and lov_{col_name.lower()}.lov_value is null"
+            if col.get('Mandatory', '').lower() == 'non':
+                condition = f"{col_name} <> '' and {condition}"
+            checks.append((f"{col_name}:lov", f"count_if({condition})"))
+        elif values:
+            value_set = ', '.join("'" + str(value).replace("'", "''") + "'" for value in values)
+            condition = f"{col_name} not in ({value_set})"
+            if col.get('Mandatory', '').lower() == 'non':
+                condition = f"{col_name} <> '' and {condition}"
+            checks.append((f"{col_name}:lov", f"count_if({condition})"))
+
+    primary_keys = [col['name'] for col in columns if col['PrimaryKey'] == 'PK']
+    if primary_keys:
+        checks.append((f"{','.join(primary_keys)}:primary_key", f"count(*) - count(distinct hash({', '.join(primary_keys)}))"))
+    if not checks:
+        return None
+
+    where = f"\n    where {PARTITION_WHERE}" if partition_scoped else ''
+    aggregates = ',\n'.join(f'        {aggregate} as "{check}"' for check, aggregate in checks)
+    unpivot_columns = ', '.join(f'"{check}"' for check, _ in checks)
+    return f"""{{{{ config(store_failures=true, tags=['data_quality']) }}}}
+
+with source_table as (
+    select * from {{{{ source('{source_group}', '{table_name}') }}}}{where}
+),
+
+violations as (
+    select
+{aggregates}
+    from source_table{''.join(chr(10) + join for join in joins)}
+)
+
+select
+    split_part(check_name, ':', 1) as column_name,
+    split_part(check_name, ':', 2) as check_type,
+    failures
+from violations
+unpivot (failures for check_name in ({unpivot_columns}))
+where failures > 0
+"""
+
+def lov_seed_name(col_name, source_group, jv):
+    """Name of the seed holding the allowed values of a LOV field of a source group for a country."""
+    return f"lov_{source_group.lower()}_{col_name.lower()}_{jv.lower()}"
+
+def write_lov_seeds(seeds_directory, seeds):
+    """Write the LOV seeds (seed name -> values) and their properties.
+
+    The values are loaded as varchar to keep the leading zeros of the codes.
+    Files are only rewritten when their content changed.
+    """
+    os.makedirs(seeds_directory, exist_ok=True)
+    files = {}
+    for seed_name, values in seeds.items():
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(['lov_value'])
+        writer.writerows([value] for value in dict.fromkeys(str(value) for value in values))
+        files[f"{seed_name}.csv"] = output.getvalue()
+    files["lov_seeds.yml"] = yaml.dump({
+        'version': 2,
+        'seeds': [{'name': seed_name, 'config': {'column_types': {'lov_value': 'varchar'}}} for seed_name in sorted(seeds)]
+    }, default_flow_style=False, sort_keys=False)
+
+    for file_name, content in files.items():
+        output_path = os.path.join(seeds_directory, file_name)
+        if os.path.exists(output_path) and read_file(output_path) == content:
+            continue
+        write_file(output_path, content)
+        print(f"Generated {output_path}")
+
+def write_dbt_quality_test(tests_directory, table_name, test_sql):
+    """Write the quality test of a table, only if its content changed."""
+    os.makedirs(tests_directory, exist_ok=True)
+    output_path = os.path.join(tests_directory, f"quality_{table_name.lower()}.sql")
+    if os.path.exists(output_path) and read_file(output_path) == test_sql:
+        return
+    write_file(output_path, test_sql)
+    print(f"Generated {output_path}")
+
 def write_dbt_source_file(output_directory, source_group, database, schema, tables):
     """Write the dbt source schema to a single YAML file."""
     dbt_source = {
@@ -132,6 +270,77 @@ def write_dbt_model_refresh_external_tables(output_directory, tables,config):
         
     print(f"Generated {output_path}")
 
+def write_dbt_model_refresh_external_partitions(output_directory, tables, config):
+    """Write the macro refreshing only the date batch partition of the external tables.
+
+    `tables` maps each external table to its path in the external stage. The
+    macro lists the date_batch=<date_batch>/ folder of every table (optionally
+    restricted to `tables`) and only refreshes the tables that received files,
+    so the refresh time does not grow with the history of the tables. Native
+    tables (snowflake_table_type: native) load the partition with SP_LOAD_<table>.
+    """
+    jv = config["jv"]
+    project_path = config["project_path"]
+    stage = f"SCH_{project_path.split('-')[0].upper()}_SL.STG_S3_{jv.upper()}_{config['source'].upper()}"
+    macro_name = f"refresh_external_partitions_model_{project_path.replace('-', '_')}"
+
+    output = '{' + '%' + f" macro {macro_name}(date_batch, tables=none) " + '%' + '}\n\n'
+    output += '{' + '%' + f" set stage = '{stage}' " + '%' + '}\n'
+    output += '{' + '%' + ' set table_list = ' + str(tables) + ' %' + '}\n\n'
+    output += '{' + '%' + ' for table_name, table_location in table_list.items() if tables is none or table_name in tables ' + '%' + '}\n'
+    output += '    {' + '%' + " set partition_location = 'date_batch=' ~ date_batch ~ '/' " + '%' + '}\n'
+    output += '    {' + '%' + " set files = run_query(\"LIST '@\" ~ stage ~ \"/\" ~ table_location ~ \"/\" ~ partition_location ~ \"'\") " + '%' + '}\n'
+    output += '    {' + '%' + ' if files.rows | length > 0 ' + '%' + '}\n'
+    if config.get('snowflake_table_type', 'external') == 'native':
+        # Delete-insert of the partition in the native table
+        output += '        {' + '%' + " do run_query(\"CALL \" ~ table_name.split('.')[0] ~ \".SP_LOAD_\" ~ table_name.split('.')[1] ~ \"('\" ~ date_batch ~ \"')\") " + '%' + '}\n'
+    elif config.get('external_table_partition_type', 'auto') == 'user_specified':
+        output += '        {' + '%' + " set registered = run_query(\"SELECT 1 FROM \" ~ table_name ~ \" WHERE DATE_BATCH_PARTITION = '\" ~ date_batch ~ \"' LIMIT 1\") " + '%' + '}\n'
+        output += '        {' + '%' + ' if registered.rows | length > 0 ' + '%' + '}\n'
+        output += '            {' + '%' + " do run_query(\"ALTER EXTERNAL TABLE \" ~ table_name ~ \" DROP PARTITION LOCATION '\" ~ partition_location ~ \"'\") " + '%' + '}\n'
+        output += '        {' + '%' + ' endif ' + '%' + '}\n'
+        output += '        {' + '%' + " do run_query(\"ALTER EXTERNAL TABLE \" ~ table_name ~ \" ADD PARTITION (DATE_BATCH_PARTITION = '\" ~ date_batch ~ \"') LOCATION '\" ~ partition_location ~ \"'\") " + '%' + '}\n'
+    else:
+        output += '        {' + '%' + " do run_query(\"ALTER EXTERNAL TABLE \" ~ table_name ~ \" REFRESH '\" ~ partition_location ~ \"'\") " + '%' + '}\n'
+    output += '        {' + '%' + ' do log("Refreshed " ~ table_name ~ " partition " ~ date_batch, info=True) ' + '%' + '}\n'
+    output += '    {' + '%' + ' endif ' + '%' + '}\n'
+    output += '{' + '%' + ' endfor ' + '%' + '}\n\n'
+    output += '{' + '%' + ' endmacro ' + '%' + '}'
+
+    output_path = os.path.join(output_directory, f"{macro_name}.sql")
+
+    with open(output_path, "w") as file:
+        file.write(output)
+
+    print(f"Generated {output_path}")
+
+def write_dbt_collect_freshness(output_directory):
+    """Write the collect_freshness override used by the external tables.
+
+    For FILE_REGISTRATION_LOADED_AT_FIELD the freshness is the latest
+    date_batch=<date>/ folder of the files registered in the external table,
+    read from information_schema metadata. Any other loaded_at_field falls
+    back to the dbt implementation.
+    """
+    output = '{' + '%' + ' macro collect_freshness(source, loaded_at_field, filter) ' + '%' + '}\n'
+    output += '    {' + '%' + f" if loaded_at_field == '{FILE_REGISTRATION_LOADED_AT_FIELD}' " + '%' + '}\n'
+    output += '        {' + '%' + " call statement('collect_freshness', fetch_result=True, auto_begin=False) " + '%' + '}\n'
+    output += "            select\n"
+    output += "                max(try_to_date(split_part(split_part(file_name, 'date_batch=', 2), '/', 1)))::timestamp as max_loaded_at,\n"
+    output += "                " + '{' + "{ current_timestamp() }} as snapshotted_at\n"
+    output += "            from table(" + '{' + "{ source.database }}.information_schema.external_table_files(table_name => '" + '{' + "{ source }}'))\n"
+    output += '        {' + '%' + ' endcall ' + '%' + '}\n'
+    output += '        {' + '%' + " do return(load_result('collect_freshness')) " + '%' + '}\n'
+    output += '    {' + '%' + ' endif ' + '%' + '}\n'
+    output += '    {' + '%' + ' do return(dbt.collect_freshness(source, loaded_at_field, filter)) ' + '%' + '}\n'
+    output += '{' + '%' + ' endmacro ' + '%' + '}'
+
+    output_path = os.path.join(output_directory, "collect_freshness.sql")
+    if os.path.exists(output_path) and read_file(output_path) == output:
+        return
+    write_file(output_path, output)
+    print(f"Generated {output_path}")
+
 def read_file(file_path):
     """Load file."""
     try:
@@ -163,6 +372,94 @@ def load_configuration(config_path):
         return None
     
     
+def update_dbt_project(dbt_directory):
+    """Set the date_batch_partition var in dbt_project.yml."""
+    dbt_project_file = read_file(os.path.join(dbt_directory, 'dbt_project.yml'))
+    if 'VAR_DATE_BATCH_PARTITION' not in dbt_project_file:
+        return
+    dbt_project_file = dbt_project_file.replace('VAR_DATE_BATCH_PARTITION','\'{{ var("date_batch_partition") }}\'')
+    write_file(os.path.join(dbt_directory, 'dbt_project.yml'), dbt_project_file)
+
+def dbt_table_name(gdc_table_name, jv):
+    """Return the Snowflake table name of a gdc OUT table."""
+    table_name = gdc_table_name
+    if table_name.endswith("_OUT"):
+        table_name = table_name[:-4]
+    if table_name.endswith(f'_{jv.upper()}'):
+        table_name = table_name[:len(f'_{jv.upper()}')]
+    if f'_{jv.upper()}_OUT' in table_name:
+        table_name = table_name.replace(f'_{jv.upper()}_OUT', '')
+    return table_name.replace('-', '_')
+
+def create_dbt_sources(config, gdc_tables, tables, macros_directory, write_macro=True):
+    """Build the dbt source of a project and write its refresh macros.
+
+    `gdc_tables` holds the Glue Data Catalog definitions keyed by gdc_*.json
+    file name and `tables` the table structures keyed by table_name_output.
+    The tests are restricted to the loaded partition unless the dbt_tests_scope
+    configuration key is full. With the dbt_tests_mode key set to consolidated,
+    the column tests of each table are replaced by one singular quality test
+    written in tests/<source group>/. The LOV longer than the lov_seed_threshold
+    key (default 100 values) are written as seeds in seeds/<source group>/.
+    The freshness of external tables is read from their registered files.
+    Returns the source group, database, schema and dbt tables.
+    """
+    jv = config["jv"]
+    project_path = config["project_path"]
+        
+    # DBT Source parameters
+    source_group = project_path
+    database = f"DB_BNK_{jv.upper()}_" + '{' + '{' + "env_var('ENV_DBT')" + '}' + '}'
+    schema = f"SCH_{source_group.split('-')[0].upper()}_SL"
+    source_group = project_path.replace('-','_')
+
+    # List to accumulate all table definitions
+    all_tables = []
+    tables_names = []           
+    tables_locations = {}
+    seeds = {}
+    lov_seed_threshold = config.get('lov_seed_threshold', 100)
+
+    for filename, table_meta in gdc_tables.items():
+        # Check if the file is a JSON file
+        if filename.endswith("_OUT.json"):
+            table_name = table_meta['Name']
+            yaml_table = table_name.split(f"_{jv.upper()}")[0].upper() + f"_OUT"
+            table_name = dbt_table_name(table_name, jv)
+            tables_names.append(schema + '.' + table_name)
+            # Path of the table in the external stage, after the bucket
+            tables_locations[schema + '.' + table_name] = '/'.join(table_meta['StorageDescriptor']['Location'].rstrip('/').split('/')[3:])
+
+            #find yaml tests
+            partition_scoped = config.get('dbt_tests_scope', 'partition') == 'partition'
+            lov_seeds = {}
+            for col in tables[yaml_table].get('columns', []):
+                values = lov_values(col)
+                if len(values) > lov_seed_threshold:
+                    lov_seeds[col['name']] = lov_seed_name(col['name'], source_group, jv)
+                    seeds[lov_seeds[col['name']]] = values
+            dbt_table = create_dbt_source_table(tables[yaml_table], table_name,project_path, partition_scoped, lov_seeds)
+            if config.get('dbt_tests_mode', 'generic') == 'consolidated':
+                dbt_table['tests'] = []
+                for column_data in dbt_table['columns']:
+                    column_data['tests'] = []
+                test_sql = create_dbt_quality_test(tables[yaml_table], table_name, source_group, partition_scoped, lov_seeds)
+                if test_sql:
+                    write_dbt_quality_test(os.path.join(os.path.dirname(macros_directory), 'tests', source_group), table_name, test_sql)
+            if config.get('snowflake_table_type', 'external') == 'external':
+                dbt_table['loaded_at_field'] = FILE_REGISTRATION_LOADED_AT_FIELD
+            all_tables.append(dbt_table)
+
+    if seeds:
+        write_lov_seeds(os.path.join(os.path.dirname(macros_directory), 'seeds', source_group), seeds)
+
+    if write_macro:
+        write_dbt_model_refresh_external_tables(macros_directory, tables_names,config)
+        write_dbt_model_refresh_external_partitions(macros_directory, tables_locations, config)
+        if config.get('snowflake_table_type', 'external') == 'external':
+            write_dbt_collect_freshness(macros_directory)
+    return source_group, database, schema, all_tables
+
 def main():
     # Directory containing all project folders
     root_folder = os.path.abspath('.')  # Adjust the path as neede
@@ -174,10 +471,7 @@ def main():
     os.makedirs(output_directory, exist_ok=True)
 
     # dbt_project.yml
-    dbt_project_file = read_file(os.path.join(dbt_directory, 'dbt_project.yml'))
-    dbt_project_file = dbt_project_file.replace('VAR_DATE_BATCH_PARTITION','\'{{ var("date_batch_partition") }}\'')
-    write_file(os.path.join(dbt_directory, 'dbt_project.yml'), dbt_project_file)
-
+    update_dbt_project(dbt_directory)
 
     if not config_tech:
         exit()
@@ -188,51 +482,27 @@ def main():
             exit()
 
         jv = config["jv"]
-        project_path = config["project_path"]
         json_path=config["json_path"]
         yaml_path=config["yaml_path"]
-            
-        # DBT Source parameters
-        source_group = project_path
-        database = f"DB_BNK_{jv.upper()}_" + '{' + '{' + "env_var('ENV_DBT')" + '}' + '}'
-        schema = f"SCH_{source_group.split('-')[0].upper()}_SL"
-        source_group = project_path.replace('-','_')
-
-
-        # List to accumulate all table definitions
-        all_tables = []
-        tables_names = []           
-
 
         # Extract table information
         # Loop through all files in the output directory
+        gdc_tables = {}
+        tables = {}
         for filename in os.listdir(f"./{json_path}"):
             # Check if the file is a JSON file
             if filename.endswith("_OUT.json"):
-                filename_yaml = filename.replace("_OUT.json",'')
                 # Load the contents of the JSON file into a Python variable
                 with open(f"./{json_path}/{filename}") as file:
                     table_meta = json.load(file)
+                gdc_tables[filename] = table_meta
                 
                 # Load the contents of the YAML file into a Python variable
-                table_name = table_meta['Name']
-                yaml_table = table_name.split(f"_{jv.upper()}")[0].upper() + f"_OUT.yaml"
-                if table_name.endswith("_OUT"):
-                    table_name = table_name[:-4]
-                if table_name.endswith(f'_{jv.upper()}'):
-                    table_name = table_name[:len(f'_{jv.upper()}')]
-                if f'_{jv.upper()}_OUT' in table_name:
-                    table_name = table_name.replace(f'_{jv.upper()}_OUT', '')
-                table_name = table_name.replace('-', '_')
-                tables_names.append(schema + '.' + table_name)
-
-                #find yaml tests
-                file_path = os.path.join(yaml_path, yaml_table)
-                yaml_data = load_yaml(file_path)
-                dbt_table = create_dbt_source_table(yaml_data, table_name,project_path)
-                all_tables.append(dbt_table)
+                yaml_table = table_meta['Name'].split(f"_{jv.upper()}")[0].upper() + f"_OUT"
+                if yaml_table not in tables:
+                    tables[yaml_table] = load_yaml(os.path.join(yaml_path, f"{yaml_table}.yaml"))
 
-        write_dbt_model_refresh_external_tables(macros_directory, tables_names,config)
+        source_group, database, schema, all_tables = create_dbt_sources(config, gdc_tables, tables, macros_directory)
 
     # Write all tables to a single dbt source YAML file
     write_dbt_source_file(output_directory, source_group, database, schema, all_tables)
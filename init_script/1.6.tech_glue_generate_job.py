@@ -1,8 +1,26 @@
 import json
+import math
+import re
 import yaml
 import os
 from pathlib import Path
 
+# Relative parsing cost of a column by type (varchar = 1)
+COLUMN_COST = {"varchar": 1.0, "integer": 1.5, "decimal": 2.0, "date": 3.0, "timestamp": 3.0}
+# Fixed cost of opening and listing each file of a run, in MB of load
+FILE_OVERHEAD_MB = 32
+# Records of a file when the table has no volume stats
+DEFAULT_RECORDS = 1000000
+# Weighted MB a G.1X worker (4 vCPU, 16 GB) processes in a run, G.2X twice as much
+WORKER_LOAD_MB = {"G.1X": 1024, "G.2X": 2048}
+# Records above this width need the memory of a G.2X worker for a 500k records row group
+WIDE_RECORD_BYTES = 4096
+MIN_WORKERS = 2
+# Periodicities whose runs can wait for Flex capacity
+FLEX_PERIODS = ["weekly", "monthly", "quarterly", "yearly"]
+# Modules of glue/scripts imported by the job scripts
+SCRIPT_MODULES = ["contract", "csv_to_parquet", "fixed_width"]
+
 
 def create_json_file(table_input, json_path, job_name):
     """Save the table_input in a JSON file for versioning."""
@@ -20,9 +38,138 @@ def create_json_file(table_input, json_path, job_name):
         print(f"Error saving JSON file for {job_name}: {e}")
 
 
-def create_resource(config, python_script, job_name):
+def column_kind(column_type):
+    """Kind of a contract column type: varchar, integer, decimal, date or timestamp."""
+    kind = re.match(r"\s*([a-z_]*)", str(column_type or "").lower()).group(1)
+    if kind.startswith("int") or kind in ("bigint", "smallint"):
+        return "integer"
+    if kind in ("decimal", "numeric", "number"):
+        return "decimal"
+    if kind.startswith("timestamp"):
+        return "timestamp"
+    return "date" if kind == "date" else "varchar"
+
+def load_table_structures(yaml_path):
+    """Load the STG_*.yaml table structures (IN and OUT, as the pipeline passes them), keyed by table_name_output."""
+    tables = {}
+    if not os.path.isdir(yaml_path):
+        return tables
+    for filename in os.listdir(yaml_path):
+        if filename.endswith(".yaml") and filename.startswith("STG"):
+            with open(os.path.join(yaml_path, filename), "r") as file:
+                table_structure = yaml.safe_load(file)
+            tables[table_structure["table_name_output"]] = table_structure
+    return tables
+
+def column_length(column):
+    """Length of a contract column: the digits before the comma ("15,2" is 15), else 0 when unknown."""
+    match = re.match(r"\s*(\d+)\s*(?:,|$)", str(column.get("Length")))
+    return int(match.group(1)) if match else 0
+
+def table_load(table_structure, stats):
+    """Estimated load of one run on a table: record width, weighted MB and periodicities.
+
+    The volume of a run comes from the stats of the table (mb and files per
+    run) when known, else from its record width and DEFAULT_RECORDS; it is
+    weighted by the parsing cost of the column types.
+    """
+    columns = table_structure.get("columns") or []
+    record_bytes = sum(column_length(column) for column in columns) + len(columns)
+    cost = sum(COLUMN_COST[column_kind(column.get("type"))] for column in columns) / len(columns) if columns else 1.0
+    mb = stats.get("mb", record_bytes * DEFAULT_RECORDS / 1024 ** 2)
+    files = stats.get("files", 1)
+    return {
+        "record_bytes": record_bytes,
+        "load_mb": mb * cost + files * FILE_OVERHEAD_MB,
+        "periodicity": [period.lower() for period in table_structure.get("periodicity") or []],
+    }
+
+def load_volume_stats(config):
+    """Volumes per run of each table from the glue_volume_stats YAML file, if any."""
+    if config.get("glue_volume_stats") and os.path.exists(config["glue_volume_stats"]):
+        with open(config["glue_volume_stats"], "r") as file:
+            return yaml.safe_load(file) or {}
+    return {}
+
+def size_glue_job(config, tables):
+    """Worker type and count, auto-scaling, execution class and concurrency of the project jobs.
+
+    A run handles the files of one notification, so the job is sized for the
+    heaviest table; auto-scaling releases the workers smaller runs do not
+    need. Jobs whose periodicities all accept a delayed start run on Flex
+    capacity. Each periodicity has its own DAG, so as many runs may overlap.
+    The glue_worker_type, glue_number_of_workers, glue_execution_class and
+    glue_max_concurrent_runs configuration keys override the estimate.
+    """
+    volume_stats = load_volume_stats(config)
+    loads = [table_load(table_structure, volume_stats.get(name) or {}) for name, table_structure in tables.items()]
+    if not loads:
+        return {"worker_type": "G.1X", "number_of_workers": 5, "auto_scaling": False, "execution_class": "STANDARD", "max_concurrent_runs": 1}
+
+    max_workers = config.get("glue_max_workers", 10)
+    load_mb = max(load["load_mb"] for load in loads)
+    worker_type = "G.1X"
+    if max(load["record_bytes"] for load in loads) > WIDE_RECORD_BYTES or load_mb > max_workers * WORKER_LOAD_MB["G.1X"]:
+        worker_type = "G.2X"
+    worker_type = config.get("glue_worker_type", worker_type)
+    number_of_workers = min(max(math.ceil(load_mb / WORKER_LOAD_MB.get(worker_type, WORKER_LOAD_MB["G.1X"])), MIN_WORKERS), max_workers)
+    number_of_workers = config.get("glue_number_of_workers", number_of_workers)
+
+    periods = {period for load in loads for period in load["periodicity"]}
+    flex_periods = config.get("glue_flex_periods", FLEX_PERIODS)
+    execution_class = "FLEX" if periods and periods <= set(flex_periods) else "STANDARD"
+    return {
+        "worker_type": worker_type,
+        "number_of_workers": number_of_workers,
+        "auto_scaling": number_of_workers > MIN_WORKERS,
+        "execution_class": config.get("glue_execution_class", execution_class),
+        "max_concurrent_runs": config.get("glue_max_concurrent_runs", max(len(periods), 1)),
+    }
+
+def tuning_arguments(config):
+    """Job arguments for the many small files of a date batch.
+
+    The converters write the files of a date batch by groups of
+    glue_group_size_mb (default 128) into one parquet file each, and skip the
+    files converted by a previous run (glue_skip_processed: false converts
+    them again), see glue/scripts/csv_to_parquet.py.
+    """
+    return {
+        "--group-size-mb": str(config.get("glue_group_size_mb", 128)),
+        "--skip-processed": "true" if config.get("glue_skip_processed", True) else "false",
+    }
+
+def run_arguments(config, layout=False):
+    """Job arguments resolving the files, contracts and output of a run from its --notification.
+
+    The contracts and cfg_glue files are read from glue_config_location (the
+    glue/config folder of the repository on S3), the notified date batch from
+    the landing folder of the IN tables (see 1.3 landing_location) and the
+    parquet files are written to the project folder of the standard bucket.
+    """
+    project = config["project"].lower()
+    project_path = config["project_path"]
+    bucket_suffix = f"{config['jv'].lower()}-{config['source'].lower()}"
+    config_location = config.get("glue_config_location", "s3://s3b-dlz-environment-src-core-el/config")
+    arguments = {
+        "--contracts": f"{config_location}/{os.path.basename(os.path.normpath(config['yaml_path']))}",
+        "--cfg": f"{config_location}/cfg_glue_{project_path}.yaml",
+        "--landing": f"s3://s3b-dlz-environment-landing-{bucket_suffix}/{project}/" + config.get("landing_location_template", ""),
+        "--output": f"s3://s3b-dlz-environment-standard-{bucket_suffix}/{project}",
+        "--extra-py-files": ",".join(f"s3://s3b-dlz-environment-src-core-el/scripts/{module}.py" for module in SCRIPT_MODULES),
+    }
+    if layout:
+        arguments.update({
+            "--layouts": f"{config_location}/cfg_glue_{project_path}_layout-template.yaml",
+            "--project": config["project"],
+            "--jv": config["jv"],
+        })
+    return arguments
+
+def create_resource(config, python_script, job_name, sizing=None, arguments=None):
     project = config["project"]
     source = config["source"]
+    sizing = sizing or size_glue_job(config, {})
 
     resource_descriptor = {
         "resource": {
@@ -42,10 +189,11 @@ def create_resource(config, python_script, job_name):
                 },
                 "max_retries": 0,
                 "timeout": 2880,
-                "number_of_workers": 5,
-                "worker_type": "G.1X",
+                "number_of_workers": sizing["number_of_workers"],
+                "worker_type": sizing["worker_type"],
+                "execution_class": sizing["execution_class"],
                 "glue_version": "4.0",
-                "max_concurrent_runs": 1,
+                "max_concurrent_runs": sizing["max_concurrent_runs"],
                 "tags": {                
                 "source": source
                 }
@@ -53,20 +201,43 @@ def create_resource(config, python_script, job_name):
             }
         }
         }
+    resource_descriptor["resource"]["aws_glue_job"]["my_glue_job"]["default_arguments"].update(arguments or {})
+    if sizing["auto_scaling"]:
+        # number_of_workers is then the upper bound of the run
+        resource_descriptor["resource"]["aws_glue_job"]["my_glue_job"]["default_arguments"]["--enable-auto-scaling"] = "true"
     return resource_descriptor
 
-def create_glue_job(config):
+def create_glue_job(config, tables):
+    """Write the Glue job JSON of a project, sized for `tables` keyed by table_name_output."""
     project = config["project"]
     project_path = config["project_path"]
     source = config["source"]
     layout= config["multi_layout"]
     jv = config["jv"]
     glue_job_path = config["glue_job_path"]
+    if config.get('glue_job_mode', 'split') == 'fused' and layout.lower() == 'yes':
+        # validate_convert.py reads delimited files only, the layout files are split by demultiplex.py
+        raise ValueError(f"glue_job_mode fused is not available for the multi layout project {project}, use split")
 
     # Create an json_import_glue_job.txt
     with open(os.path.join(config["json_path"], 'json_import_glue_job.txt'), 'w') as file:
         pass
 
+    sizing = size_glue_job(config, tables)
+    arguments = {**run_arguments(config, layout.lower() == 'yes'), **tuning_arguments(config)}
+    print(f"Glue jobs of {project} sized to {sizing['number_of_workers']} x {sizing['worker_type']} ({sizing['execution_class']}, "
+          f"auto-scaling {sizing['auto_scaling']}, {sizing['max_concurrent_runs']} concurrent runs).")
+
+    if config.get('glue_job_mode', 'split') == 'fused':
+        # single job : check structure and convert to parquet in one pass, rejected rows to quarantine
+        python_script='int-s3-validate-convert'
+        job_name= f"{project.lower()}-{project_path.split('-')[0]}-{jv.lower()}-s3vc"
+
+        resource_descriptor=create_resource(config, python_script, job_name, sizing, arguments)
+        resource_descriptor["resource"]["aws_glue_job"]["my_glue_job"]["default_arguments"]["--max-rejected-ratio"] = str(config.get('glue_max_rejected_ratio', 0))
+        create_json_file(resource_descriptor, glue_job_path, job_name)
+        return
+
     # step 1 : check structure
     python_script='int-s3-structure-check'
     job_name= f"{project.lower()}-{project_path.split('-')[0]}-{jv.lower()}-s3sc"
@@ -74,7 +245,7 @@ def create_glue_job(config):
             python_script='int-s3-structure-check-layout'
             job_name= f"{project.lower()}-{project_path.split('-')[0]}-{jv.lower()}-s3scl"
 
-    resource_descriptor=create_resource(config, python_script, job_name)
+    resource_descriptor=create_resource(config, python_script, job_name, sizing, arguments)
     create_json_file(resource_descriptor, glue_job_path, job_name)
 
     # step 2 : csv to parquet
@@ -82,7 +253,7 @@ def create_glue_job(config):
     job_name= f"{project.lower()}-{project_path.split('-')[0]}-{jv.lower()}-ctop"
 
 
-    resource_descriptor=create_resource(config, python_script, job_name)
+    resource_descriptor=create_resource(config, python_script, job_name, sizing, arguments)
     create_json_file(resource_descriptor, glue_job_path, job_name)
 
 def load_configuration(config_path):
@@ -112,7 +283,7 @@ def main():
             exit()
 
         # generate glue job json
-        create_glue_job(config)
+        create_glue_job(config, load_table_structures(config["yaml_path"]))
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,47 @@
+import json
 import yaml
 from ruamel.yaml import YAML
 from string import Template
 import os
 import pandas as pd
 
-def create_airflow_dag(project, layout, source, jv, period):
-    
+# Routes of the el_sqs_dispatcher DAG, one {project: {periodicity: dag_id}} file per project
+ROUTES_FOLDER = "dags/el_sqs_routes"
+
+def create_airflow_dag(project, layout, source, jv, period, glue_job_mode='split', dag_trigger='dispatcher'):
+    """Generate the DAG of a project periodicity and return its dag_id."""
     with open("init_script/airflow-template.py", "r") as template_file:
         template_content = template_file.read()
+    if glue_job_mode not in ('split', 'fused'):
+        raise ValueError(f"Unknown glue_job_mode {glue_job_mode}, expected split or fused")
+    if glue_job_mode == 'fused' and layout:
+        raise ValueError(f"glue_job_mode fused is not available for the multi layout project {project}, use split")
+    if dag_trigger not in ('dispatcher', 'sensor'):
+        raise ValueError(f"Unknown dag_trigger {dag_trigger}, expected dispatcher or sensor")
     # Create a Template object
     template = Template(template_content)
-    output_text = template.substitute({"project": project.lower(), "layout": layout.lower(), "source_split": source.lower().split('-')[0], "source_file": source.lower(), "source": source.lower().replace('-', '_'), "jv": jv.lower(), "period": period})
+    output_text = template.substitute({"project": project.lower(), "layout": layout.lower(), "source_split": source.lower().split('-')[0], "source_file": source.lower(), "source": source.lower().replace('-', '_'), "jv": jv.lower(), "period": period, "glue_job_mode": glue_job_mode, "dag_trigger": dag_trigger})
 
-    file_path = f"dags/{jv.lower()}_el_{source.lower().replace('-', '_')}_{period.lower()}.py"
+    dag_id = f"{jv.lower()}_el_{source.lower().replace('-', '_')}_{period.lower()}"
+    file_path = f"dags/{dag_id}.py"
     with open(file_path, "w") as output_file:
         output_file.write(output_text)
+    return dag_id
+
+def create_dispatcher_dag(project, routes):
+    """Write the routes of a project and the el_sqs_dispatcher DAG draining the queue for every project.
+
+    routes maps each periodicity to its dag_id. The dispatcher reads the route
+    files when it runs, so each project only rewrites its own file.
+    """
+    os.makedirs(ROUTES_FOLDER, exist_ok=True)
+    with open(os.path.join(ROUTES_FOLDER, f"{project.lower()}.json"), "w") as routes_file:
+        json.dump({project.lower(): routes}, routes_file, indent=2, sort_keys=True)
+
+    with open("init_script/airflow-dispatcher-template.py", "r") as template_file:
+        template = Template(template_file.read())
+    with open("dags/el_sqs_dispatcher.py", "w") as output_file:
+        output_file.write(template.substitute({"routes_folder": os.path.basename(ROUTES_FOLDER)}))
 
 def load_configuration(config_path):
     """Load configuration from the YAML file."""
@@ -28,28 +55,55 @@ def load_configuration(config_path):
         print(f"Error loading configuration file: {e}")
         return None
 
-def extract_periodicities(file_path):
+def periodicities_from_names(names):
+    """Return the distinct periodicities found in gdc table/file names."""
     # Initialiser un ensemble pour stocker les périodicités distinctes
     periodicities = set()
  
     # Liste des périodicités connues
     known_periodicities = {'weekly', 'daily', 'monthly', 'yearly', 'quarterly'}
  
-    # Ouvrir le fichier en mode lecture
-    with open(file_path, 'r') as file:
-        # Lire chaque ligne du fichier
-        for line in file:
-            # Diviser la ligne en mots
-            words = line.split('_')
-            # Parcourir les mots pour trouver les périodicités
-            for word in words:
-                if word.lower() in known_periodicities:
-                    periodicities.add(word.lower())
+    for line in names:
+        # Diviser la ligne en mots
+        words = line.split('_')
+        # Parcourir les mots pour trouver les périodicités
+        for word in words:
+            if word.lower() in known_periodicities:
+                periodicities.add(word.lower())
  
     # Convertir l'ensemble en liste et retourner
     return list(periodicities)
 
-if __name__ == "__main__":
+def extract_periodicities(file_path):
+    # Ouvrir le fichier en mode lecture
+    with open(file_path, 'r') as file:
+        # Lire chaque ligne du fichier
+        return periodicities_from_names(file)
+
+def create_airflow_dags(config, list_perdiod):
+    """Generate one DAG per periodicity of a project.
+
+    With the dag_trigger configuration key at dispatcher (the default), the
+    DAGs are triggered by el_sqs_dispatcher with the notification as conf;
+    at sensor, each DAG polls the SQS queue itself. The queue being shared,
+    every project of a queue uses the same trigger.
+    """
+    multi_layout = config["multi_layout"]
+    project_path = config["project_path"]
+    project = config["project"]
+    jv = config["jv"]
+    layout = ''
+
+    if multi_layout.lower() == 'yes':
+        layout = 'l'
+    dag_trigger = config.get('dag_trigger', 'dispatcher')
+    routes = {}
+    for period in list_perdiod:
+        routes[period.lower()] = create_airflow_dag(project.lower(), layout, project_path.lower(), jv,period, config.get('glue_job_mode', 'split'), dag_trigger)
+    if dag_trigger == 'dispatcher':
+        create_dispatcher_dag(project, routes)
+
+def main():
     root_folder = os.path.abspath('.')  # Adjust the path as neede
     config_folder = os.path.join(root_folder, 'config')
     config_tech = load_configuration(os.path.join(config_folder, 'config_tech.yaml'))
@@ -62,16 +116,11 @@ if __name__ == "__main__":
         if not config:
             exit()
 
-        multi_layout = config["multi_layout"]
-        project_path = config["project_path"]
         project = config["project"]
-        jv = config["jv"]
-        layout = ''
         #folder for periodicity
         glue_folder = os.path.join(root_folder, f'glue/ddl/{project}')
         list_perdiod = extract_periodicities(os.path.join(glue_folder, 'json_import_gdc.txt'))
+        create_airflow_dags(config, list_perdiod)
 
-        if multi_layout.lower() == 'yes':
-            layout = 'l'
-        for period in list_perdiod:
-            create_airflow_dag(project.lower(), layout, project_path.lower(), jv,period)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import logging
+import os
+import time
+from airflow import DAG
+from airflow.api.common.trigger_dag import trigger_dag
+from airflow.exceptions import DagRunAlreadyExists
+from airflow.operators.python import PythonOperator
+from datetime import datetime
+import boto3
+import json
+
+
+SQS_QUEUE_URL = 'SQS_QUEUE_URL'  # Your SQS Queue URL
+# {project: {periodicity: EL DAG}} files written by 1.8.tech_generate_airflow_dag, one per project
+ROUTES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '${routes_folder}')
+# Receive calls wait up to 20 seconds for messages, 10 messages at most per call
+WAIT_TIME_SECONDS = 20
+MAX_MESSAGES = 10
+# A run drains the queue for at most this long, the next run starts a minute later
+DRAIN_SECONDS = 50
+
+
+def message_period(message_data, periods):
+    """
+    This function returns the periodicity of a notification: its periodicity field,
+    else the only periodicity of the project.
+    """
+    if message_data.get('periodicity'):
+        return str(message_data['periodicity']).lower()
+    if len(periods) == 1:
+        return next(iter(periods))
+    return None
+
+
+def load_routes():
+    """This function merges the route files of the projects, read when the task runs."""
+    routes = {}
+    for filename in sorted(os.listdir(ROUTES_FOLDER)):
+        if filename.endswith('.json'):
+            with open(os.path.join(ROUTES_FOLDER, filename), 'r') as file:
+                routes.update(json.load(file))
+    return routes
+
+
+def route_message(message_data, routes):
+    """This function returns the EL DAG of a notification, None when no DAG handles it."""
+    periods = routes.get(str(message_data.get('project', '')).lower(), {})
+    return periods.get(message_period(message_data, periods))
+
+
+# Drain the SQS queue and trigger the EL DAG of each notification
+def dispatch_messages(**kwargs):
+    """
+    This function long-polls the SQS queue and triggers one run of the EL DAG of each
+    message, with the notification as conf. A message is deleted once its run exists;
+    messages no DAG handles are left to the redrive policy of the queue.
+    """
+    routes = load_routes()
+    sqs_client = boto3.client('sqs', region_name='eu-west-3')
+    deadline = time.monotonic() + DRAIN_SECONDS
+    dispatched = 0
+
+    while time.monotonic() < deadline:
+        response = sqs_client.receive_message(
+            QueueUrl=SQS_QUEUE_URL,
+            MaxNumberOfMessages=MAX_MESSAGES,
+            WaitTimeSeconds=WAIT_TIME_SECONDS,
+        )
+        messages = response.get('Messages', [])
+        if not messages:
+            break
+
+        entries = []
+        for message in messages:
+            try:
+                message_data = json.loads(message['Body'])
+            except ValueError:
+                logging.warning(f"Message {message['MessageId']} is not a JSON notification, left in the queue.")
+                continue
+            dag_id = route_message(message_data, routes)
+            if dag_id is None:
+                logging.warning(f"No EL DAG for message {message['MessageId']}: {message['Body']}")
+                continue
+            try:
+                # The run id makes a redelivered message trigger its DAG only once
+                trigger_dag(dag_id=dag_id, run_id=f"sqs__{message['MessageId']}", conf={'notification': message_data}, replace_microseconds=False)
+                logging.info(f"Message {message['MessageId']} dispatched to {dag_id}.")
+            except DagRunAlreadyExists:
+                logging.info(f"Message {message['MessageId']} was already dispatched to {dag_id}.")
+            entries.append({'Id': str(len(entries)), 'ReceiptHandle': message['ReceiptHandle']})
+
+        if entries:
+            response = sqs_client.delete_message_batch(QueueUrl=SQS_QUEUE_URL, Entries=entries)
+            for failed in response.get('Failed', []):
+                # Received again later, its DAG run already exists
+                logging.warning(f"Message {failed['Id']} could not be deleted: {failed.get('Message')}")
+            dispatched += len(entries)
+    return dispatched
+
+
+# DAG default arguments
+default_args = {
+    'owner': 'airflow',
+    'start_date': datetime(2024, 1, 1, 0, 0),
+    'retries': 0,
+}
+
+# Define the DAG
+dag = DAG(
+    dag_id='el_sqs_dispatcher',
+    default_args=default_args,
+    schedule_interval='* * * * *',  # Every minute, one run at a time
+    max_active_runs=1,
+    catchup=False,
+    tags = ['el','dispatcher']
+)
+
+# Task draining the queue
+dispatch_messages_task = PythonOperator(
+    task_id='dispatch_messages',
+    python_callable=dispatch_messages,
+    provide_context=True,
+    dag=dag
+)
@@ -1,15 +1,21 @@
 import logging
 from airflow import DAG
+from airflow.exceptions import AirflowException
 from airflow.models import Variable
+from airflow.models.baseoperator import chain
 from airflow.providers.amazon.aws.sensors.sqs import SqsSensor
 from airflow.providers.amazon.aws.operators.sns import SnsPublishOperator
-from airflow.operators.python import PythonOperator
+from airflow.operators.python import BranchPythonOperator, PythonOperator
 from airflow.operators.bash import BashOperator
 from airflow.operators.dummy import DummyOperator
 from airflow.utils.dates import days_ago
 from airflow.providers.amazon.aws.operators.glue import GlueJobOperator
 from airflow.utils.trigger_rule import TriggerRule
+from airflow.utils.log.secrets_masker import mask_secret
 from datetime import datetime
+import functools
+import hashlib
+import os
 import boto3
 import json
 from botocore.exceptions import ClientError
@@ -63,17 +69,77 @@ snowflake_user_ssm = "ssp-dlz-ENVIRONMENT-${jv}-snowflake-user"
 snowflake_role_ssm = "ssp-dlz-ENVIRONMENT-${jv}-snowflake-role"
 snowflake_warehouse_ssm = "ssp-dlz-ENVIRONMENT-${jv}-snowflake-warehouse"
 
-SNOWFLAKE_ACCOUNT = get_ssm_parameter(snowflake_account_ssm)
-SNOWFLAKE_USER = get_ssm_parameter(snowflake_user_ssm)
-SNOWFLAKE_ROLE = get_ssm_parameter(snowflake_role_ssm)
-SNOWFLAKE_WAREHOUSE = get_ssm_parameter(snowflake_warehouse_ssm)
-SNOWFLAKE_PASSWORD = get_secret(snowflake_secret)
+SNOWFLAKE_PARAMETERS = {
+    'SNOWFLAKE_ACCOUNT': snowflake_account_ssm,
+    'SNOWFLAKE_USER': snowflake_user_ssm,
+    'SNOWFLAKE_ROLE': snowflake_role_ssm,
+    'SNOWFLAKE_WAREHOUSE': snowflake_warehouse_ssm,
+}
+
+
+# Snowflake credentials are read when a task is rendered, never when the scheduler parses this file
+@functools.lru_cache(maxsize=None)
+def snowflake_credential(name):
+    """
+    This function returns a Snowflake credential: the password from Secrets Manager,
+    the other ones from SSM. Values are cached for the worker process.
+    """
+    if name == 'SNOWFLAKE_PASSWORD':
+        password = get_secret(snowflake_secret)
+        mask_secret(password)
+        return password
+    return get_ssm_parameter(SNOWFLAKE_PARAMETERS[name])
+
+# Notification SQS du run : conf du dispatcher, ou message du sensor
+def get_notification(kwargs):
+    """
+    This function returns the SQS notification of the run: the conf given by the
+    dispatcher DAG, else the message received by the wait_for_sqs_message sensor.
+    """
+    conf = kwargs['dag_run'].conf or {}
+    if conf.get('notification'):
+        return conf['notification']
+    message = kwargs['ti'].xcom_pull(task_ids='wait_for_sqs_message', key='messages')
+    if message:
+        return json.loads(message[0]['Body'])
+    return None
+
+# Seeds LOV de la source : chargés par dbt seed seulement quand leurs fichiers changent
+DBT_SEEDS_FOLDER = '/usr/local/airflow/dags/${jv}-el-${source_file}-${period}/dbt/seeds/${source}'
+DBT_SEEDS_VARIABLE = 'dbt_seeds_${jv}_${source}'
+
+def seeds_fingerprint():
+    """
+    This function returns the sha256 of the LOV seed files of the source,
+    None when the source has no seeds.
+    """
+    if not os.path.isdir(DBT_SEEDS_FOLDER):
+        return None
+    digest = hashlib.sha256()
+    for file_name in sorted(os.listdir(DBT_SEEDS_FOLDER)):
+        digest.update(file_name.encode())
+        with open(os.path.join(DBT_SEEDS_FOLDER, file_name), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def check_seeds(**kwargs):
+    """
+    This function branches to dbt_seed when the seed files differ from the last
+    loaded ones, else directly to dbt_run.
+    """
+    fingerprint = seeds_fingerprint()
+    if fingerprint is None or fingerprint == Variable.get(DBT_SEEDS_VARIABLE, default_var=None):
+        return 'dbt_run'
+    logging.info("LOV seeds changed since their last load.")
+    return 'dbt_seed'
+
+def save_seeds_fingerprint(context):
+    """This function records the fingerprint of the seeds loaded by dbt_seed."""
+    Variable.set(DBT_SEEDS_VARIABLE, seeds_fingerprint())
 
 # Fonction pour extraire la balise date_batch de la notification SQS
 def extract_date_batch(**kwargs):
-    notification = kwargs['ti'].xcom_pull(task_ids='wait_for_sqs_message', key='messages')
-    body = notification[0]['Body']
-    message = json.loads(body)
+    message = get_notification(kwargs)
     date_batch = message['dateBatch']
     return date_batch
  
@@ -82,19 +148,13 @@ def extract_date_batch(**kwargs):
 # STEP 01 - Define the task to check files in AWS Glue
 def check_glue_file_structure(**kwargs):
     """
-    This function pulls an SQS message from XCom, extracts the body,
+    This function retrieves the SQS notification of the run
     and triggers an AWS Glue job to verify the file structure.
     """
-    # Retrieve the task instance and the SQS message from XCom
-    task_instance = kwargs['ti']
-    message = task_instance.xcom_pull(task_ids='wait_for_sqs_message', key='messages')
- 
-    if message:
-        # Extract the body of the first message
-        body = message[0]['Body']
-        # Parse the JSON content from the message body
-        message_data = json.loads(body)
+    # Retrieve the SQS notification of the run
+    message_data = get_notification(kwargs)
  
+    if message_data:
         # Set the Glue job name and prepare arguments
         glue_job_name = "glue-job-dlz-ENVIRONMENT-${project}-${source_split}-${jv}-s3sc${layout}"
         job_arguments = {
@@ -114,29 +174,24 @@ def check_glue_file_structure(**kwargs):
             glue_job_operator.execute(context=kwargs)
        
         except Exception as e:
+            # Fail the task: the SQS message is already deleted, the run must not end as a success
             logging.error(f"Glue Job failed: {e}")
-            return 'end_workflow'
+            raise
     else:
-        # Raise an exception if no message is found in XCom
-        logging.warning("No message found in XCom.")
-        return 'end_workflow'
+        # Raise an exception if no message is found
+        raise AirflowException("No SQS notification found in the DAG run conf nor in XCom.")
  
  
 # STEP 02 - Define the task to convert CSV to Parquet using AWS Glue
 def convert_csv_to_parquet(**kwargs):
     """
     This function triggers an AWS Glue job to convert CSV files to Parquet format.
-    It retrieves the SQS message from XCom and passes it as a parameter to the Glue job.
+    It retrieves the SQS notification of the run and passes it as a parameter to the Glue job.
     """
-    # Retrieve the task instance and the SQS message from XCom
-    task_instance = kwargs['ti']
-    message = task_instance.xcom_pull(task_ids='wait_for_sqs_message', key='messages')
- 
-    if message:
-        # Extract and parse the message body
-        body = message[0]['Body']
-        message_data = json.loads(body)
+    # Retrieve the SQS notification of the run
+    message_data = get_notification(kwargs)
  
+    if message_data:
         # Set the Glue job name and prepare arguments
         glue_job_name = "glue-job-dlz-ENVIRONMENT-${project}-${source_split}-${jv}-ctop"
         job_arguments = {
@@ -155,12 +210,49 @@ def convert_csv_to_parquet(**kwargs):
             )
             glue_job_operator.execute(context=kwargs)
         except Exception as e:
+            # Fail the task: the SQS message is already deleted, the run must not end as a success
             logging.error(f"Glue Job failed: {e}")
-            return 'end_workflow'
+            raise
     else:
-        # Raise an exception if no message is found in XCom
-        logging.warning("No message found in XCom.")
-        return 'end_workflow'
+        # Raise an exception if no message is found
+        raise AirflowException("No SQS notification found in the DAG run conf nor in XCom.")
+ 
+ 
+# STEP 01 (fused) - Define the task to check files and convert them to Parquet in a single AWS Glue job
+def validate_and_convert_files(**kwargs):
+    """
+    This function triggers the AWS Glue job that checks the file structure and converts
+    the valid rows to Parquet in one pass, the rejected rows being written to quarantine.
+    It retrieves the SQS notification of the run and passes it as a parameter to the Glue job.
+    """
+    # Retrieve the SQS notification of the run
+    message_data = get_notification(kwargs)
+ 
+    if message_data:
+        # Set the Glue job name and prepare arguments
+        glue_job_name = "glue-job-dlz-ENVIRONMENT-${project}-${source_split}-${jv}-s3vc${layout}"
+        job_arguments = {
+            '--notification': json.dumps(message_data)
+        }
+ 
+        try:
+            # Trigger the AWS Glue job
+            glue_job_operator = GlueJobOperator(
+                task_id='run_glue_validate_convert_op',
+                job_name=glue_job_name,
+                script_args=job_arguments,
+                aws_conn_id='aws_default',
+                region_name='eu-west-3',
+                dag=kwargs['dag'],
+            )
+            glue_job_operator.execute(context=kwargs)
+        except Exception as e:
+            # Fail the task: the SQS message is already deleted, the run must not end as a success
+            logging.error(f"Glue Job failed: {e}")
+            raise
+    else:
+        # Raise an exception if no message is found
+        raise AirflowException("No SQS notification found in the DAG run conf nor in XCom.")
  
  
 # DAG default arguments
@@ -168,7 +260,6 @@ default_args = {
     'owner': 'airflow',
     'start_date': datetime(2024, 1, 1, 0, 0),
     'retries': 0,
-    'max_active_runs': 1
 }
  
 # Define the DAG
@@ -176,8 +267,10 @@ dag = DAG(
     dag_id='${jv}_el_${source}_${period}',
     default_args=default_args,
     schedule_interval=None,  # This DAG is triggered manually or by an event
+    max_active_runs=1,  # The runs triggered by the dispatcher wait in the queued state
     catchup=False,
-    tags = ['el','${jv}','${source}','${period}']
+    tags = ['el','${jv}','${source}','${period}'],
+    user_defined_macros={'snowflake_credential': snowflake_credential}
 )
 # Dummy task to indicate the Start of the workflow
 start = DummyOperator(
@@ -185,22 +278,28 @@ start = DummyOperator(
     dag=dag
 )
 
-# SQS Sensor: Waits for a message in the SQS queue
-wait_for_sqs_message = SqsSensor(
-    task_id='wait_for_sqs_message',
-    sqs_queue='SQS_QUEUE_URL',  # Your SQS Queue URL
-    aws_conn_id='aws_default',  # AWS connection configured in Airflow
-    max_messages=1,  # Retrieve one message
-    message_filtering='jsonpath',
-    message_filtering_config='$$.project',
-    message_filtering_match_values=['${project}'],
-    #wait_time_seconds=10,  # Time to wait between checks
-    poke_interval= 5 * 60,  # How often to poll the SQS queue (5 minutes)
-    #visibility_timeout=600,  # SQS message visibility timeout
-    timeout= 1 * 60 * 60,  # Timeout for the sensor (1  heure)
-    mode='reschedule',  # 'reschedule' mode periodically checks the queue
-    dag=dag
-)
+# Trigger of the runs: the el_sqs_dispatcher DAG passes the notification as conf (dispatcher),
+# or the DAG waits for it in the SQS queue (sensor)
+if '${dag_trigger}' == 'sensor':
+    # SQS Sensor: Waits for a message in the SQS queue
+    wait_for_sqs_message = SqsSensor(
+        task_id='wait_for_sqs_message',
+        sqs_queue='SQS_QUEUE_URL',  # Your SQS Queue URL
+        aws_conn_id='aws_default',  # AWS connection configured in Airflow
+        max_messages=1,  # Retrieve one message
+        message_filtering='jsonpath',
+        message_filtering_config='$$.project',
+        message_filtering_match_values=['${project}'],
+        #wait_time_seconds=10,  # Time to wait between checks
+        poke_interval= 5 * 60,  # How often to poll the SQS queue (5 minutes)
+        #visibility_timeout=600,  # SQS message visibility timeout
+        timeout= 1 * 60 * 60,  # Timeout for the sensor (1  heure)
+        mode='reschedule',  # 'reschedule' mode periodically checks the queue
+        dag=dag
+    )
+    trigger_tasks = [wait_for_sqs_message]
+else:
+    trigger_tasks = []
 
 # Task pour extraire la balise date_batch
 extract_date_batch_task = PythonOperator(
@@ -210,22 +309,64 @@ extract_date_batch_task = PythonOperator(
     dag=dag,
 ) 
 
-# Task to run Glue job for file structure check
-run_glue_file_structure_check = PythonOperator(
-    task_id='run_glue_file_structure_check',
-    python_callable=check_glue_file_structure,
+# Glue tasks of the glue_job_mode: structure check then conversion (split), or both in one job (fused)
+if '${glue_job_mode}' == 'fused':
+    # Task to run Glue job checking the file structure and converting to Parquet in one pass
+    run_glue_validate_convert = PythonOperator(
+        task_id='run_glue_validate_convert',
+        python_callable=validate_and_convert_files,
+        provide_context=True,
+        dag=dag
+    )
+    glue_tasks = [run_glue_validate_convert]
+else:
+    # Task to run Glue job for file structure check
+    run_glue_file_structure_check = PythonOperator(
+        task_id='run_glue_file_structure_check',
+        python_callable=check_glue_file_structure,
+        provide_context=True,
+        dag=dag
+    )
+
+    # Task to run Glue job for CSV to Parquet conversion
+    run_csv_to_parquet_conversion = PythonOperator(
+        task_id='run_csv_to_parquet_conversion',
+        python_callable=convert_csv_to_parquet,
+        provide_context=True,
+        dag=dag,
+        trigger_rule=TriggerRule.ALL_SUCCESS
+    )
+    glue_tasks = [run_glue_file_structure_check, run_csv_to_parquet_conversion]
+
+# Snowflake credentials of the dbt tasks
+dbt_env = {'SNOWFLAKE_ACCOUNT': "{{ snowflake_credential('SNOWFLAKE_ACCOUNT') }}",
+    'SNOWFLAKE_USER': "{{ snowflake_credential('SNOWFLAKE_USER') }}",
+    'SNOWFLAKE_PASSWORD': "{{ snowflake_credential('SNOWFLAKE_PASSWORD') }}",
+    'SNOWFLAKE_ROLE': "{{ snowflake_credential('SNOWFLAKE_ROLE') }}",
+    'SNOWFLAKE_WAREHOUSE': "{{ snowflake_credential('SNOWFLAKE_WAREHOUSE') }}",
+    'ENV_DBT': 'ENVIRONMENT',
+    'DATE_BATCH': "{{ ti.xcom_pull(task_ids='extract_date_batch') }}"}
+
+# Task checking whether the LOV seeds changed since their last load
+check_seeds_task = BranchPythonOperator(
+    task_id='check_seeds',
+    python_callable=check_seeds,
     provide_context=True,
     dag=dag
 )
- 
- 
-# Task to run Glue job for CSV to Parquet conversion
-run_csv_to_parquet_conversion = PythonOperator(
-    task_id='run_csv_to_parquet_conversion',
-    python_callable=convert_csv_to_parquet,
-    provide_context=True,
-    dag=dag,
-    trigger_rule=TriggerRule.ALL_SUCCESS
+
+# Task loading the LOV seeds, only when their files changed
+dbt_seed = BashOperator(
+    task_id='dbt_seed',
+    bash_command=f"source /usr/local/airflow/python3-virtualenv/dbt-env/bin/activate;\
+    cp -R /usr/local/airflow/dags/${jv}-el-${source_file}-${period}/dbt/ /tmp;\
+    cd /tmp/dbt/;\
+    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt deps;\
+    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt seed --select path:seeds/${source};\
+    rm -rf /tmp/dbt/",
+    env=dbt_env,
+    on_success_callback=save_seeds_fingerprint,
+    dag=dag
 )
 
 dbt_run = BashOperator(
@@ -235,15 +376,12 @@ dbt_run = BashOperator(
     ls -R /tmp;\
     cd /tmp/dbt/;\
     /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt deps;\
-    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt run-operation refresh_external_tables_model_${source};\
-    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt test --vars '{{{{ var('date_variable', \'{{ ti.xcom_pull(task_ids='extract_date_batch') }}\') }}' ;\
+    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt run-operation refresh_external_partitions_model_${source} --args \"{{date_batch: '$$DATE_BATCH'}}\";\
+    /usr/local/airflow/python3-virtualenv/dbt-env/bin/dbt test --vars \"{{date_batch_partition: '$$DATE_BATCH'}}\";\
     rm -rf /tmp/dbt/",
-    env={'SNOWFLAKE_ACCOUNT': SNOWFLAKE_ACCOUNT,
-        'SNOWFLAKE_USER': SNOWFLAKE_USER,
-        'SNOWFLAKE_PASSWORD': SNOWFLAKE_PASSWORD,
-        'SNOWFLAKE_ROLE': SNOWFLAKE_ROLE,
-        'SNOWFLAKE_WAREHOUSE': SNOWFLAKE_WAREHOUSE,
-        'ENV_DBT': 'ENVIRONMENT'},
+    env=dbt_env,
+    # Also runs when dbt_seed is skipped
+    trigger_rule=TriggerRule.NONE_FAILED_MIN_ONE_SUCCESS,
     dag=dag
 )
 
@@ -252,7 +390,7 @@ dbt_run = BashOperator(
 send_sns = SnsPublishOperator(
     task_id='send_sns_message',
     target_arn=SNS_QUEUE_URL,  # SNS topic arn to which you want to publish the message
-    message= "{{ ti.xcom_pull(task_ids='wait_for_sqs_message', key='messages') }}", # To completed
+    message= "{{ dag_run.conf.get('notification') or ti.xcom_pull(task_ids='wait_for_sqs_message', key='messages') }}", # To completed
     subject='Message to Snowflake team ${source_file}-${period}',
     dag=dag
 )
@@ -274,6 +412,7 @@ end_error = DummyOperator(
 )
  
 # Define the task dependencies
-start >> wait_for_sqs_message >> extract_date_batch_task >> run_glue_file_structure_check >> run_csv_to_parquet_conversion >> dbt_run >> send_sns
-[extract_date_batch_task, run_glue_file_structure_check, run_csv_to_parquet_conversion, dbt_run, send_sns] >> end_successfull
-[extract_date_batch_task, run_glue_file_structure_check, run_csv_to_parquet_conversion, dbt_run, send_sns] >> end_error
+chain(start, *trigger_tasks, extract_date_batch_task, *glue_tasks, check_seeds_task, dbt_seed, dbt_run, send_sns)
+check_seeds_task >> dbt_run
+[extract_date_batch_task, *glue_tasks, check_seeds_task, dbt_run, send_sns] >> end_successfull
+[extract_date_batch_task, *glue_tasks, check_seeds_task, dbt_seed, dbt_run, send_sns] >> end_error
@@ -1,8 +1,3 @@
 python init_script/1.1.tech_gen_config.py
-python init_script/1.2.tech_gdc_extract_structure.py
-python init_script/1.3.tech_gdc_create_table.py
-python init_script/1.4.tech_sf_generate_ddl.py
-python init_script/1.6.tech_glue_generate_job.py
-python init_script/1.5.tech_generate_dbt_tests.py
+python init_script/tech_pipeline.py
 python init_script/1.7.tech_excel_to_dynamodb.py
-python init_script/1.8.tech_generate_airflow_dag.py
@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+INIT_SCRIPT_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Numbered init scripts used by the pipeline, in execution order
+STAGE_SCRIPTS = {
+    "extract": "1.2.tech_gdc_extract_structure",
+    "gdc": "1.3.tech_gdc_create_table",
+    "ddl": "1.4.tech_sf_generate_ddl",
+    "glue_job": "1.6.tech_glue_generate_job",
+    "dbt": "1.5.tech_generate_dbt_tests",
+    "dag": "1.8.tech_generate_airflow_dag",
+}
+
+_stages = {}
+
+def load_stage(name):
+    """Import a numbered init script as a module (loaded once per process)."""
+    if name not in _stages:
+        script_name = STAGE_SCRIPTS[name]
+        spec = importlib.util.spec_from_file_location(script_name.replace('.', '_'), os.path.join(INIT_SCRIPT_FOLDER, f"{script_name}.py"))
+        module = importlib.util.module_from_spec(spec)
+        # Registered so that process pool workers can unpickle the stage functions
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _stages[name] = module
+    return _stages[name]
+
+def load_configuration(config_path):
+    """Load configuration from the YAML file."""
+    try:
+        with open(config_path, "r") as file:
+            return yaml.safe_load(file)
+    except FileNotFoundError:
+        print(f"Configuration file {config_path} not found.")
+        return None
+    except yaml.YAMLError as e:
+        print(f"Error loading configuration file: {e}")
+        return None
+
+def load_project_configurations(root_folder):
+    """Load config_tech.yaml and every project configuration it lists.
+
+    Returns a list of (config file name, configuration) where the
+    configuration is None if the file could not be loaded.
+    """
+    config_folder = os.path.join(root_folder, 'config')
+    config_tech = load_configuration(os.path.join(config_folder, 'config_tech.yaml'))
+    if not config_tech:
+        return None
+
+    return [(file_cfg, load_configuration(os.path.join(config_folder, file_cfg))) for file_cfg in config_tech["yaml_cfg_files_path"]]
+
+def generator_fingerprint():
+    """Fingerprint of the generation code and templates, any change regenerates everything."""
+    digest = hashlib.sha256()
+    for file_name in [f"{script_name}.py" for script_name in STAGE_SCRIPTS.values()] + ["airflow-template.py", "airflow-dispatcher-template.py"]:
+        with open(os.path.join(INIT_SCRIPT_FOLDER, file_name), "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def manifest_path(config, root_folder):
+    """Path of the sheet fingerprints manifest of a project, in the untracked .cache folder next to the parsed contracts."""
+    return os.path.join(root_folder, '.cache', 'manifests', f"manifest_{config['project_path']}.json")
+
+def load_manifest(file_path):
+    """Load a manifest, None if it does not exist or cannot be read."""
+    try:
+        with open(file_path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_manifest(file_path, manifest):
+    """Save a manifest."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+def run_contract(config, root_folder, full=False, use_cache=True):
+    """Run every generation stage for one data contract.
+
+    The workbook is parsed once and the resulting contract is passed in memory
+    to the Glue catalog, Snowflake DDL, Glue job, dbt and Airflow DAG stages.
+    Artifacts are still written to disk but never read back.
+
+    Regeneration is incremental: the sheet fingerprints of the last run are
+    kept in .cache/manifests/manifest_<project_path>.json and each stage only rewrites
+    the artifacts whose upstream sheets changed. The table sheets drive the
+    table YAML, gdc JSON, DDL and the Glue job sizing, "Rules" (date formats)
+    every DDL, and the "Files list" the Glue jobs, dbt sources and DAGs. A new configuration, a
+    change of the generation code or full=True regenerates everything.
+    With use_cache the parsed workbook is reused when its content is unchanged.
+    Returns the contract with the generated gdc tables and dbt source, or None
+    if the workbook could not be parsed.
+    """
+    extract = load_stage("extract")
+    file_path = manifest_path(config, root_folder)
+    manifest = None if full else load_manifest(file_path)
+    generator = generator_fingerprint()
+    config_fingerprint = extract.fingerprint(config)
+    previous = None
+    if manifest and manifest.get("generator") == generator and manifest.get("config") == config_fingerprint:
+        previous = manifest["sheets"]
+
+    contract = extract.extract_contract(config, root_folder, previous, use_cache)
+    if not contract:
+        return None
+
+    tables = contract["tables"]
+    changed_sheets = contract["changed_sheets"]
+    changed_tables = contract["changed_tables"]
+    # Tables added, removed or moved between periodicities
+    structure_changed = previous is None or "Files list" in changed_sheets or set(previous) != set(contract["fingerprints"])
+
+    gdc_tables = load_stage("gdc").create_gdc_tables(config, tables, root_folder, changed_tables)
+    # Date formats from the Rules sheet are used by every DDL
+    ddl_tables = set(tables) if "Rules" in changed_sheets else changed_tables
+    load_stage("ddl").create_ddls(config, gdc_tables, tables, contract["data_format"], ddl_tables)
+    if structure_changed or changed_tables:
+        # Sized on the column lengths and periodicities of the tables
+        load_stage("glue_job").create_glue_job(config, tables)
+    dbt_changed = structure_changed or bool(changed_tables)
+    macros_directory = os.path.join(root_folder, 'dbt', 'macros')
+    dbt_source = load_stage("dbt").create_dbt_sources(config, gdc_tables, tables, macros_directory, structure_changed)
+
+    if structure_changed:
+        dag = load_stage("dag")
+        dag.create_airflow_dags(config, dag.periodicities_from_names(gdc_tables))
+
+    if previous != contract["fingerprints"]:
+        save_manifest(file_path, {"generator": generator, "config": config_fingerprint, "sheets": contract["fingerprints"]})
+
+    contract["gdc_tables"] = gdc_tables
+    contract["dbt_source"] = dbt_source
+    contract["dbt_changed"] = dbt_changed
+    return contract
+
+def run_contract_isolated(file_cfg, config, root_folder, full=False, use_cache=True):
+    """Run one contract and report its outcome instead of raising.
+
+    Returns a result dictionary: config, status, error, seconds, tables,
+    changed (tables regenerated) and contract (None when failed).
+    """
+    start = time.perf_counter()
+    contract = None
+    error = None
+    if not config:
+        error = "configuration file could not be loaded"
+    else:
+        try:
+            contract = run_contract(config, root_folder, full, use_cache)
+            if not contract:
+                error = "data contract could not be parsed"
+        except Exception as e:
+            traceback.print_exc()
+            contract = None
+            error = f"{type(e).__name__}: {e}"
+
+    return {
+        "config": file_cfg,
+        "status": "failed" if error else "success",
+        "error": error,
+        "seconds": time.perf_counter() - start,
+        "tables": len(contract["tables"]) if contract else 0,
+        "changed": len(contract["changed_tables"]) if contract else 0,
+        "contract": contract,
+    }
+
+def run_contracts(configs, root_folder, workers=1, full=False, use_cache=True):
+    """Run the contracts, in parallel on a bounded process pool when workers > 1.
+
+    A failing contract never stops the others. Results keep the config_tech order.
+    """
+    workers = max(1, min(workers, len(configs)))
+    if workers == 1:
+        return [run_contract_isolated(file_cfg, config, root_folder, full, use_cache) for file_cfg, config in configs]
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_contract_isolated, file_cfg, config, root_folder, full, use_cache): file_cfg for file_cfg, config in configs}
+        for future in as_completed(futures):
+            file_cfg = futures[future]
+            try:
+                results[file_cfg] = future.result()
+            except Exception as e:
+                # The worker process died (BrokenProcessPool, unpicklable result...)
+                results[file_cfg] = {"config": file_cfg, "status": "failed", "error": f"{type(e).__name__}: {e}", "seconds": 0.0, "tables": 0, "changed": 0, "contract": None}
+    return [results[file_cfg] for file_cfg, _ in configs]
+
+def print_summary(results):
+    """Print the outcome of every contract."""
+    print(f"\n{'config':<40} {'status':<8} {'tables':>6} {'changed':>7} {'seconds':>8}  error")
+    for result in results:
+        print(f"{result['config']:<40} {result['status']:<8} {result['tables']:>6} {result['changed']:>7} {result['seconds']:>8.2f}  {result['error'] or ''}")
+    failed = sum(1 for result in results if result["status"] == "failed")
+    print(f"{len(results) - failed} succeeded, {failed} failed")
+
+def run_pipeline(root_folder, workers=1, full=False, use_cache=True):
+    """Run the whole generation for every project listed in config_tech.yaml.
+
+    Returns the results of run_contract_isolated, or None if config_tech.yaml
+    could not be loaded.
+    """
+    configs = load_project_configurations(root_folder)
+    if configs is None:
+        return None
+
+    dbt = load_stage("dbt")
+    dbt_directory = os.path.join(root_folder, 'dbt')
+    output_directory = os.path.join(dbt_directory, 'models')
+    os.makedirs(output_directory, exist_ok=True)
+
+    # dbt_project.yml
+    dbt.update_dbt_project(dbt_directory)
+
+    results = run_contracts(configs, root_folder, workers, full, use_cache)
+
+    # Write all tables to a single dbt source YAML file
+    contracts = [result["contract"] for result in results if result["contract"]]
+    if contracts and any(contract["dbt_changed"] for contract in contracts):
+        dbt.write_dbt_source_file(output_directory, *contracts[-1]["dbt_source"])
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate every artifact of the data contracts listed in config/config_tech.yaml.")
+    parser.add_argument("--workers", type=int, default=1, help="number of contracts processed in parallel (default: 1)")
+    parser.add_argument("--full", action="store_true", help="regenerate every artifact, ignoring the sheet fingerprints manifest")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbooks, ignoring the parsed contracts cache")
+    args = parser.parse_args()
+
+    root_folder = os.path.abspath('.')  # Adjust the path as neede
+    results = run_pipeline(root_folder, args.workers, args.full, not args.no_cache)
+    if results is None:
+        exit(1)
+    print_summary(results)
+    if any(result["status"] == "failed" for result in results):
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+{{ config(store_failures=true, tags=['data_quality']) }}
+
+with source_table as (
+    select * from {{ source('ekip_lsi', 'STG_LSI_FIX_29_DAILY') }}
+    where DATE_BATCH_PARTITION = '{{ var("date_batch_partition") }}'
+),
+
+violations as (
+    select
+        count_if(IE_AFFAIRE is null) as "IE_AFFAIRE:mandatory",
+        count_if(CODE_MOTIF is null) as "CODE_MOTIF:mandatory",
+        count_if(CODE_MOTIF not in ('M1', 'M2', 'O''K')) as "CODE_MOTIF:lov",
+        count_if(FLAG_CE <> '' and FLAG_CE not in ('O', 'N')) as "FLAG_CE:lov",
+        count_if(CODE_ORIGINE <> '' and CODE_ORIGINE not in ('0001', '0002', '0003', '0004', '0001')) as "CODE_ORIGINE:lov",
+        count(*) - count(distinct hash(IE_AFFAIRE, CODE_MOTIF)) as "IE_AFFAIRE,CODE_MOTIF:primary_key"
+    from source_table
+)
+
+select
+    split_part(check_name, ':', 1) as column_name,
+    split_part(check_name, ':', 2) as check_type,
+    failures
+from violations
+unpivot (failures for check_name in ("IE_AFFAIRE:mandatory", "CODE_MOTIF:mandatory", "CODE_MOTIF:lov", "FLAG_CE:lov", "CODE_ORIGINE:lov", "IE_AFFAIRE,CODE_MOTIF:primary_key"))
+where failures > 0
@@ -0,0 +1,12 @@
+{% macro collect_freshness(source, loaded_at_field, filter) %}
+    {% if loaded_at_field == 'REGISTERED_DATE_BATCH_PARTITION' %}
+        {% call statement('collect_freshness', fetch_result=True, auto_begin=False) %}
+            select
+                max(try_to_date(split_part(split_part(file_name, 'date_batch=', 2), '/', 1)))::timestamp as max_loaded_at,
+                {{ current_timestamp() }} as snapshotted_at
+            from table({{ source.database }}.information_schema.external_table_files(table_name => '{{ source }}'))
+        {% endcall %}
+        {% do return(load_result('collect_freshness')) %}
+    {% endif %}
+    {% do return(dbt.collect_freshness(source, loaded_at_field, filter)) %}
+{% endmacro %}
\ No newline at end of file
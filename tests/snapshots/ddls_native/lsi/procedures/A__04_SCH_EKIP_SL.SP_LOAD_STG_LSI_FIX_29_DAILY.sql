@@ -0,0 +1,17 @@
+CREATE OR REPLACE PROCEDURE  DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.SP_LOAD_STG_LSI_FIX_29_DAILY(DATE_BATCH VARCHAR)
+    RETURNS VARCHAR
+    LANGUAGE SQL
+    AS
+    $$
+    DECLARE
+        batch_date VARCHAR DEFAULT TO_CHAR(TO_DATE(DATE_BATCH, 'YYYY-MM-DD'), 'YYYY-MM-DD');
+        insert_sql VARCHAR DEFAULT 'INSERT INTO DB_BNK_INDIA_{{env_var("SHORT_ENV")}}.SCH_EKIP_SL.STG_LSI_FIX_29_DAILY (IE_AFFAIRE, ID_ELEMENT, CODE_MOTIF, DATE_TRAITEMENT, TIERS_CE, FLAG_CE, DATE_CREATION, DATE_ACCEPTATION, TIERS_ACCEPTEUR, CODE_ORIGINE, DATE_BATCH_PARTITION, ROW_NUMBER, DATE_LAST_MODIFIED) SELECT $1:IE_AFFAIRE::VARCHAR, $1:ID_ELEMENT::NUMBER, $1:CODE_MOTIF::VARCHAR, to_date(NULLIF($1:DATE_TRAITEMENT::TEXT,''''),''DDMMYYYY''), $1:TIERS_CE::VARCHAR, $1:FLAG_CE::VARCHAR, to_date(NULLIF($1:DATE_CREATION::TEXT,''''),''DDMMYYYY''), to_date(NULLIF($1:DATE_ACCEPTATION::TEXT,''''),''DDMMYYYY''), $1:TIERS_ACCEPTEUR::VARCHAR, $1:CODE_ORIGINE::VARCHAR, TO_DATE(''' || batch_date || '''), metadata$file_row_number, metadata$file_last_modified FROM @DB_BNK_INDIA_{{env_var("SHORT_ENV")}}.SCH_EKIP_SL.STG_S3_INDIA_EKIP/lsi/daily/stg_lsi_fix_29/date_batch=' || batch_date || '/ (FILE_FORMAT => ''DB_BNK_INDIA_{{env_var("SHORT_ENV")}}.SCH_EKIP_SL.FF_PARQUET_INDIA_EKIP'')';
+    BEGIN
+        BEGIN TRANSACTION;
+        DELETE FROM DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.STG_LSI_FIX_29_DAILY WHERE DATE_BATCH_PARTITION = TO_DATE(:batch_date);
+        EXECUTE IMMEDIATE :insert_sql;
+        COMMIT;
+        RETURN 'Loaded STG_LSI_FIX_29_DAILY partition ' || batch_date;
+    END;
+    $$;
+    
\ No newline at end of file
@@ -0,0 +1,3 @@
+CREATE FILE FORMAT IF NOT EXISTS  DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.FF_PARQUET_INDIA_EKIP
+    TYPE = 'PARQUET';
+    
\ No newline at end of file
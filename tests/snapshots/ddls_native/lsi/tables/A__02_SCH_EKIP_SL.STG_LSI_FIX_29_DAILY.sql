@@ -0,0 +1,18 @@
+CREATE OR ALTER TABLE  DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.STG_LSI_FIX_29_DAILY (
+      IE_AFFAIRE VARCHAR,
+      ID_ELEMENT NUMBER,
+      CODE_MOTIF VARCHAR,
+      DATE_TRAITEMENT DATE,
+      TIERS_CE VARCHAR,
+      FLAG_CE VARCHAR,
+      DATE_CREATION DATE,
+      DATE_ACCEPTATION DATE,
+      TIERS_ACCEPTEUR VARCHAR,
+      CODE_ORIGINE VARCHAR,
+      DATE_BATCH_PARTITION DATE,
+      ROW_NUMBER NUMBER,
+      DATE_LAST_MODIFIED TIMESTAMP_NTZ
+    )
+    CLUSTER BY (DATE_BATCH_PARTITION, IE_AFFAIRE, CODE_MOTIF);
+    COMMENT ON TABLE DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.STG_LSI_FIX_29_DAILY IS 'STG_LSI_FIX_29_INDIA_OUT_DAILY';
+    
\ No newline at end of file
@@ -0,0 +1,3 @@
+CREATE OR REPLACE VIEW  DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.VW_STG_LSI_FIX_29_DAILY
+    AS SELECT * FROM DB_BNK_INDIA_{{env_var('SHORT_ENV')}}.SCH_EKIP_SL.STG_LSI_FIX_29_DAILY;
+    
\ No newline at end of file
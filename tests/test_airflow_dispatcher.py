@@ -0,0 +1,108 @@
+"""Routes of 1.8.tech_generate_airflow_dag and the el_sqs_dispatcher DAG against a moto SQS queue, without Airflow."""
+import ast
+import json
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_aws
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+dag = load_stage("dag")
+
+LSI_CONFIG = {"multi_layout": "no", "project_path": "ekip-lsi", "project": "LSI", "jv": "INDIA"}
+
+
+@pytest.fixture
+def dags_folder(tmp_path, monkeypatch):
+    """Generate the DAGs of two dispatched projects and a sensor one in tmp_path/dags."""
+    os.symlink(os.path.join(ROOT_FOLDER, "init_script"), tmp_path / "init_script")
+    os.makedirs(tmp_path / "dags")
+    monkeypatch.chdir(tmp_path)
+    dag.create_airflow_dags(LSI_CONFIG, ["Daily", "monthly"])
+    dag.create_airflow_dags(dict(LSI_CONFIG, project_path="ekip-abc", project="abc"), ["daily"])
+    dag.create_airflow_dags(dict(LSI_CONFIG, project_path="ekip-sen", project="sen", dag_trigger="sensor"), ["daily"])
+    return tmp_path / "dags"
+
+
+class DagRunAlreadyExists(Exception):
+    pass
+
+
+def dispatcher(dags_folder, queue_url, already_dispatched=()):
+    """Namespace of the generated dispatcher, with trigger_dag recording its runs instead of Airflow."""
+    path = os.path.join(dags_folder, "el_sqs_dispatcher.py")
+    triggered = []
+
+    def trigger_dag(dag_id, run_id, conf, replace_microseconds):
+        if run_id in already_dispatched:
+            raise DagRunAlreadyExists(run_id)
+        triggered.append((dag_id, run_id, conf))
+
+    namespace = {"__file__": path, "trigger_dag": trigger_dag, "DagRunAlreadyExists": DagRunAlreadyExists, "triggered": triggered}
+    with open(path) as file:
+        tree = ast.parse(file.read())
+    # The DAG and its operator need Airflow, the dispatch functions do not
+    body = [node for node in tree.body if not (isinstance(node, ast.ImportFrom) and node.module.startswith("airflow"))
+            and not (isinstance(node, ast.Assign) and isinstance(node.value, ast.Call) and getattr(node.value.func, "id", None) in ("DAG", "PythonOperator"))]
+    exec(compile(ast.Module(body, []), path, "exec"), namespace)
+    namespace.update(SQS_QUEUE_URL=queue_url, WAIT_TIME_SECONDS=0)
+    return namespace
+
+
+@pytest.fixture
+def sqs_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield boto3.client("sqs", region_name="eu-west-3")
+
+
+def test_each_dispatched_project_writes_its_routes(dags_folder):
+    assert sorted(os.listdir(dags_folder / "el_sqs_routes")) == ["abc.json", "lsi.json"]
+    with open(dags_folder / "el_sqs_routes" / "lsi.json") as file:
+        assert json.load(file) == {"lsi": {"daily": "india_el_ekip_lsi_daily", "monthly": "india_el_ekip_lsi_monthly"}}
+    with open(dags_folder / "el_sqs_dispatcher.py") as file:
+        assert "os.path.join(os.path.dirname(os.path.abspath(__file__)), 'el_sqs_routes')" in file.read()
+
+
+def test_dispatcher_routes_by_project_and_periodicity(dags_folder):
+    namespace = dispatcher(dags_folder, None)
+    routes = namespace["load_routes"]()
+
+    assert namespace["route_message"]({"project": "LSI", "periodicity": "Monthly"}, routes) == "india_el_ekip_lsi_monthly"
+    # The only periodicity of a project is used when the notification has none
+    assert namespace["route_message"]({"project": "abc"}, routes) == "india_el_ekip_abc_daily"
+    assert namespace["route_message"]({"project": "lsi"}, routes) is None
+    assert namespace["route_message"]({"project": "sen"}, routes) is None
+
+
+def test_dispatch_deletes_only_the_routed_messages(dags_folder, sqs_client):
+    queue_url = sqs_client.create_queue(QueueName="el-notifications")["QueueUrl"]
+    message_ids = {}
+    for name, body in [
+        ("lsi", {"project": "lsi", "periodicity": "daily", "key": "LSI_FIX_29.csv"}),
+        ("abc", {"project": "abc"}),
+        ("already", {"project": "lsi", "periodicity": "monthly"}),
+        ("unroutable", {"project": "lsi"}),
+        ("sensor", {"project": "sen"}),
+    ]:
+        message_ids[name] = sqs_client.send_message(QueueUrl=queue_url, MessageBody=json.dumps(body))["MessageId"]
+    sqs_client.send_message(QueueUrl=queue_url, MessageBody="not a notification")
+    namespace = dispatcher(dags_folder, queue_url, already_dispatched={f"sqs__{message_ids['already']}"})
+
+    dispatched = namespace["dispatch_messages"]()
+
+    assert dispatched == 3
+    assert sorted(namespace["triggered"]) == sorted([
+        ("india_el_ekip_lsi_daily", f"sqs__{message_ids['lsi']}", {"notification": {"project": "lsi", "periodicity": "daily", "key": "LSI_FIX_29.csv"}}),
+        ("india_el_ekip_abc_daily", f"sqs__{message_ids['abc']}", {"notification": {"project": "abc"}}),
+    ])
+    # The unroutable and invalid messages are left to the redrive policy, received but not deleted
+    attributes = sqs_client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"])["Attributes"]
+    assert (int(attributes["ApproximateNumberOfMessages"]), int(attributes["ApproximateNumberOfMessagesNotVisible"])) == (0, 3)
@@ -0,0 +1,84 @@
+"""Batched reading and parquet conversion of glue/scripts/csv_to_parquet.py, on small temp files."""
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import column_spec
+from csv_to_parquet import convert_files, read_batches
+
+
+def make_contract(header="true", footer="false"):
+    columns = [
+        {"name": "ID", "type": "varchar(4)", "Length": "4"},
+        {"name": "AMOUNT", "type": "decimal(5,2)", "Length": "6"},
+        {"name": "QUANTITY", "type": "integer", "Length": "3"},
+    ]
+    return {
+        "table_name": "STG_LSI_FIX_29", "periodicity": ["daily"], "separator": ";", "header": header, "footer": footer, "quote": None,
+        "date_format": "YYYY-MM-DD", "decimal_format": ",", "specs": [column_spec(column) for column in columns],
+    }
+
+
+def read(path, contract, invalid_rows=None, block_size=1024):
+    with pa.OSFile(str(path)) as input_file:
+        return pa.Table.from_batches(list(read_batches(input_file, contract, block_size, invalid_rows)))
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_read_batches_skips_rows_of_another_column_count(tmp_path):
+    path = write_lines(tmp_path / "LSI_FIX_29.csv", ["ID;AMOUNT;QUANTITY", "A1;1,5;2", "A2;1,5", "A3;1,5;3;extra", "A4;2,5;4"])
+    invalid_rows = []
+
+    table = read(path, make_contract(), invalid_rows)
+
+    assert table.column("ID").to_pylist() == ["A1", "A4"]
+    assert invalid_rows == [(3, "A2;1,5"), (4, "A3;1,5;3;extra")]
+    with pytest.raises(ValueError, match="Expected 3 columns"):
+        read(path, make_contract())
+    with pytest.raises(ValueError, match="2 rows have another column count"):
+        read(path, make_contract(footer="true"))
+
+
+@pytest.mark.parametrize("footer_line", ["TRAILER 0002", "T;2;2"])
+def test_read_batches_drops_the_footer_whatever_its_column_count(tmp_path, footer_line):
+    path = write_lines(tmp_path / "LSI_FIX_29.csv", ["ID;AMOUNT;QUANTITY", "A1;1,5;2", "A2;2,5;3", footer_line])
+    invalid_rows = []
+
+    table = read(path, make_contract(footer="true"), invalid_rows)
+
+    assert table.column("ID").to_pylist() == ["A1", "A2"]
+    assert invalid_rows == []
+
+
+def test_read_batches_drops_the_footer_after_several_batches(tmp_path):
+    lines = [f"A{record};{record},5;{record % 100}" for record in range(2000)]
+    path = write_lines(tmp_path / "LSI_FIX_29.csv", lines + ["TRAILER"])
+
+    table = read(path, make_contract(header="false", footer="true"), block_size=4096)
+
+    assert table.num_rows == 2000
+    assert table.column("ID")[-1].as_py() == "A1999"
+
+
+def test_convert_files_types_the_columns(tmp_path):
+    landing = tmp_path / "landing" / "datebatch=2024-06-30"
+    landing.mkdir(parents=True)
+    path = write_lines(landing / "LSI_FIX_29.csv", ["ID;AMOUNT;QUANTITY", "A1;1,5;2", "A2;;"])
+
+    [result] = convert_files([str(path)], make_contract(), str(tmp_path / "standard"), "Daily")
+
+    assert result["output"] == str(tmp_path / "standard" / "daily" / "stg_lsi_fix_29" / "date_batch=2024-06-30" / "LSI_FIX_29.parquet")
+    table = pq.read_table(result["output"])
+    assert table.schema.field("AMOUNT").type == pa.decimal128(5, 2)
+    assert table.column("AMOUNT").to_pylist()[1] is None
+    assert table.column("QUANTITY").to_pylist() == [2, None]
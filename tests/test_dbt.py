@@ -0,0 +1,132 @@
+"""Snapshot of the dbt sources, tests and macros generated by 1.5.tech_generate_dbt_tests, offline."""
+import os
+import sys
+
+import pytest
+import yaml
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+gdc = load_stage("gdc")
+dbt = load_stage("dbt")
+
+SNAPSHOT_FOLDER = os.path.join(ROOT_FOLDER, "tests", "snapshots")
+
+
+def load_yaml(path):
+    with open(path) as file:
+        return yaml.safe_load(file)
+
+
+def generated_files(folder):
+    files = {}
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path) as file:
+                files[os.path.relpath(path, folder)] = file.read()
+    return files
+
+
+def lov_tables():
+    """Table structures of the LSI contract, with LOV on a mandatory and an optional column."""
+    tables = gdc.load_table_structures(os.path.join(ROOT_FOLDER, "glue", "config", "lsi"))
+    columns = {column["name"]: column for column in tables["STG_LSI_FIX_29_OUT"]["columns"]}
+    columns["CODE_MOTIF"]["LOV"] = [["M1"], ["M2"], ["O'K"]]
+    columns["FLAG_CE"]["LOV"] = [["O"], ["N"], ["null"]]
+    columns["CODE_ORIGINE"]["LOV"] = [["0001"], ["0002"], ["0003"], ["0004"], ["0001"]]
+    return tables
+
+
+def generate_dbt(tmp_path, **options):
+    """Run the dbt stage on the LSI contract with the configuration `options`; return the dbt files."""
+    config = dict(load_yaml(os.path.join(ROOT_FOLDER, "config", "config_EKIP_LSI.yaml")), **options)
+    tables = lov_tables()
+    gdc_tables = gdc.create_gdc_tables(config, tables, str(tmp_path / "gdc"))
+    macros_directory = tmp_path / "dbt" / "macros"
+    models_directory = tmp_path / "dbt" / "models"
+    os.makedirs(macros_directory)
+    os.makedirs(models_directory)
+
+    dbt.write_dbt_source_file(str(models_directory), *dbt.create_dbt_sources(config, gdc_tables, tables, str(macros_directory)))
+
+    return generated_files(tmp_path / "dbt")
+
+
+def assert_snapshot(name, files):
+    snapshot = os.path.join(SNAPSHOT_FOLDER, name)
+    if os.environ.get("UPDATE_SNAPSHOTS"):
+        for file_name, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(snapshot, file_name)), exist_ok=True)
+            with open(os.path.join(snapshot, file_name), "w") as file:
+                file.write(content)
+    assert files == generated_files(snapshot)
+
+
+def test_test_where_adds_the_partition_condition():
+    assert dbt.test_where("FLAG_CE <> ''", True) == "FLAG_CE <> '' and " + dbt.PARTITION_WHERE
+    assert dbt.test_where(None, True) == dbt.PARTITION_WHERE
+    assert dbt.test_where("FLAG_CE <> ''", False) == "FLAG_CE <> ''"
+    assert dbt.test_where(None, False) == ""
+
+
+@pytest.mark.parametrize("scope", ["partition", "full"])
+def test_source_tests_match_snapshot(scope, tmp_path):
+    files = generate_dbt(tmp_path, dbt_tests_scope=scope)
+
+    source = yaml.safe_load(files["models/source.yml"])
+    wheres = [test[name]["config"]["where"] for column in source["sources"][0]["tables"][0]["columns"] for test in column["tests"] for name in test if "config" in test[name]]
+    assert all(dbt.PARTITION_WHERE in where for where in wheres) == (scope == "partition")
+    assert_snapshot(f"dbt_{scope}", {"models/source.yml": files["models/source.yml"]})
+
+
+def test_consolidated_quality_test_matches_snapshot(tmp_path):
+    files = generate_dbt(tmp_path, dbt_tests_mode="consolidated")
+
+    source = yaml.safe_load(files["models/source.yml"])
+    table = source["sources"][0]["tables"][0]
+    # The column tests are replaced by the single scan of the quality test
+    assert table["tests"] == [] and all(column["tests"] == [] for column in table["columns"])
+    quality_tests = {name: content for name, content in files.items() if name.startswith("tests/")}
+    assert list(quality_tests) == ["tests/ekip_lsi/quality_stg_lsi_fix_29_daily.sql"]
+    assert_snapshot("dbt_consolidated", quality_tests)
+
+
+def test_long_lov_are_checked_against_seeds(tmp_path):
+    files = generate_dbt(tmp_path / "generic", lov_seed_threshold=3)
+
+    seed_files = {name: content for name, content in files.items() if name.startswith("seeds/")}
+    assert sorted(seed_files) == ["seeds/ekip_lsi/lov_ekip_lsi_code_origine_india.csv", "seeds/ekip_lsi/lov_seeds.yml"]
+    # The duplicated code is written once, with its leading zeros
+    assert seed_files["seeds/ekip_lsi/lov_ekip_lsi_code_origine_india.csv"] == "lov_value\n0001\n0002\n0003\n0004\n"
+    assert_snapshot("dbt_lov_seeds", dict(seed_files, **{"models/source.yml": files["models/source.yml"]}))
+
+    quality_test = generate_dbt(tmp_path / "consolidated", lov_seed_threshold=3, dbt_tests_mode="consolidated")["tests/ekip_lsi/quality_stg_lsi_fix_29_daily.sql"]
+    assert "left join {{ ref('lov_ekip_lsi_code_origine_india') }} as lov_code_origine on CODE_ORIGINE::varchar = lov_code_origine.lov_value" in quality_test
+    assert "count_if(CODE_ORIGINE <> '' and CODE_ORIGINE is not null and lov_code_origine.lov_value is null)" in quality_test
+
+
+def test_write_lov_seeds_keeps_unchanged_files(tmp_path, capsys):
+    dbt.write_lov_seeds(str(tmp_path), {"lov_ekip_lsi_code_origine_india": ["0001", "0002"]})
+    capsys.readouterr()
+
+    dbt.write_lov_seeds(str(tmp_path), {"lov_ekip_lsi_code_origine_india": ["0001", "0003"]})
+
+    assert capsys.readouterr().out == f"Generated {tmp_path / 'lov_ekip_lsi_code_origine_india.csv'}\n"
+
+
+@pytest.mark.parametrize("table_type", ["external", "native"])
+def test_freshness_of_external_tables_reads_the_registered_files(table_type, tmp_path):
+    files = generate_dbt(tmp_path, snowflake_table_type=table_type)
+
+    table = yaml.safe_load(files["models/source.yml"])["sources"][0]["tables"][0]
+    if table_type == "native":
+        # Native tables keep the DATE_BATCH_PARTITION freshness of the source
+        assert "loaded_at_field" not in table
+        assert "macros/collect_freshness.sql" not in files
+        return
+    assert table["loaded_at_field"] == dbt.FILE_REGISTRATION_LOADED_AT_FIELD
+    assert_snapshot("dbt_freshness", {"macros/collect_freshness.sql": files["macros/collect_freshness.sql"]})
@@ -0,0 +1,84 @@
+"""Record type routing of glue/scripts/demultiplex.py, on small byte buffers and temp files."""
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pytest
+import yaml
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import column_spec
+from demultiplex import demultiplex, layout_entry, layout_key, load_layouts
+
+
+def make_contract(table_name_output, columns):
+    return {
+        "table_name": table_name_output.rsplit("_", 1)[0], "table_name_output": table_name_output, "file_id": "Ekipfix",
+        "periodicity": ["daily"], "header": "false", "footer": "false", "date_format": "YYYY-MM-DD", "decimal_format": ".",
+        "columns": columns, "specs": [column_spec(column) for column in columns],
+    }
+
+
+CONTRACTS = {
+    "01": make_contract("STG_LSI_CONTRAT_IN", [
+        {"name": "CODE", "position": 1, "type": "varchar(2)", "Length": "2"},
+        {"name": "CONTRAT", "position": 2, "type": "varchar(4)", "Length": "4"},
+    ]),
+    "02": make_contract("STG_LSI_TIERS_IN", [
+        {"name": "CODE", "position": 1, "type": "varchar(2)", "Length": "2"},
+        {"name": "TIERS", "position": 2, "type": "varchar(6)", "Length": "6"},
+    ]),
+}
+
+
+def split(data, batch_size=100):
+    layouts = {code: layout_entry(contract, contract) for code, contract in CONTRACTS.items()}
+    result = {"lines": 0, "layouts": {}, "unknown": {}, "errors": {}}
+    records = {}
+    for code, batch in demultiplex(np.frombuffer(data, dtype=np.uint8), (0, 2), layouts, batch_size, result):
+        records.setdefault(code, []).extend(pa.Table.from_batches([batch]).to_pylist())
+    return records, result
+
+
+def test_demultiplex_routes_each_record_to_its_layout():
+    records, result = split(b"01C001\r\n02T00001\r\n01C002\n02T00002\n", batch_size=3)
+
+    assert records == {
+        "01": [{"CODE": "01", "CONTRAT": "C001"}, {"CODE": "01", "CONTRAT": "C002"}],
+        "02": [{"CODE": "02", "TIERS": "T00001"}, {"CODE": "02", "TIERS": "T00002"}],
+    }
+    assert result == {"lines": 4, "layouts": {"STG_LSI_CONTRAT_IN": 2, "STG_LSI_TIERS_IN": 2}, "unknown": {}, "errors": {}}
+
+
+def test_demultiplex_counts_unknown_codes_and_wrong_lengths():
+    records, result = split(b"00HEADER\n01C001\n99XXXX\n01C0\n9\n99YYYY\n")
+
+    assert [record["CONTRAT"] for record in records["01"]] == ["C001", "C0"]
+    assert result["lines"] == 6
+    assert result["unknown"] == {"00": 1, "99": 2, "9 ": 1}
+    assert result["errors"] == {"STG_LSI_CONTRAT_IN:record_length": 1}
+
+
+def test_layout_key_matches_the_layout_template():
+    assert layout_key("STG_LSI_CONTRAT_IN", "lsi", "india") == "CONTRAT-INDIA-IN"
+
+
+def test_load_layouts_reads_the_codes_of_a_file_id(tmp_path):
+    for contract in CONTRACTS.values():
+        for suffix in ("IN", "OUT"):
+            structure = {key: value for key, value in contract.items() if key != "specs"}
+            with open(tmp_path / f"{contract['table_name']}_{suffix}.yaml", "w") as file:
+                yaml.safe_dump(dict(structure, table_name_output=f"{contract['table_name']}_{suffix}"), file)
+    layout_path = tmp_path / "cfg_glue_ekip-lsi_layout-template.yaml"
+    layout_path.write_text(yaml.safe_dump({"Ekipfix": {"layout": "1:2", "CONTRAT-INDIA-IN": "01", "TIERS-INDIA-IN": "02"}}))
+
+    code_position, layouts = load_layouts(str(layout_path), "Ekipfix", str(tmp_path), None, "lsi", "India")
+
+    assert code_position == (0, 2)
+    assert {code: layout["name"] for code, layout in layouts.items()} == {"01": "STG_LSI_CONTRAT_IN", "02": "STG_LSI_TIERS_IN"}
+    assert layouts["01"]["contract_out"]["table_name_output"] == "STG_LSI_CONTRAT_OUT"
+    with pytest.raises(ValueError, match="No layout"):
+        load_layouts(str(layout_path), "Other", str(tmp_path), None, "lsi", "India")
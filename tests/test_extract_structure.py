@@ -0,0 +1,121 @@
+"""Data contract lookups of 1.2.tech_gdc_extract_structure, on in-memory workbooks."""
+import os
+import sys
+
+import openpyxl
+import pytest
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+extract = load_stage("extract")
+
+
+def lov_workbook(rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "List of value"
+    sheet.append(["FIELD", "LOV", "COUNTRY"])
+    for row in rows:
+        sheet.append(row)
+    return workbook
+
+
+def test_load_list_of_value_indexes_values_by_field_and_country():
+    workbook = lov_workbook([
+        ["STATUS", "A", "ALL"],
+        ["CURRENCY", "INR", "INDIA"],
+        ["STATUS", "B", "ALL"],
+        [None, "X", "ALL"],
+        ["CURRENCY", "EUR", None],
+        ["CURRENCY", "USD", "INDIA"],
+    ])
+
+    assert extract.load_list_of_value(workbook) == {
+        ("STATUS", "ALL"): ["A", "B"],
+        ("CURRENCY", "INDIA"): ["INR", "USD"],
+    }
+
+
+def test_resolve_list_of_value_falls_back_from_all_to_the_jv():
+    lov_index = {
+        ("CURRENCY", "INDIA"): ["INR"],
+        ("CURRENCY", "ALL"): ["EUR", "USD"],
+        ("SEGMENT", "INDIA"): ["RETAIL"],
+        ("SEGMENT", "ITALY"): ["CORPORATE"],
+        ("STATUS", "ALL"): ["A", "B"],
+        ("BRANCH", "ITALY"): ["MILANO"],
+    }
+
+    resolved = extract.resolve_list_of_value(lov_index, "India")
+
+    # Values for ALL countries come first whatever the sheet order, the jv ones only when ALL has none
+    assert resolved == {"CURRENCY": ["EUR", "USD"], "SEGMENT": ["RETAIL"], "STATUS": ["A", "B"]}
+    assert extract.resolve_list_of_value(lov_index, "ITALY")["SEGMENT"] == ["CORPORATE"]
+
+
+def table_sheet(workbook, title, fields):
+    sheet = workbook.create_sheet(title)
+    for _ in range(6):
+        sheet.append([None])
+    sheet.append(["Field"])
+    for position, (name, column_type, precision) in enumerate(fields, start=1):
+        sheet.append([name, None, column_type, None, precision, position, None, "oui", None, None, None, None])
+    return sheet
+
+
+def test_columns_take_their_resolved_list_of_value():
+    workbook = lov_workbook([["STATUS", "A", "ALL"], ["STATUS", "B", "ALL"], ["CURRENCY", "INR", "INDIA"], ["CURRENCY", "EUR", "ITALY"]])
+    sheet = table_sheet(workbook, "LSI_FIX_29", [("ID", "alphanumeric", 12), ("STATUS", "alphanumeric", 1), ("CURRENCY", "alphanumeric", 3)])
+    list_of_value = extract.resolve_list_of_value(extract.load_list_of_value(workbook), "INDIA")
+
+    structure = extract.extract_table_structure(sheet, "LSI_FIX_29", list_of_value, "INDIA")
+
+    assert {column["name"]: column["LOV"] for column in structure["columns"]} == {"ID": [], "STATUS": [["A", "B"]], "CURRENCY": [["INR"]]}
+
+
+FILES_LIST = [
+    {"table_name_output": "STG_LSI_FIX_2_OUT", "file_code": "LSI_FIX_2"},
+    {"table_name_output": "STG_LSI_FIX_2_IN", "file_code": "LSI_FIX_2"},
+    {"table_name_output": "STG_LSI_FIX_29_OUT", "file_code": "LSI_FIX_29"},
+    {"table_name_output": "STG_LSI_FIX_29_IN", "file_code": "LSI_FIX_29"},
+    {"table_name_output": "STG_LSI_CTR_IN", "file_code": "LSI_CTR"},
+]
+
+
+def test_files_for_sheet_matches_table_names_exactly():
+    catalog = extract.build_files_catalog(FILES_LIST)
+
+    assert [item["table_name_output"] for item in extract.files_for_sheet(catalog, "STG_LSI_FIX_2")] == ["STG_LSI_FIX_2_OUT", "STG_LSI_FIX_2_IN"]
+    assert [item["table_name_output"] for item in extract.files_for_sheet(catalog, "STG_LSI_FIX_29_IN")] == ["STG_LSI_FIX_29_IN"]
+    assert [item["table_name_output"] for item in extract.files_for_sheet(catalog, "STG_LSI_CTR")] == ["STG_LSI_CTR_IN"]
+    assert extract.files_for_sheet(catalog, "STG_LSI_FIX") == []
+
+
+def test_extract_all_sheets_keeps_fix_2_and_fix_29_apart():
+    workbook = lov_workbook([])
+    table_sheet(workbook, "LSI_FIX_2", [("ID", "alphanumeric", 12)])
+    table_sheet(workbook, "LSI_FIX_29", [("ID", "alphanumeric", 12), ("CODE_MOTIF", "alphanumeric", 10)])
+
+    sheet_tables = extract.extract_all_sheets(workbook, FILES_LIST, "INDIA", {})
+
+    assert {sheet: [table["table_name_output"] for table in tables] for sheet, tables in sheet_tables.items()} == {
+        "LSI_FIX_2": ["STG_LSI_FIX_2_OUT", "STG_LSI_FIX_2_IN"],
+        "LSI_FIX_29": ["STG_LSI_FIX_29_OUT", "STG_LSI_FIX_29_IN"],
+    }
+    assert [len(table["columns"]) for table in sheet_tables["LSI_FIX_2"]] == [1, 1]
+
+
+def test_formulas_without_cached_values_are_detected(tmp_path):
+    workbook = lov_workbook([["STATUS", "A", "ALL"], ["CURRENCY", "INR", "='Files list'!E3"]])
+    workbook.create_sheet("Files list")["E3"] = "INDIA"
+    path = tmp_path / "EKIP_LSI.xlsx"
+    # openpyxl saves the formulas without computing them
+    workbook.save(path)
+
+    assert extract.formulas_without_values(str(path)) == {"List of value": 1}
+    with pytest.raises(ValueError, match="formulas without cached values in List of value"):
+        extract.parse_contract(str(path), "INDIA")
+    assert extract.formulas_without_values(os.path.join(ROOT_FOLDER, "datacontract", "EKIP_LSI.xlsm")) == {}
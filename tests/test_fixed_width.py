@@ -0,0 +1,68 @@
+"""Fixed-width slicing of glue/scripts/fixed_width.py, on small byte buffers and temp files."""
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import column_spec
+from fixed_width import read_file, read_fixed_width, record_matrix, split_lines
+
+
+def make_contract(header="false", footer="false"):
+    columns = [
+        {"name": "CODE", "type": "varchar(3)", "Length": "3"},
+        {"name": "AMOUNT", "type": "decimal(4)", "Length": "4"},
+    ]
+    return {
+        "table_name": "STG_LSI_FIX_29", "periodicity": ["daily"], "header": header, "footer": footer,
+        "date_format": "YYYY-MM-DD", "decimal_format": ".", "specs": [column_spec(column) for column in columns],
+    }
+
+
+def matrix_rows(data, record_length):
+    window = np.frombuffer(data, dtype=np.uint8)
+    starts, lengths, consumed = split_lines(window, True, 100)
+    matrix = record_matrix(window, starts, lengths, record_length)
+    return [bytes(row) for row in matrix], consumed
+
+
+def read_rows(data, contract, batch_size=100, result=None):
+    batches = list(read_fixed_width(np.frombuffer(data, dtype=np.uint8), contract, batch_size, result))
+    return pa.Table.from_batches(batches).to_pylist() if batches else []
+
+
+def test_record_matrix_of_lf_and_crlf_lines():
+    assert matrix_rows(b"ABC1234\nDEF5678\n", 7) == ([b"ABC1234", b"DEF5678"], 16)
+    assert matrix_rows(b"ABC1234\r\nDEF5678\r\n", 7) == ([b"ABC1234", b"DEF5678"], 18)
+
+
+def test_record_matrix_pads_short_lines_and_cuts_long_ones():
+    rows, _ = matrix_rows(b"ABC1234\r\nDE\r\nGHI90123\n\nJKL", 7)
+
+    assert rows == [b"ABC1234", b"DE     ", b"GHI9012", b"       ", b"JKL    "]
+
+
+def test_read_fixed_width_trims_and_counts_wrong_lengths():
+    result = {}
+
+    rows = read_rows(b"HEADER\r\nAB   12\r\nCD\r\nEF 3456\r\nTRAILER\r\n", make_contract(header="true", footer="true"), 2, result)
+
+    assert rows == [{"CODE": "AB", "AMOUNT": "12"}, {"CODE": "CD", "AMOUNT": ""}, {"CODE": "EF", "AMOUNT": "3456"}]
+    assert result == {"records": 3, "errors": {"*:record_length": 1}}
+
+
+def test_read_file_writes_parquet(tmp_path):
+    landing = tmp_path / "landing" / "datebatch=2024-06-30"
+    landing.mkdir(parents=True)
+    path = landing / "LSI_FIX_29.txt"
+    path.write_bytes(b"AB 0012\r\nCD 0034")
+
+    result = read_file(str(path), make_contract(), str(tmp_path / "standard"), "daily")
+
+    assert result["records"] == 2
+    assert result["errors"] == {}
+    assert os.path.exists(result["output"])
@@ -0,0 +1,67 @@
+"""Glue Data Catalog sync of 1.3.tech_gdc_create_table against a moto stand-in."""
+import os
+import sys
+
+import pytest
+from moto import mock_aws
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+gdc = load_stage("gdc")
+
+CONFIG = {"project": "lsi", "source": "EKIP", "jv": "INDIA", "json_path": "glue/ddl/lsi"}
+DATABASE = "db_lsi"
+
+
+@pytest.fixture
+def glue_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with mock_aws():
+        yield gdc.create_glue_client(region_name="eu-west-3")
+
+
+@pytest.fixture
+def gdc_tables(tmp_path):
+    tables = gdc.load_table_structures(os.path.join(ROOT_FOLDER, "glue", "config", "lsi"))
+    return gdc.create_gdc_tables(CONFIG, tables, str(tmp_path))
+
+
+def actions(plan):
+    return {step["table"]: step["action"] for step in plan}
+
+
+def test_first_sync_creates_every_table(glue_client, gdc_tables):
+    plan = gdc.sync_glue_catalog(glue_client, DATABASE, gdc_tables)
+
+    assert set(actions(plan).values()) == {"create"}
+    assert not [step for step in plan if "error" in step]
+    assert len(gdc.list_catalog_tables(glue_client, DATABASE)) == len(gdc_tables)
+
+
+def test_second_sync_is_unchanged(glue_client, gdc_tables):
+    gdc.sync_glue_catalog(glue_client, DATABASE, gdc_tables)
+
+    plan = gdc.sync_glue_catalog(glue_client, DATABASE, gdc_tables)
+
+    assert len(plan) == len(gdc_tables)
+    assert set(actions(plan).values()) == {"unchanged"}
+
+
+def test_changed_column_is_updated_and_orphan_kept(glue_client, gdc_tables):
+    gdc.sync_glue_catalog(glue_client, DATABASE, gdc_tables)
+    name, table_input = sorted(gdc_tables.items())[0]
+    changed = dict(table_input, StorageDescriptor=dict(table_input["StorageDescriptor"], Columns=table_input["StorageDescriptor"]["Columns"][:-1]))
+    glue_client.create_table(DatabaseName=DATABASE, TableInput={"Name": "stg_lsi_removed"})
+
+    plan = gdc.sync_glue_catalog(glue_client, DATABASE, {**gdc_tables, name: changed})
+
+    by_table = {step["table"]: step for step in plan}
+    assert by_table[table_input["Name"]]["action"] == "update"
+    assert by_table[table_input["Name"]]["changes"] == ["StorageDescriptor.Columns"]
+    assert by_table["stg_lsi_removed"]["action"] == "orphan"
+    assert "stg_lsi_removed" in gdc.list_catalog_tables(glue_client, DATABASE)
+    assert actions(gdc.sync_glue_catalog(glue_client, DATABASE, {**gdc_tables, name: changed}, dry_run=True))[table_input["Name"]] == "unchanged"
@@ -0,0 +1,50 @@
+"""Snapshot of the Snowflake DDLs generated by 1.4.tech_sf_generate_ddl, offline."""
+import os
+import sys
+
+import pytest
+import yaml
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'init_script'))
+
+from tech_pipeline import load_stage
+
+gdc = load_stage("gdc")
+ddl = load_stage("ddl")
+
+SNAPSHOT_FOLDER = os.path.join(ROOT_FOLDER, "tests", "snapshots")
+
+
+def load_yaml(path):
+    with open(path) as file:
+        return yaml.safe_load(file)
+
+
+def generated_ddls(folder):
+    ddls = {}
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path) as file:
+                ddls[os.path.relpath(path, folder)] = file.read()
+    return ddls
+
+
+@pytest.mark.parametrize("table_type", ["external", "native"])
+def test_ddls_match_snapshot(table_type, tmp_path, monkeypatch):
+    config = dict(load_yaml(os.path.join(ROOT_FOLDER, "config", "config_EKIP_LSI.yaml")), snowflake_table_type=table_type)
+    tables = gdc.load_table_structures(os.path.join(ROOT_FOLDER, "glue", "config", "lsi"))
+    config_data_format = load_yaml(os.path.join(ROOT_FOLDER, "glue", "config", "cfg_glue_ekip-lsi.yaml"))
+    gdc_tables = gdc.create_gdc_tables(config, tables, str(tmp_path / "gdc"))
+    monkeypatch.chdir(tmp_path)
+
+    ddl.create_ddls(config, gdc_tables, tables, config_data_format)
+
+    snapshot = os.path.join(SNAPSHOT_FOLDER, f"ddls_{table_type}")
+    if os.environ.get("UPDATE_SNAPSHOTS"):
+        for name, content in generated_ddls(tmp_path / "ddls-snowflake").items():
+            os.makedirs(os.path.dirname(os.path.join(snapshot, name)), exist_ok=True)
+            with open(os.path.join(snapshot, name), "w") as file:
+                file.write(content)
+    assert generated_ddls(tmp_path / "ddls-snowflake") == generated_ddls(snapshot)
@@ -0,0 +1,142 @@
+"""Structure check of glue/scripts/structure_check.py and the run inputs of contract.py, on small temp files."""
+import argparse
+import json
+import os
+import sys
+
+import pytest
+import yaml
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import file_contract, job_inputs, load_contract, strftime_format
+from structure_check import check_file
+
+COLUMNS = [
+    {"name": "ID", "position": 1, "type": "varchar(4)", "Length": "4", "Mandatory": "Oui", "LOV": []},
+    {"name": "AMOUNT", "position": 2, "type": "decimal(5,2)", "Length": "6", "Mandatory": "non", "LOV": []},
+    {"name": "DAY", "position": 3, "type": "date", "Length": "10", "Mandatory": "non", "LOV": []},
+    {"name": "STATUS", "position": 4, "type": "varchar(1)", "Length": "1", "Mandatory": "non", "LOV": [["A"], ["B"], ["null"]]},
+]
+
+
+def write_contract(folder, file_code="LSI_FIX_29", suffix="IN", footer="false"):
+    structure = {
+        "file_code": file_code, "file_id": "Ekipfix", "table_name": f"STG_{file_code}", "table_name_output": f"STG_{file_code}_{suffix}",
+        "periodicity": ["daily"], "separator": ";", "header": "true", "footer": footer, "quote": None, "columns": COLUMNS,
+    }
+    path = os.path.join(folder, f"STG_{file_code}_{suffix}.yaml")
+    with open(path, "w") as file:
+        yaml.safe_dump(structure, file)
+    return path
+
+
+def write_lines(path, lines):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+    return path
+
+
+@pytest.mark.parametrize("date_format, expected", [
+    ("YYYY-MM-DD", "%Y-%m-%d"),
+    ("dd/MM/yyyy", "%d/%m/%Y"),
+    ("DDMMYYYY", "%d%m%Y"),
+    ("yyyy-mm-dd hh24:mi:ss", "%Y-%m-%d %H:%M:%S"),
+])
+def test_strftime_format_tokens_match_in_any_case(date_format, expected):
+    assert strftime_format(date_format) == expected
+
+
+def test_check_file_reports_each_failing_check(tmp_path):
+    contract = load_contract(write_contract(str(tmp_path)))
+    path = write_lines(str(tmp_path / "LSI_FIX_29.csv"), [
+        "ID;AMOUNT;DAY;STATUS",
+        "A1;12.50;2024-06-30;A",
+        ";1.5;2024-06-30;B",
+        "TOOLONG;1234.5;2024-13-01;C",
+        "A4;1.5;2024-06-30",
+        "A5;;;",
+    ])
+
+    result = check_file(path, contract)
+
+    assert result["records"] == 5
+    assert result["errors"] == {
+        "ID:mandatory": 1, "ID:length": 1, "AMOUNT:type": 1, "DAY:type": 1, "STATUS:lov": 1, "*:column_count": 1,
+    }
+    assert result["samples"]["ID:mandatory"] == [2]
+    assert result["samples"]["AMOUNT:type"] == [3]
+    assert result["samples"]["*:column_count"] == [4]
+    assert not result["valid"]
+
+
+def test_check_file_drops_the_footer(tmp_path):
+    contract = load_contract(write_contract(str(tmp_path), footer="true"))
+    path = write_lines(str(tmp_path / "LSI_FIX_29.csv"), ["ID;AMOUNT;DAY;STATUS", "A1;1.5;2024-06-30;A", "FOOTER 1"])
+
+    result = check_file(path, contract)
+
+    assert result["records"] == 1
+    assert result["valid"]
+
+
+def test_file_contract_takes_the_longest_file_code():
+    contracts = [{"file_code": "LSI_FIX_2"}, {"file_code": "LSI_FIX_29"}]
+
+    assert file_contract("landing/LSI_FIX_29.csv", contracts)["file_code"] == "LSI_FIX_29"
+    assert file_contract("landing/LSI_FIX_2_20240630.csv", contracts)["file_code"] == "LSI_FIX_2"
+    assert file_contract("landing/LSI_FIX_290.csv", contracts) is None
+
+
+def job_arguments(**values):
+    arguments = {"files": None, "contract": None, "cfg": None, "contracts": None, "notification": None, "landing": None, "period": None, "date_batch": None}
+    return argparse.Namespace(**{**arguments, **values})
+
+
+def test_job_inputs_lists_the_notified_date_batch(tmp_path):
+    contracts = tmp_path / "contracts"
+    contracts.mkdir()
+    write_contract(str(contracts))
+    write_contract(str(contracts), file_code="LSI_FIX_2")
+    landing = tmp_path / "landing" / "datebatch=2024-06-30"
+    write_lines(str(landing / "LSI_FIX_29.csv"), ["ID;AMOUNT;DAY;STATUS"])
+    write_lines(str(landing / "LSI_FIX_2.csv"), ["ID;AMOUNT;DAY;STATUS"])
+    write_lines(str(landing / "README.txt"), ["not a landing file"])
+    args = job_arguments(
+        contracts=str(contracts), landing=str(tmp_path / "landing" / "datebatch={date_batch_partition}"),
+        notification=json.dumps({"project": "lsi", "dateBatch": "2024-06-30", "periodicity": "Daily"}),
+    )
+
+    inputs = {contract["file_code"]: [os.path.basename(path) for path in paths] for contract, paths in job_inputs(args, "_IN.yaml")}
+
+    assert inputs == {"LSI_FIX_2": ["LSI_FIX_2.csv"], "LSI_FIX_29": ["LSI_FIX_29.csv"]}
+    assert args.period == "daily"
+    assert args.date_batch == "2024-06-30"
+
+
+def test_job_inputs_takes_the_objects_of_an_s3_event(tmp_path):
+    write_contract(str(tmp_path))
+    record = {"s3": {"bucket": {"name": "landing"}, "object": {"key": "lsi/LSI_FIX_29+%281%29.csv"}}}
+    args = job_arguments(contracts=str(tmp_path), notification=json.dumps({"Records": [record]}))
+
+    [(contract, paths)] = job_inputs(args, "_IN.yaml")
+
+    assert contract["file_code"] == "LSI_FIX_29"
+    assert paths == ["s3://landing/lsi/LSI_FIX_29 (1).csv"]
+
+    record["s3"]["object"]["key"] = "lsi/OTHER.csv"
+    with pytest.raises(ValueError):
+        job_inputs(job_arguments(contracts=str(tmp_path), notification=json.dumps({"Records": [record]})), "_IN.yaml")
+
+
+def test_job_inputs_keeps_local_files(tmp_path):
+    contract_path = write_contract(str(tmp_path))
+
+    [(contract, paths)] = job_inputs(job_arguments(files=["a.csv,b.csv", "c.csv"], contract=contract_path), "_IN.yaml")
+
+    assert contract["table_name"] == "STG_LSI_FIX_29"
+    assert paths == ["a.csv", "b.csv", "c.csv"]
+    with pytest.raises(ValueError):
+        job_inputs(job_arguments(files=["a.csv"]), "_IN.yaml")
@@ -0,0 +1,86 @@
+"""Single-pass check and conversion of glue/scripts/validate_convert.py, on small temp files."""
+import os
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ROOT_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_FOLDER, 'glue', 'scripts'))
+
+from contract import column_spec
+from validate_convert import batch_failures, file_lines, validate_convert_file
+
+
+def make_contract(footer="false"):
+    columns = [
+        {"name": "ID", "type": "varchar(4)", "Length": "4", "Mandatory": "Oui"},
+        {"name": "AMOUNT", "type": "decimal(5,2)", "Length": "6"},
+        {"name": "DAY", "type": "date", "Length": "10"},
+        {"name": "STATUS", "type": "varchar(1)", "Length": "1", "LOV": [["A"], ["B"]]},
+    ]
+    return {
+        "table_name": "STG_LSI_FIX_29", "periodicity": ["daily"], "separator": ";", "header": "true", "footer": footer, "quote": None,
+        "date_format": "DD/MM/YYYY", "decimal_format": ",", "specs": [column_spec(column) for column in columns],
+    }
+
+
+def test_file_lines_step_over_the_skipped_lines():
+    # header on line 1, lines 3 and 5 skipped by the reader
+    lines = file_lines(np.arange(4), 1, np.array([3, 5]))
+
+    assert lines.tolist() == [2, 4, 6, 7]
+    assert file_lines(np.arange(3), 0, np.empty(0, dtype=np.int64)).tolist() == [1, 2, 3]
+
+
+def test_batch_failures_masks():
+    batch = pa.RecordBatch.from_pydict({
+        "ID": ["A1", "", "TOOLONG", "A4"],
+        "AMOUNT": ["12,50", "1,5", "1234,5", ""],
+        "DAY": ["30/06/2024", "31/02/2024", "", "2024-06-30"],
+        "STATUS": ["A", "C", "", "B"],
+    })
+
+    failures = {check: mask.tolist() for check, mask in batch_failures(batch, make_contract()).items()}
+
+    assert failures == {
+        "ID:mandatory": [False, True, False, False],
+        "ID:length": [False, False, True, False],
+        "AMOUNT:length": [False, False, False, False],
+        "AMOUNT:type": [False, False, True, False],
+        "DAY:length": [False, False, False, False],
+        "DAY:type": [False, True, False, True],
+        "STATUS:length": [False, False, False, False],
+        "STATUS:lov": [False, True, False, False],
+    }
+
+
+def test_rejected_rows_go_to_quarantine(tmp_path):
+    landing = tmp_path / "landing" / "datebatch=2024-06-30"
+    landing.mkdir(parents=True)
+    path = landing / "LSI_FIX_29.csv"
+    path.write_text("\n".join([
+        "ID;AMOUNT;DAY;STATUS",
+        "A1;12,50;30/06/2024;A",
+        "A2;1,5",
+        ";1,5;30/06/2024;B",
+        "A4;2,5;30/06/2024;C",
+        "A5;3,5;30/06/2024;B",
+        "TRAILER",
+    ]) + "\n")
+    output = tmp_path / "standard"
+
+    result = validate_convert_file(str(path), make_contract(footer="true"), str(output), "daily")
+
+    assert (result["records"], result["valid_records"], result["rejected_records"]) == (5, 2, 3)
+    assert result["errors"] == {"*:column_count": 1, "ID:mandatory": 1, "STATUS:lov": 1}
+    assert result["quarantine"] == str(output / "quarantine" / "daily" / "stg_lsi_fix_29" / "date_batch=2024-06-30" / "LSI_FIX_29.parquet")
+    assert pq.read_table(result["output"]).column("ID").to_pylist() == ["A1", "A5"]
+    rejected = sorted(pq.read_table(result["quarantine"]).to_pylist(), key=lambda row: row["_line"])
+    assert [(row["_line"], row["_errors"], row["_text"]) for row in rejected] == [
+        (3, "*:column_count", "A2;1,5"),
+        (4, "ID:mandatory", None),
+        (5, "STATUS:lov", None),
+    ]
+    assert rejected[2]["ID"] == "A4"